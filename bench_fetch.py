@@ -0,0 +1,99 @@
+# 시세 수집 파이프라인 처리량 벤치마크 (로컬 대역 서버 사용)
+
+import argparse
+import os
+import tempfile
+import time
+
+import openpyxl
+
+import fetch_cache
+import stock_history
+from mock_kis_server import start_mock_server
+import rate_limiter
+
+
+def make_universe_workbook(filename, size, market="KR"):
+    """'종목' 시트만 있는 가상 종목 목록 엑셀 생성"""
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    sheet.title = "종목"
+    sheet.append(["종목명", "종목코드"])
+    for i in range(size):
+        code = f"{i + 1:06d}" if market == "KR" else f"SYM{i + 1}"
+        sheet.append([f"가상종목{i + 1}", code])
+    wb.save(filename)
+
+
+def run_once(server, size, market, workers):
+    """
+    종목 size개 유니버스로 최초 적재(최근 100일 조회 + 엑셀 저장) 1회 실행.
+    - 반환: (전체 소요, 조회 요청 수, 초당 한도 초과 응답 수, 최종 초당 호출 속도)
+    """
+    fetch_func = stock_history.fetch_kr_wrapper if market == "KR" else stock_history.fetch_us_wrapper
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            filename = f"bench_{market}_{size}.xlsx"
+            make_universe_workbook(filename, size, market)
+
+            token_data = stock_history.get_token("bench-key", "bench-secret", server.domain)
+            server.reset_stats()
+
+            started = time.perf_counter()
+            stock_history.process_one_file(
+                excel_filename=filename,
+                fetch_func=fetch_func,
+                app_key="bench-key",
+                app_secret="bench-secret",
+                domain=server.domain,
+                access_token=token_data["access_token"],
+                market=market,
+                max_workers=workers,
+            )
+            elapsed = time.perf_counter() - started
+        finally:
+            os.chdir(cwd)
+
+    stats = dict(server.stats)
+    requests_made = sum(v for k, v in stats.items() if k.startswith("GET "))
+    settled = rate_limiter.get_api_limiter(server.domain).rate
+    return elapsed, requests_made, stats.get("rate_limited", 0), settled
+
+
+def main():
+    parser = argparse.ArgumentParser(description="시세 수집 처리량 벤치마크")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--market", choices=["KR", "US"], default="KR")
+    parser.add_argument("--workers", type=int, nargs="+", default=[stock_history.FETCH_WORKERS],
+                        help="동시 요청 수 (여러 개 지정 시 종목수 × 동시 요청 수 조합마다 실행)")
+    parser.add_argument("--rate", type=float, default=20, help="클라이언트 초당 호출 한도")
+    parser.add_argument("--server-rate-limit", type=int, default=20, help="대역 서버 초당 허용 건수 (0=무제한)")
+    parser.add_argument("--latency", type=float, default=0.03)
+    args = parser.parse_args()
+
+    fetch_cache.set_cache_enabled(False)
+    rate_limiter.set_api_rate(args.rate)
+    server = start_mock_server(latency=args.latency, rate_limit=args.server_rate_limit)
+
+    results = []
+    try:
+        for size in args.sizes:
+            for workers in args.workers:
+                print(f"\n=== 벤치마크: {args.market} {size}종목, 동시 요청 {workers}개 ===")
+                results.append((size, workers) + run_once(server, size, args.market, workers))
+    finally:
+        server.shutdown()
+
+    print("\n=== 결과 ===")
+    print(f"{'종목수':>8} {'동시요청':>8} {'소요(초)':>10} {'요청수':>8} {'요청/초':>8} {'한도초과':>8} {'최종속도':>8}")
+    for size, workers, elapsed, requests_made, limited, settled in results:
+        rps = requests_made / elapsed if elapsed > 0 else 0
+        print(f"{size:>8} {workers:>8} {elapsed:>10.2f} {requests_made:>8} {rps:>8.1f} "
+              f"{limited:>8} {settled:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# 미국 종목 거래소(EXCD) 결정 및 캐시
+
+import json
+import os
+import threading
+
+
+# 종목별로 확인된 거래소를 저장하는 파일 (저장소에 커밋해 매일 실행에서도 재사용)
+EXCHANGE_CACHE_PATH = "us_exchange_map.json"
+
+# 캐시/지정값이 없을 때 시도할 거래소 순서: 나스닥 → 뉴욕 → 아멕스
+EXCHANGE_CANDIDATES = ["NAS", "NYS", "AMS"]
+
+_lock = threading.Lock()
+_cache = None
+_overrides = {}
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(EXCHANGE_CACHE_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            _cache = data if isinstance(data, dict) else {}
+        except (FileNotFoundError, ValueError):
+            _cache = {}
+    return _cache
+
+
+def _save_cache():
+    tmp_path = f"{EXCHANGE_CACHE_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(_cache.items())), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, EXCHANGE_CACHE_PATH)
+
+
+def set_override(symbol, excd):
+    """'종목' 시트에서 지정한 거래소 (캐시보다 우선)"""
+    if excd:
+        _overrides[symbol] = excd.strip().upper()
+
+
+def get_exchange(symbol):
+    """지정값 → 캐시 순으로 알려진 거래소 반환 (없으면 None)"""
+    if symbol in _overrides:
+        return _overrides[symbol]
+    with _lock:
+        return _load_cache().get(symbol)
+
+
+def remember(symbol, excd):
+    """조회에 성공한 거래소를 캐시에 기록"""
+    with _lock:
+        cache = _load_cache()
+        if cache.get(symbol) != excd:
+            cache[symbol] = excd
+            _save_cache()
+
+
+def resolve_and_fetch(symbol, fetch_for_exchange):
+    """
+    거래소를 결정해 조회.
+    - 지정/캐시된 거래소가 있으면 그 거래소로 1회만 조회
+    - 없으면 EXCHANGE_CANDIDATES를 차례로 시도하고, 처음 데이터가 나온 거래소를 캐시
+    - fetch_for_exchange(excd) → 히스토리 리스트 또는 None
+    """
+    known = get_exchange(symbol)
+    if known:
+        return fetch_for_exchange(known)
+
+    for excd in EXCHANGE_CANDIDATES:
+        history = fetch_for_exchange(excd)
+        if history:
+            remember(symbol, excd)
+            return history
+    return None
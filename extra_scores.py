@@ -1,102 +1,71 @@
 # gap, quant, std 전체 계산 모듈
-import openpyxl
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
+import sys
+
 import numpy as np
-from decimal import Decimal, ROUND_HALF_UP
+from numpy.lib.stride_tricks import sliding_window_view
 
-HEADER_FILL = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
-HEADER_FONT = Font(bold=True)
+import score_engine
+import ts_store
+from workbook_session import WorkbookSession
 
 
 # =========================
 # 1. 데이터 로드 함수
 # =========================
 
-def get_close_data(filename):
+def load_store_series(filename, field, key, cast, session=None):
     """
-    '종가' 시트에서 날짜와 종가 시계열을 읽어온다.
+    시계열 저장소에서 필드 1개를 읽어 점수 계산용 형태로 반환 (저장소에 없으면 None)
+    - session이 있으면 세션에서 1회만 읽은 값 공유
     - dates: ['YYYYMMDD', ...]
-    - stocks: [{'name': 종목명, 'code': 종목코드, 'prices': [가격 또는 None, ...]}, ...]
+    - stocks: [{'name', 'code', key: [값 또는 None, ...]}, ...]
     """
-    dates = []
-    stocks = []
+    if session is not None:
+        series = session.series(field)
+        if series is None:
+            return None
+        dates = [str(d) for d in series['dates']]
+        stocks = []
+        for name, code, row in zip(series['names'], series['codes'], series['rows']):
+            values = row if cast is float else [None if v is None else cast(v) for v in row]
+            stocks.append({'name': name, 'code': code, key: values})
+        return dates, stocks
+
     try:
-        wb = openpyxl.load_workbook(filename)
-        sheet = wb['종가']
-
-        # 1행: 날짜 (3열부터 끝까지)
-        raw_dates = [sheet.cell(row=1, column=col).value for col in range(3, sheet.max_column + 1)]
-        for d in raw_dates:
-            if d is None:
-                continue
-            d_str = str(d)
-            if len(d_str) == 8 and d_str.isdigit():
-                if d_str not in dates:
-                    dates.append(d_str)
-
-        # 2행 이후: 종목명, 종목코드, 종가들
-        for row in range(2, sheet.max_row + 1):
-            name = sheet.cell(row=row, column=1).value
-            code = sheet.cell(row=row, column=2).value
-            prices = [sheet.cell(row=row, column=col).value for col in range(3, sheet.max_column + 1)]
-            prices_numeric = []
-            for p in prices:
-                try:
-                    prices_numeric.append(float(p) if p not in (None, '') else None)
-                except (ValueError, TypeError):
-                    prices_numeric.append(None)
-            stocks.append({'name': name, 'code': code, 'prices': prices_numeric})
+        frame = ts_store.load_frame(filename, field)
     except Exception as e:
-        print(f"⚠ 종가 시트 로딩 중 오류: {e}")
+        print(f"⚠ 저장소 로딩 중 오류: {e}")
+        return None
+    if frame is None:
+        return None
+
+    dates = [str(d) for d in frame['dates']]
+    stocks = []
+    for i, (name, code) in enumerate(zip(frame['names'], frame['codes'])):
+        row = frame['values'][i]
+        stocks.append({'name': name, 'code': code,
+                       key: [None if np.isnan(v) else cast(v) for v in row]})
     return dates, stocks
 
 
-def get_volume_data(filename):
+def get_close_data(filename, session=None):
     """
-    '거래량' 시트에서 날짜와 거래량 시계열을 읽어온다.
+    저장소 '종가'(close) 필드에서 날짜와 종가 시계열을 읽어온다. (없으면 빈 목록)
     - dates: ['YYYYMMDD', ...]
-    - stocks: [{'name': 종목명, 'code': 종목코드, 'volumes': [거래량 또는 None, ...]}, ...]
+    - stocks: [{'name': 종목명, 'code': 종목코드, 'prices': [가격 또는 None, ...]}, ...]
     """
-    dates = []
-    stocks = []
-    try:
-        wb = openpyxl.load_workbook(filename)
-        sheet = wb['거래량']
-
-        raw_dates = [sheet.cell(row=1, column=col).value for col in range(3, sheet.max_column + 1)]
-        for d in raw_dates:
-            if d is None:
-                continue
-            d_str = str(d)
-            if len(d_str) == 8 and d_str.isdigit():
-                if d_str not in dates:
-                    dates.append(d_str)
-
-        for row in range(2, sheet.max_row + 1):
-            name = sheet.cell(row=row, column=1).value
-            code = sheet.cell(row=row, column=2).value
-            volumes = [sheet.cell(row=row, column=col).value for col in range(3, sheet.max_column + 1)]
-            volumes_numeric = []
-            for v in volumes:
-                try:
-                    volumes_numeric.append(int(v) if v not in (None, '') else None)
-                except (ValueError, TypeError):
-                    volumes_numeric.append(None)
-            stocks.append({'name': name, 'code': code, 'volumes': volumes_numeric})
-    except Exception as e:
-        print(f"⚠ 거래량 시트 로딩 중 오류: {e}")
-    return dates, stocks
+    loaded = load_store_series(filename, 'close', 'prices', float, session)
+    return loaded if loaded is not None else ([], [])
 
 
-def load_or_create_workbook(filename):
-    try:
-        return openpyxl.load_workbook(filename)
-    except FileNotFoundError:
-        wb = openpyxl.Workbook()
-        if 'Sheet' in wb.sheetnames:
-            wb.remove(wb['Sheet'])
-        return wb
+def get_volume_data(filename, session=None):
+    """
+    저장소 '거래량'(volume) 필드에서 날짜와 거래량 시계열을 읽어온다. (없으면 빈 목록)
+    - dates: ['YYYYMMDD', ...]
+    - stocks: [{'name': 종목명, 'code': 종목코드, 'volumes': [거래량 또는 None, ...]}, ...]
+    """
+    loaded = load_store_series(filename, 'volume', 'volumes', int, session)
+    return loaded if loaded is not None else ([], [])
 
 
 # =========================
@@ -115,7 +84,7 @@ def calc_gap(prices_window20):
     if mean == 0:
         return 0
     val = 100 * (arr[-1] / mean)
-    score = int(Decimal(str(val)).to_integral_value(rounding=ROUND_HALF_UP))
+    score = score_engine.round_half_up_value(val)
     return score
 
 
@@ -131,7 +100,7 @@ def calc_quant(volumes_window60):
     if mean == 0:
         return 0
     val = ((arr[-1] / mean) * 100) / 2
-    score = int(Decimal(str(val)).to_integral_value(rounding=ROUND_HALF_UP))
+    score = score_engine.round_half_up_value(val)
     return score
 
 
@@ -173,270 +142,314 @@ def calc_std_value(prices, idx, window_std=20, window_mean=20):
         return 0
 
     raw_val = (std_today / avg_std - 1) * 100
-    val = float(Decimal(str(raw_val)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+    val = score_engine.round_half_up_value(raw_val, 2)
     return val
 
 
 # =========================
-# 3. 공통 시트 생성 유틸
+# 3. GAP / QUANT / STD 시계열 일괄 계산 (위 계산식과 결과 동일)
 # =========================
 
-def get_existing_dates(sheet):
-    dates = []
-    for col in range(3, sheet.max_column + 1):
-        val = sheet.cell(row=1, column=col).value
-        if val is None:
-            continue
-        try:
-            dates.append(int(val))
-        except:
-            continue
-    return dates
-
-
-def ensure_metric_sheet(wb, sheet_name, stocks):
-    if sheet_name not in wb.sheetnames:
-        sheet = wb.create_sheet(sheet_name)
-        sheet.cell(row=1, column=1, value='종목명')
-        sheet.cell(row=1, column=2, value='종목코드')
-        sheet.cell(row=1, column=1).font = HEADER_FONT
-        sheet.cell(row=1, column=2).font = HEADER_FONT
-        sheet.cell(row=1, column=1).fill = HEADER_FILL
-        sheet.cell(row=1, column=2).fill = HEADER_FILL
-
-        code_to_row = {}
-        for idx, stock in enumerate(stocks, start=2):
-            code = str(stock['code'])
-            sheet.cell(row=idx, column=1, value=stock['name'])
-            sheet.cell(row=idx, column=2, value=code)
-            code_to_row[code] = idx
-
-        return sheet, [], code_to_row, []
-
-    sheet = wb[sheet_name]
-    existing_dates = get_existing_dates(sheet)
-
-    sheet.cell(row=1, column=1, value='종목명').font = HEADER_FONT
-    sheet.cell(row=1, column=2, value='종목코드').font = HEADER_FONT
-    sheet.cell(row=1, column=1).fill = HEADER_FILL
-    sheet.cell(row=1, column=2).fill = HEADER_FILL
-
-    code_to_row = {}
-    new_codes = []
-    max_row = sheet.max_row
-    for row in range(2, max_row + 1):
-        code = sheet.cell(row=row, column=2).value
-        if code is None:
+def _tail_array(values, offset):
+    """values[offset:] → float 배열 (None은 NaN)"""
+    return np.array([np.nan if v is None else v for v in values[offset:]], dtype=float)
+
+
+def _mean_ratio_series(values, window, formula, start=0):
+    """
+    최근 window일 평균 대비 마지막 값 점수(GAP/QUANT)를 시점별로 한 번에 계산.
+    - np.mean을 윈도우 축으로 호출 (1차원 호출과 같은 합산 순서)
+    - start: 이 시점부터만 계산 (증분 갱신 시 새 날짜만)
+    - 반환: values와 같은 길이 [점수 또는 None, ...] (윈도우에 빈 칸이 있으면 None, 평균 0이면 0)
+    """
+    out = [None] * len(values)
+    first = max(start, window - 1)
+    if first >= len(values):
+        return out
+
+    windows = sliding_window_view(_tail_array(values, first - window + 1), window)
+    mean = np.mean(windows, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = score_engine.round_half_up(formula(windows[:, -1], mean))
+
+    for t, (score, avg) in enumerate(zip(scores.tolist(), mean.tolist()), first):
+        if avg != avg:  # 윈도우에 빈 칸 → NaN
             continue
-        code_to_row[str(code)] = row
+        out[t] = 0 if avg == 0 else int(score)
+    return out
 
-    for stock in stocks:
-        code = str(stock['code'])
-        if code not in code_to_row:
-            max_row += 1
-            sheet.cell(row=max_row, column=1, value=stock['name'])
-            sheet.cell(row=max_row, column=2, value=code)
-            code_to_row[code] = max_row
-            new_codes.append(code)
 
-    return sheet, existing_dates, code_to_row, new_codes
+def gap_series(prices, window=20, start=0):
+    """시점별 GAP 점수 (calc_gap과 결과 동일)"""
+    return _mean_ratio_series(prices, window, lambda last, mean: 100 * (last / mean), start)
 
 
-def write_header_cell(sheet, col_idx, date_value):
-    cell = sheet.cell(row=1, column=col_idx, value=date_value)
-    cell.font = HEADER_FONT
-    cell.fill = HEADER_FILL
-    sheet.column_dimensions[get_column_letter(col_idx)].width = 12
+def quant_series(volumes, window=60, start=0):
+    """시점별 QUANT 점수 (calc_quant와 결과 동일)"""
+    return _mean_ratio_series(volumes, window, lambda last, mean: ((last / mean) * 100) / 2, start)
 
 
-def fill_existing_for_new_codes(sheet, code_to_row, stock_map, existing_count, calc_func):
-    if existing_count == 0:
-        return
-    for code, row_idx in code_to_row.items():
-        stock = stock_map.get(code)
-        if not stock or stock.get('_needs_backfill') is not True:
+def _builtin_sum(columns):
+    """
+    배열 목록을 원소별로 내장 sum()과 같은 순서/방식으로 합산 (sum(std_list)와 비트 단위 동일).
+    Python 3.12부터 float의 sum()은 Neumaier 보정 합산이라 실행 중인 버전에 맞춰 계산.
+    """
+    total = columns[0].copy()
+    if sys.version_info < (3, 12):
+        for col in columns[1:]:
+            total += col
+        return total
+
+    comp = np.zeros_like(total)
+    for col in columns[1:]:
+        t = total + col
+        comp += np.where(np.abs(total) >= np.abs(col), (total - t) + col, (col - t) + total)
+        total = t
+    use = (comp != 0) & np.isfinite(comp)
+    total[use] += comp[use]
+    return total
+
+
+def std_series(prices, window_std=20, window_mean=20, start=0):
+    """
+    시점별 STD 값 (calc_std_value와 결과 동일).
+    - 20일 롤링 σ 시계열을 슬라이딩 윈도우로 1회 계산 (인접 시점끼리 σ 19개 공유)
+    - 시점별 평균 σ = 최근 window_mean개 σ를 sum(std_list) / len(std_list)와 같은 순서로 합산
+    - start: 이 시점부터만 계산
+    - 반환: prices와 같은 길이 [값, 0(평균 σ가 0), None(계산 불가), ...]
+    """
+    out = [None] * len(prices)
+    min_idx = window_std + window_mean - 2
+    first = max(start, min_idx)
+    if first >= len(prices):
+        return out
+
+    arr = _tail_array(prices, first - min_idx)
+    sigma = np.std(sliding_window_view(arr, window_std), axis=-1)  # sigma[k]: arr[k:k + window_std]의 σ
+    n = len(sigma) - window_mean + 1
+    columns = [sigma[k:k + n] for k in range(window_mean)]
+    avg_std = _builtin_sum(columns) / window_mean
+    std_today = columns[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = score_engine.round_half_up((std_today / avg_std - 1) * 100, 2)
+
+    for t, (val, avg) in enumerate(zip(values.tolist(), avg_std.tolist()), first):
+        if avg != avg:  # 윈도우에 빈 칸 → NaN
             continue
-        series = stock['series']
-        for idx_global in range(existing_count):
-            col_idx = 3 + idx_global
-            if sheet.cell(row=row_idx, column=col_idx).value not in (None, ""):
-                continue
+        out[t] = 0 if avg == 0 else val
+    return out
+
+
+# =========================
+# 4. 공통 저장 유틸
+# =========================
+
+def split_new_codes(stock_map, existing_dates, known_codes):
+    """저장소 점수 필드에 아직 행이 없는 종목 → 기존 날짜까지 채워야 하는 종목"""
+    if not existing_dates:
+        return []
+    return [code for code in stock_map if code not in known_codes]
+
+
+def fill_existing_for_new_codes(stock_map, new_codes, existing_dates, calc_func, written):
+    for code in new_codes:
+        series = stock_map[code]['series']
+        for idx_global, date_val in enumerate(existing_dates):
             val = calc_func(series, idx_global)
             if val is not None:
-                sheet.cell(row=row_idx, column=col_idx, value=val)
-        stock['_needs_backfill'] = False
+                written[code][date_val] = val
 
 
-def append_metric_columns(sheet, code_to_row, stock_map, existing_count, valid_dates, calc_func):
+def append_metric_columns(stock_map, existing_count, valid_dates, calc_func, written):
     for idx_global in range(existing_count, len(valid_dates)):
         date_val = valid_dates[idx_global]
-        col_idx = 3 + idx_global
-        write_header_cell(sheet, col_idx, date_val)
-
-        for code, row_idx in code_to_row.items():
-            stock = stock_map.get(code)
-            if not stock:
-                continue
+        for code, stock in stock_map.items():
             val = calc_func(stock['series'], idx_global)
             if val is not None:
-                sheet.cell(row=row_idx, column=col_idx, value=val)
+                written[code][date_val] = val
 
 
 # =========================
-# 4. GAP 시트 전체 재계산 저장
+# 5. GAP 시트 전체 재계산 저장
 # =========================
 
-def save_gap_sheet(filename, dates, stocks, window=20, sheet_name='gap'):
+def save_gap_sheet(filename, dates, stocks, window=20, sheet_name='gap', session=None):
     if len(dates) < window:
         print(f"⚠ GAP: 날짜가 {window}일보다 적습니다. ({filename})")
         return
 
     valid_dates = dates[window - 1:]
-    wb = load_or_create_workbook(filename)
-    sheet, existing_dates, code_to_row, new_codes = ensure_metric_sheet(wb, sheet_name, stocks)
+    own_session = session is None
+    if own_session:
+        session = WorkbookSession(filename)
+    existing_dates, known_codes = session.scored(sheet_name, valid_dates)
 
-    stock_map = {}
+    # 종목별 GAP 점수를 시점별로 한 번에 계산 (기존 종목은 새 날짜만, 새 종목은 전체)
+    existing_count = len(existing_dates)
+    stock_map = {str(stock['code']): {} for stock in stocks}
+    new_codes = split_new_codes(stock_map, existing_dates, known_codes)
     for stock in stocks:
         code = str(stock['code'])
-        stock_map[code] = {'series': stock['prices']}
-        if code in new_codes:
-            stock_map[code]['_needs_backfill'] = True
+        start = 0 if code in new_codes else window - 1 + existing_count
+        stock_map[code]['series'] = gap_series(stock['prices'], window, start)
+    written = {code: {} for code in stock_map}
 
     def calc_func(series, idx_global):
         end_idx = window - 1 + idx_global
         if end_idx >= len(series):
             return None
-        window_prices = series[end_idx - window + 1:end_idx + 1]
-        if None in window_prices:
-            return None
-        return calc_gap(window_prices)
+        return series[end_idx]
 
-    existing_count = len(existing_dates)
-    fill_existing_for_new_codes(sheet, code_to_row, stock_map, existing_count, calc_func)
+    fill_existing_for_new_codes(stock_map, new_codes, existing_dates, calc_func, written)
 
+    names = {str(stock['code']): stock['name'] for stock in stocks}
     if existing_count >= len(valid_dates):
-        wb.save(filename)
+        session.record(sheet_name, written, names)
+        if own_session:
+            session.save()
         print(f"✅ GAP: 신규 날짜 없음 ({filename})")
         return
 
-    append_metric_columns(sheet, code_to_row, stock_map, existing_count, valid_dates, calc_func)
-    sheet.column_dimensions['A'].width = 40
-    sheet.column_dimensions['B'].width = 12
+    append_metric_columns(stock_map, existing_count, valid_dates, calc_func, written)
 
-    wb.save(filename)
+    session.record(sheet_name, written, names)
+    if own_session:
+        session.save()
     print(f"✅ GAP 업데이트 완료: {filename} (신규 {len(valid_dates) - existing_count}일)")
 
 
 # =========================
-# 5. QUANT 시트 전체 재계산 저장
+# 6. QUANT 시트 전체 재계산 저장
 # =========================
 
-def save_quant_sheet(filename, dates, stocks, window=60, sheet_name='quant'):
+def save_quant_sheet(filename, dates, stocks, window=60, sheet_name='quant', session=None):
     if len(dates) < window:
         print(f"⚠ QUANT: 날짜가 {window}일보다 적습니다. ({filename})")
         return
 
     valid_dates = dates[window - 1:]
-    wb = load_or_create_workbook(filename)
-    sheet, existing_dates, code_to_row, new_codes = ensure_metric_sheet(wb, sheet_name, stocks)
+    own_session = session is None
+    if own_session:
+        session = WorkbookSession(filename)
+    existing_dates, known_codes = session.scored(sheet_name, valid_dates)
 
-    stock_map = {}
+    # 종목별 QUANT 점수를 시점별로 한 번에 계산 (기존 종목은 새 날짜만, 새 종목은 전체)
+    existing_count = len(existing_dates)
+    stock_map = {str(stock['code']): {} for stock in stocks}
+    new_codes = split_new_codes(stock_map, existing_dates, known_codes)
     for stock in stocks:
         code = str(stock['code'])
-        stock_map[code] = {'series': stock['volumes']}
-        if code in new_codes:
-            stock_map[code]['_needs_backfill'] = True
+        start = 0 if code in new_codes else window - 1 + existing_count
+        stock_map[code]['series'] = quant_series(stock['volumes'], window, start)
+    written = {code: {} for code in stock_map}
 
     def calc_func(series, idx_global):
         end_idx = window - 1 + idx_global
         if end_idx >= len(series):
             return None
-        window_volumes = series[end_idx - window + 1:end_idx + 1]
-        if None in window_volumes:
-            return None
-        return calc_quant(window_volumes)
+        return series[end_idx]
 
-    existing_count = len(existing_dates)
-    fill_existing_for_new_codes(sheet, code_to_row, stock_map, existing_count, calc_func)
+    fill_existing_for_new_codes(stock_map, new_codes, existing_dates, calc_func, written)
 
+    names = {str(stock['code']): stock['name'] for stock in stocks}
     if existing_count >= len(valid_dates):
-        wb.save(filename)
+        session.record(sheet_name, written, names)
+        if own_session:
+            session.save()
         print(f"✅ QUANT: 신규 날짜 없음 ({filename})")
         return
 
-    append_metric_columns(sheet, code_to_row, stock_map, existing_count, valid_dates, calc_func)
-    sheet.column_dimensions['A'].width = 40
-    sheet.column_dimensions['B'].width = 12
+    append_metric_columns(stock_map, existing_count, valid_dates, calc_func, written)
 
-    wb.save(filename)
+    session.record(sheet_name, written, names)
+    if own_session:
+        session.save()
     print(f"✅ QUANT 업데이트 완료: {filename} (신규 {len(valid_dates) - existing_count}일)")
 
 
 # =========================
-# 6. STD 시트 전체 재계산 저장
+# 7. STD 시트 전체 재계산 저장
 # =========================
 
-def save_std_sheet(filename, dates, stocks, sheet_name='std', window_std=20, window_mean=20):
+def save_std_sheet(filename, dates, stocks, sheet_name='std', window_std=20, window_mean=20, session=None):
     min_idx = window_std + window_mean - 2
     if len(dates) <= min_idx:
         print(f"⚠ STD: 데이터가 부족합니다. ({filename})")
         return
 
     valid_dates = dates[min_idx:]
-    wb = load_or_create_workbook(filename)
-    sheet, existing_dates, code_to_row, new_codes = ensure_metric_sheet(wb, sheet_name, stocks)
+    own_session = session is None
+    if own_session:
+        session = WorkbookSession(filename)
+    existing_dates, known_codes = session.scored(sheet_name, valid_dates)
 
-    stock_map = {}
+    # 종목별 STD 값을 시점별로 한 번에 계산 (기존 종목은 새 날짜만, 새 종목은 전체)
+    existing_count = len(existing_dates)
+    stock_map = {str(stock['code']): {} for stock in stocks}
+    new_codes = split_new_codes(stock_map, existing_dates, known_codes)
     for stock in stocks:
         code = str(stock['code'])
-        stock_map[code] = {'series': stock['prices']}
-        if code in new_codes:
-            stock_map[code]['_needs_backfill'] = True
+        start = 0 if code in new_codes else min_idx + existing_count
+        stock_map[code]['series'] = std_series(stock['prices'], window_std, window_mean, start)
+    written = {code: {} for code in stock_map}
 
     def calc_func(series, idx_global):
         i = min_idx + idx_global
         if i >= len(series):
             return None
-        return calc_std_value(series, i, window_std=window_std, window_mean=window_mean)
+        return series[i]
 
-    existing_count = len(existing_dates)
-    fill_existing_for_new_codes(sheet, code_to_row, stock_map, existing_count, calc_func)
+    fill_existing_for_new_codes(stock_map, new_codes, existing_dates, calc_func, written)
 
+    names = {str(stock['code']): stock['name'] for stock in stocks}
     if existing_count >= len(valid_dates):
-        wb.save(filename)
+        session.record(sheet_name, written, names)
+        if own_session:
+            session.save()
         print(f"✅ STD: 신규 날짜 없음 ({filename})")
         return
 
-    append_metric_columns(sheet, code_to_row, stock_map, existing_count, valid_dates, calc_func)
-    sheet.column_dimensions['A'].width = 40
-    sheet.column_dimensions['B'].width = 12
+    append_metric_columns(stock_map, existing_count, valid_dates, calc_func, written)
 
-    wb.save(filename)
+    session.record(sheet_name, written, names)
+    if own_session:
+        session.save()
     print(f"✅ STD 업데이트 완료: {filename} (신규 {len(valid_dates) - existing_count}일)")
 
 
 # =========================
-# 7. 통합 실행 함수
+# 8. 통합 실행 함수
 # =========================
 
-def run_extra_scores(filename):
+def run_extra_scores(filename, session=None):
+    """
+    GAP/STD/QUANT 시트 계산.
+    - session을 넘기면 같은 세션에 결과만 모으고 저장소 반영은 호출 측에서 session.save()
+    """
     print(f"\n=== EXTRA SCORES 계산 시작: {filename} ===")
 
+    own_session = session is None
+    if own_session:
+        session = WorkbookSession(filename)
+
     # GAP, STD는 '종가' 시트 기반
-    close_dates, close_stocks = get_close_data(filename)
+    close_dates, close_stocks = get_close_data(filename, session)
     if close_dates and close_stocks:
-        save_gap_sheet(filename, close_dates, close_stocks, window=20, sheet_name='gap')
-        save_std_sheet(filename, close_dates, close_stocks, sheet_name='std', window_std=20, window_mean=20)
+        save_gap_sheet(filename, close_dates, close_stocks, window=20, sheet_name='gap', session=session)
+        save_std_sheet(filename, close_dates, close_stocks, sheet_name='std', window_std=20, window_mean=20,
+                       session=session)
     else:
         print("⚠ 종가 데이터가 없어 GAP/STD 계산을 건너뜁니다.")
 
     # QUANT는 '거래량' 시트 기반
-    vol_dates, vol_stocks = get_volume_data(filename)
+    vol_dates, vol_stocks = get_volume_data(filename, session)
     if vol_dates and vol_stocks:
-        save_quant_sheet(filename, vol_dates, vol_stocks, window=60, sheet_name='quant')
+        save_quant_sheet(filename, vol_dates, vol_stocks, window=60, sheet_name='quant', session=session)
     else:
         print("⚠ 거래량 데이터가 없어 QUANT 계산을 건너뜁니다.")
 
+    if own_session:
+        session.save()
     print(f"=== EXTRA SCORES 계산 완료: {filename} ===\n")
 
 
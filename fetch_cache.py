@@ -0,0 +1,118 @@
+# 시세 조회 결과 디스크 캐시 (요청 내용 해시 기반)
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+
+CACHE_DIR = ".fetch_cache"
+CACHE_ENABLED = True
+
+# 당일 봉이 포함된 구간은 장중/마감 직후 값이 바뀔 수 있으므로 짧게만 보관
+# (확정 구간은 <key>.json, 미확정 구간은 <key>.live.json → prune은 미확정만 정리)
+TODAY_TTL_SECONDS = 600
+LIVE_SUFFIX = ".live.json"
+
+MARKET_TZ = {
+    "KR": ZoneInfo("Asia/Seoul"),
+    "US": ZoneInfo("America/New_York"),
+}
+
+
+def set_cache_enabled(enabled):
+    global CACHE_ENABLED
+    CACHE_ENABLED = bool(enabled)
+
+
+def _cache_path(endpoint, symbol, market, start_date, end_date, finalized=True):
+    raw = json.dumps([endpoint, symbol, market, start_date, end_date], ensure_ascii=False)
+    key = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, key[:2], key + (".json" if finalized else LIVE_SUFFIX))
+
+
+def is_finalized(end_date, market):
+    """구간 끝이 해당 시장 현지 기준 오늘 이전이면 확정(더 이상 바뀌지 않음)"""
+    tz = MARKET_TZ.get(market, MARKET_TZ["KR"])
+    today = datetime.now(tz).strftime("%Y%m%d")
+    return end_date < today
+
+
+def load(endpoint, symbol, market, start_date, end_date):
+    """캐시 조회. 없거나 만료되었으면 None"""
+    if not CACHE_ENABLED:
+        return None
+    for finalized in (True, False):
+        path = _cache_path(endpoint, symbol, market, start_date, end_date, finalized)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            continue
+
+        if not entry.get("finalized") and time.time() - entry.get("fetched_at", 0) > TODAY_TTL_SECONDS:
+            continue
+        return entry.get("bars")
+    return None
+
+
+def store(endpoint, symbol, market, start_date, end_date, bars):
+    """조회 결과 저장 (원자적 교체)"""
+    if not CACHE_ENABLED or not bars:
+        return
+    finalized = is_finalized(end_date, market)
+    path = _cache_path(endpoint, symbol, market, start_date, end_date, finalized)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    entry = {
+        "endpoint": endpoint,
+        "symbol": symbol,
+        "market": market,
+        "start_date": start_date,
+        "end_date": end_date,
+        "finalized": finalized,
+        "fetched_at": time.time(),
+        "bars": bars,
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def cached_fetch(endpoint, symbol, market, start_date, end_date, loader):
+    """
+    캐시에 있으면 그대로 반환, 없으면 loader() 호출 후 저장.
+    - loader: 인자 없는 실제 API 조회 함수 (결과 없음/실패 시 None → 캐시하지 않음)
+    """
+    bars = load(endpoint, symbol, market, start_date, end_date)
+    if bars is not None:
+        return bars
+    bars = loader()
+    store(endpoint, symbol, market, start_date, end_date, bars)
+    return bars
+
+
+def prune(max_age_seconds=TODAY_TTL_SECONDS):
+    """
+    만료된 미확정(당일 포함) 캐시와 남은 임시 파일만 삭제.
+    확정 구간 캐시(<key>.json)는 값이 바뀌지 않으므로 지우지 않음.
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for root, _dirs, files in os.walk(CACHE_DIR):
+        for name in files:
+            if not (name.endswith(LIVE_SUFFIX) or name.endswith(".tmp")):
+                continue
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
@@ -0,0 +1,120 @@
+# 종목 조회 체크포인트 저널 (중단된 조회 이어받기)
+
+import json
+import os
+import threading
+
+
+JOURNAL_DIR = ".fetch_journal"
+
+
+class FetchJournal:
+    """
+    엑셀 파일 1개의 조회 진행 상황을 append-only JSONL로 기록.
+    - 1행: 실행 정보 {"type": "run", "start_date", "end_date"}
+    - 이후: 종목 1개 조회 성공마다 {"type": "symbol", "code", "name", "history"} 1줄
+    - 같은 조회 구간으로 다시 실행하면 완료된 종목은 건너뛰고 이어서 조회
+      (실패/데이터 없음은 기록하지 않으므로 재실행 시 다시 조회)
+    - 엑셀 저장까지 끝나면 compact()로 저널 삭제
+    """
+
+    def __init__(self, excel_filename, start_date, end_date, journal_dir=JOURNAL_DIR):
+        stem = os.path.splitext(os.path.basename(excel_filename))[0]
+        self.path = os.path.join(journal_dir, f"{stem}.jsonl")
+        self.start_date = start_date
+        self.end_date = end_date
+        self._lock = threading.Lock()
+        self._records = {}
+
+        os.makedirs(journal_dir, exist_ok=True)
+        self._load()
+
+        if not self._records:
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({
+                    "type": "run",
+                    "start_date": start_date,
+                    "end_date": end_date,
+                }, ensure_ascii=False) + "\n")
+
+    def _load(self):
+        """조회 구간이 같은 기존 저널이 있으면 완료 기록 복원"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+
+        if not lines:
+            return
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return
+        if header.get("start_date") != self.start_date or header.get("end_date") != self.end_date:
+            print(f"  • 이전 저널의 조회 구간이 달라 새로 시작합니다 ({self.path})")
+            return
+
+        for line in lines[1:]:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # 중단 시점에 잘린 마지막 줄은 무시
+                continue
+            if rec.get("type") == "symbol" and rec.get("code"):
+                self._records[rec["code"]] = rec
+
+    def completed_codes(self):
+        return set(self._records.keys())
+
+    def record(self, stock, history):
+        """종목 1개 조회 완료 기록 (history가 없으면 실패일 수 있으므로 기록하지 않음)"""
+        if not history:
+            return
+        rec = {
+            "type": "symbol",
+            "code": stock["code"],
+            "name": stock["name"],
+            "history": history,
+        }
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+            self._records[rec["code"]] = rec
+
+    def data_list(self, stocks):
+        """기록된 결과를 종목 목록 순서의 data_list로 변환 (데이터 없는 종목 제외)"""
+        data_list = []
+        for stock in stocks:
+            rec = self._records.get(stock["code"])
+            if rec and rec.get("history"):
+                data_list.append({
+                    "name": stock["name"],
+                    "code": stock["code"],
+                    "history": rec["history"],
+                })
+        return data_list
+
+    def compact(self):
+        """엑셀 반영이 끝난 저널 삭제"""
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self._records = {}
+
+
+def prune_journals(keep, journal_dir=JOURNAL_DIR):
+    """keep(저널 이름 목록)에 없는 오래된 저널 파일 삭제 (조회 구간이 바뀐 중단 기록 정리)"""
+    keep_files = {f"{os.path.splitext(os.path.basename(name))[0]}.jsonl" for name in keep}
+    if not os.path.isdir(journal_dir):
+        return
+    for name in os.listdir(journal_dir):
+        if name.endswith(".jsonl") and name not in keep_files:
+            try:
+                os.remove(os.path.join(journal_dir, name))
+            except OSError:
+                pass
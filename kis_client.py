@@ -0,0 +1,157 @@
+# 한국투자증권 API 공용 HTTP 클라이언트 (keep-alive 세션 풀)
+
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import get_api_limiter
+
+
+# =========================
+# 1. HTTP 설정
+# =========================
+
+HTTP_TIMEOUT = 10      # 요청 타임아웃(초)
+HTTP_POOL_SIZE = 16    # 호스트당 유지할 keep-alive 연결 수 (FETCH_WORKERS 이상 권장)
+
+# 한도 초과/일시 오류 재시도
+KIS_MAX_RETRIES = 4        # 최초 요청 외 재시도 횟수
+RETRY_BACKOFF_BASE = 0.5   # 첫 재시도 대기(초). 이후 2배씩 증가
+RETRY_BACKOFF_MAX = 8.0    # 재시도 대기 상한(초)
+
+# 초당 거래건수 초과 오류 코드
+THROTTLE_MSG_CODES = {"EGW00201"}
+
+# 잠시 후 다시 시도하면 되는 HTTP 상태 코드
+RETRY_HTTP_STATUS = {502, 503, 504}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def configure_http(timeout=None, pool_size=None):
+    """
+    타임아웃/연결 풀 크기 변경.
+    - pool_size가 바뀌면 기존 세션을 닫고 다음 요청부터 새 풀로 생성
+    """
+    global HTTP_TIMEOUT, HTTP_POOL_SIZE
+    if timeout is not None:
+        HTTP_TIMEOUT = timeout
+    if pool_size is not None and pool_size != HTTP_POOL_SIZE:
+        HTTP_POOL_SIZE = pool_size
+        close_sessions()
+
+
+def close_sessions():
+    """열려 있는 모든 세션(연결 풀) 종료"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+# =========================
+# 2. 세션 관리
+# =========================
+
+def get_session(domain, access_token=None, app_key=None, app_secret=None):
+    """
+    (domain, appkey, 토큰) 조합별 공유 세션 반환.
+    - TLS 연결을 재사용하도록 HTTPAdapter 연결 풀 장착
+    - appkey/appsecret/authorization 등 공통 헤더는 세션 기본 헤더로 설정
+    """
+    key = (domain, app_key, access_token)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is not None:
+            return session
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        session.headers.update({"content-type": "application/json; charset=utf-8"})
+        if access_token:
+            session.headers.update({
+                "authorization": f"Bearer {access_token}",
+                "appkey": app_key,
+                "appsecret": app_secret,
+                "custtype": "P",
+            })
+
+        _sessions[key] = session
+        return session
+
+
+# =========================
+# 3. 요청 함수
+# =========================
+
+def is_throttled(resp):
+    """초당 호출 한도 초과 응답인지 (HTTP 429 또는 KIS msg_cd EGW00201)"""
+    if resp.status_code == 429:
+        return True
+    if resp.status_code == 200 or "EGW" not in resp.text:
+        return False
+    try:
+        return resp.json().get("msg_cd") in THROTTLE_MSG_CODES
+    except ValueError:
+        return False
+
+
+def _backoff(attempt):
+    """지수 백오프 + 지터 (동시에 실패한 요청들이 같은 순간에 몰리지 않도록)"""
+    delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** attempt))
+    time.sleep(delay / 2 + random.uniform(0, delay / 2))
+
+
+def kis_get(domain, path, tr_id, params, access_token, app_key, app_secret,
+            extra_headers=None):
+    """
+    시세 조회용 GET 요청.
+    - 공유 적응형 버킷으로 초당 호출 수 제한 후 세션 풀로 전송
+    - 한도 초과 응답이면 버킷 속도를 낮추고, 정상 응답이면 조금씩 올림
+    - 한도 초과/일시 오류는 KIS_MAX_RETRIES회까지 지터 백오프 후 재시도
+    - tr_id와 추가 헤더만 요청별로 지정
+    """
+    session = get_session(domain, access_token, app_key, app_secret)
+    limiter = get_api_limiter(domain)
+
+    headers = {"tr_id": tr_id}
+    if extra_headers:
+        headers.update(extra_headers)
+
+    for attempt in range(KIS_MAX_RETRIES + 1):
+        last_try = attempt == KIS_MAX_RETRIES
+        limiter.acquire()
+        try:
+            resp = session.get(f"{domain}{path}", headers=headers, params=params, timeout=HTTP_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout):
+            if last_try:
+                raise
+            _backoff(attempt)
+            continue
+
+        if is_throttled(resp):
+            limiter.on_throttle()
+        elif resp.status_code in RETRY_HTTP_STATUS:
+            pass
+        else:
+            limiter.on_success()
+            return resp
+
+        if last_try:
+            return resp
+        _backoff(attempt)
+
+    return resp
+
+
+def kis_post(domain, path, headers=None, json_body=None):
+    """토큰 발급 등 인증 전 POST 요청 (세션 풀 사용)"""
+    session = get_session(domain)
+    return session.post(f"{domain}{path}", headers=headers, json=json_body, timeout=HTTP_TIMEOUT)
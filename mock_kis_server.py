@@ -0,0 +1,298 @@
+# 한국투자증권 API 로컬 대역 서버 (벤치마크/회귀 테스트용)
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from trading_calendar import sessions_between
+
+
+# =========================
+# 1. 서버 설정
+# =========================
+
+DEFAULT_LATENCY = 0.03        # 평균 응답 지연(초)
+DEFAULT_JITTER = 0.02         # 지연 편차(초, 균등분포 ±)
+DEFAULT_RATE_LIMIT = 20       # appkey당 초당 허용 건수 (실전투자와 동일)
+PAGE_SIZE = 100               # 일별 시세 1회 최대 건수
+HISTORY_START = "20150101"    # 가상 시세가 존재하는 첫 날
+
+RATE_LIMIT_ERROR = {
+    "rt_cd": "1",
+    "msg_cd": "EGW00201",
+    "msg1": "초당 거래건수를 초과하였습니다.",
+}
+
+
+# =========================
+# 2. 가상 시세 생성
+# =========================
+
+def _seed(symbol):
+    return int(hashlib.md5(symbol.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def synthetic_bar(symbol, date_str, base=None):
+    """
+    (종목, 날짜)별로 항상 같은 값이 나오는 가상 일봉.
+    - 종목 해시로 기준가를 정하고 날짜 해시로 ±3% 안에서 흔들림
+    """
+    seed = _seed(symbol)
+    base = base if base is not None else 1000 + seed % 90000
+    rnd = random.Random(seed ^ int(date_str))
+    close = base * (1 + rnd.uniform(-0.03, 0.03))
+    open_ = close * (1 + rnd.uniform(-0.01, 0.01))
+    high = max(open_, close) * (1 + rnd.uniform(0, 0.01))
+    low = min(open_, close) * (1 - rnd.uniform(0, 0.01))
+    volume = int(1000 + rnd.random() * 1_000_000)
+    return open_, high, low, close, volume
+
+
+def listed_exchange(symbol):
+    """가상 종목의 상장 거래소 (종목 해시로 NAS/NYS/AMS 중 하나)"""
+    return ("NAS", "NYS", "AMS")[_seed(symbol) % 3]
+
+
+def _sessions_desc(market, start_str, end_str, limit=PAGE_SIZE):
+    """start~end 사이 영업일을 최신순으로 최대 limit개"""
+    start = datetime.strptime(max(start_str, HISTORY_START), "%Y%m%d").date()
+    end = datetime.strptime(end_str, "%Y%m%d").date()
+    if start > end:
+        return []
+    days = sessions_between(market, start, end)
+    return [d.strftime("%Y%m%d") for d in reversed(days)][:limit]
+
+
+# =========================
+# 3. 요청 처리
+# =========================
+
+class MockKISHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockKIS/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    # ---- 공통 ----
+    def _send_json(self, status, body, headers=None):
+        raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _delay(self):
+        srv = self.server
+        time.sleep(max(0.0, srv.latency + random.uniform(-srv.jitter, srv.jitter)))
+
+    def _rate_limited(self):
+        appkey = self.headers.get("appkey", "")
+        return not self.server.allow(appkey)
+
+    # ---- 라우팅 ----
+    def do_POST(self):
+        self.server.count("POST " + urlparse(self.path).path)
+        if urlparse(self.path).path != "/oauth2/tokenP":
+            self._send_json(404, {"msg1": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+        if not body.get("appkey"):
+            self._send_json(403, {"error_code": "EGW00103", "error_description": "유효하지 않은 AppKey입니다."})
+            return
+
+        self._delay()
+        expired = datetime.now() + timedelta(hours=24)
+        self._send_json(200, {
+            "access_token": "mock-" + hashlib.sha1(str(time.time()).encode()).hexdigest(),
+            "access_token_token_expired": expired.strftime("%Y-%m-%d %H:%M:%S"),
+            "token_type": "Bearer",
+            "expires_in": 86400,
+        })
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        path = parsed.path
+        params = {k: v[0] for k, v in parse_qs(parsed.query, keep_blank_values=True).items()}
+        self.server.count("GET " + path)
+
+        if not self.headers.get("authorization", "").startswith("Bearer "):
+            self._send_json(401, {"rt_cd": "1", "msg_cd": "EGW00123", "msg1": "기간이 만료된 token 입니다."})
+            return
+
+        self._delay()
+        if self._rate_limited():
+            self.server.count("rate_limited")
+            self._send_json(500, RATE_LIMIT_ERROR)
+            return
+
+        if path.endswith("/inquire-daily-itemchartprice"):
+            self._domestic_daily(params)
+        elif path.endswith("/intstock-multprice"):
+            self._domestic_multi_quote(params)
+        elif path.endswith("/inquire-daily-indexchartprice"):
+            self._index_daily(params)
+        elif path.endswith("/overseas-price/v1/quotations/dailyprice"):
+            self._overseas_daily(params)
+        else:
+            self._send_json(404, {"rt_cd": "1", "msg1": "not found"})
+
+    # ---- 국내 일별 ----
+    def _domestic_daily(self, params):
+        symbol = params.get("FID_INPUT_ISCD", "")
+        dates = _sessions_desc("KR", params.get("FID_INPUT_DATE_1", ""), params.get("FID_INPUT_DATE_2", ""))
+        rows = []
+        for d in dates:
+            o, h, lo, c, v = synthetic_bar(symbol, d)
+            rows.append({
+                "stck_bsop_date": d,
+                "stck_oprc": str(int(o)), "stck_hgpr": str(int(h)),
+                "stck_lwpr": str(int(lo)), "stck_clpr": str(int(c)),
+                "acml_vol": str(v),
+            })
+        self._send_json(200, {"rt_cd": "0", "msg_cd": "MCA00000", "output1": {}, "output2": rows})
+
+    # ---- 국내 멀티종목 현재가 ----
+    def _domestic_multi_quote(self, params):
+        today = datetime.now().strftime("%Y%m%d")
+        rows = []
+        for i in range(1, 31):
+            symbol = params.get(f"FID_INPUT_ISCD_{i}")
+            if not symbol:
+                continue
+            o, h, lo, c, v = synthetic_bar(symbol, today)
+            rows.append({
+                "inter_shrn_iscd": symbol,
+                "inter2_prpr": str(int(c)), "inter2_oprc": str(int(o)),
+                "inter2_hgpr": str(int(h)), "inter2_lwpr": str(int(lo)),
+                "acml_vol": str(v),
+            })
+        self._send_json(200, {"rt_cd": "0", "msg_cd": "MCA00000", "output": rows})
+
+    # ---- 업종지수 일별 ----
+    def _index_daily(self, params):
+        code = params.get("fid_input_iscd", "")
+        dates = _sessions_desc("KR", params.get("fid_input_date_1", ""), params.get("fid_input_date_2", ""))
+        rows = []
+        for d in dates:
+            o, h, lo, c, _ = synthetic_bar("IDX" + code, d, base=2500)
+            rows.append({
+                "stck_bsop_date": d,
+                "bstp_nmix_prpr": f"{c:.2f}", "bstp_nmix_oprc": f"{o:.2f}",
+                "bstp_nmix_hgpr": f"{h:.2f}", "bstp_nmix_lwpr": f"{lo:.2f}",
+            })
+        self._send_json(200, {"rt_cd": "0", "msg_cd": "MCA00000", "output1": {}, "output2": rows})
+
+    # ---- 해외 일별 (연속조회) ----
+    def _overseas_daily(self, params):
+        symbol = params.get("SYMB", "")
+        bymd = params.get("BYMD") or datetime.now().strftime("%Y%m%d")
+        if params.get("EXCD") != listed_exchange(symbol):
+            # 실제 API처럼 다른 거래소로 조회하면 빈 응답
+            self._send_json(200, {"rt_cd": "0", "msg_cd": "MCA00000", "output1": {}, "output2": []})
+            return
+        dates = _sessions_desc("US", HISTORY_START, bymd, limit=PAGE_SIZE + 1)
+        has_next = len(dates) > PAGE_SIZE
+        dates = dates[:PAGE_SIZE]
+
+        rows = []
+        for d in dates:
+            o, h, lo, c, v = synthetic_bar(symbol, d, base=50 + _seed(symbol) % 500)
+            rows.append({
+                "xymd": d,
+                "open": f"{o:.4f}", "high": f"{h:.4f}", "low": f"{lo:.4f}", "clos": f"{c:.4f}",
+                "tvol": str(v),
+            })
+        self._send_json(
+            200,
+            {"rt_cd": "0", "msg_cd": "MCA00000", "output1": {"nrec": str(len(rows))}, "output2": rows},
+            headers={"tr_cont": "M" if has_next else "D"},
+        )
+
+
+class MockKISServer(ThreadingHTTPServer):
+    """지연/초당 한도/요청 통계를 가진 대역 서버"""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=DEFAULT_LATENCY, jitter=DEFAULT_JITTER,
+                 rate_limit=DEFAULT_RATE_LIMIT):
+        super().__init__(address, MockKISHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.stats = {}
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def allow(self, appkey):
+        """appkey별 최근 1초 요청 수가 한도 이내인지 (슬라이딩 윈도우)"""
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            window = self._calls.setdefault(appkey, deque())
+            while window and now - window[0] >= 1.0:
+                window.popleft()
+            if len(window) >= self.rate_limit:
+                return False
+            window.append(now)
+            return True
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {}
+
+    @property
+    def domain(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_mock_server(host="127.0.0.1", port=0, **kwargs):
+    """백그라운드 스레드로 대역 서버 시작 (port=0이면 빈 포트 자동 선택)"""
+    server = MockKISServer((host, port), **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="한국투자증권 API 로컬 대역 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9443)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY)
+    parser.add_argument("--rate-limit", type=int, default=DEFAULT_RATE_LIMIT)
+    args = parser.parse_args()
+
+    server = MockKISServer((args.host, args.port), latency=args.latency, rate_limit=args.rate_limit)
+    print(f"🧪 Mock KIS 서버 실행: {server.domain} (지연 {args.latency}s, 초당 {args.rate_limit}건)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
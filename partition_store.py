@@ -0,0 +1,412 @@
+# 일별 파티션 저장소 (시장 × 거래일마다 작은 CSV 1개 + 종목 마스터) — git에 커밋하는 원본 데이터
+#
+# data/
+#   symbols.csv                            종목 마스터 (카테고리별 종목 목록, 종목 추가/삭제는 여기서)
+#   partitions/<시장>/<YYYY>/<YYYYMMDD>.csv  해당 거래일 일봉 (code,open,high,low,close,volume)
+#
+# 시계열 저장소(ts_store)는 파티션에서 만들어 점수까지 기록하는 작업본, 엑셀은 저장소에서 내보내는 사본이라
+# 둘 다 커밋하지 않음.
+#   python partition_store.py build      # 파티션 → 저장소 (없거나 파티션보다 오래된 저장소만)
+#   python partition_store.py migrate    # 기존 엑셀 → 파티션/종목 마스터 (최초 1회)
+
+import csv
+import json
+import os
+
+import numpy as np
+
+import ts_store
+from sheet_reader import to_float
+
+
+# =========================
+# 1. 설정
+# =========================
+
+DATA_DIR = "data"
+PARTITION_DIR = os.path.join(DATA_DIR, "partitions")
+SYMBOLS_FILE = os.path.join(DATA_DIR, "symbols.csv")
+
+BAR_FIELDS = ["open", "high", "low", "close", "volume"]
+PARTITION_COLUMNS = ["code"] + BAR_FIELDS
+SYMBOL_COLUMNS = ["category", "market", "code", "name", "exchange"]
+
+# 업종지수는 별도 시장 폴더에 종가(close) 열만 채워 저장
+INDEX_MARKET = "KR_INDEX"
+
+# '지수' 시트를 두는 카테고리 (stock_history의 update_index=True와 동일)
+INDEX_CATEGORIES = {"KR_Stocks_Individual"}
+
+
+def market_for(category):
+    """카테고리명 → 시장 ('KR_Stocks_ETF' → 'KR')"""
+    return category.split("_", 1)[0]
+
+
+def _code_key(code, market):
+    code_str = str(code).strip()
+    return code_str.zfill(6) if market == "KR" else code_str
+
+
+def _format_value(v):
+    """CSV 셀 값: 빈 칸/NaN은 '', 정수 값은 소수점 없이, 나머지는 repr (손실 없이 왕복)"""
+    f = to_float(v)
+    if np.isnan(f):
+        return ""
+    return str(int(f)) if f.is_integer() else repr(f)
+
+
+def _write_csv(path, header, rows, encoding="utf-8"):
+    """임시 파일 → os.replace로 원자적 교체"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding=encoding, newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+# =========================
+# 2. 일별 파티션
+# =========================
+
+def partition_path(market, date, root=PARTITION_DIR):
+    date = str(date)
+    return os.path.join(root, market, date[:4], f"{date}.csv")
+
+
+def partition_dates(market, root=PARTITION_DIR):
+    """시장의 파티션 날짜 목록 (int YYYYMMDD, 오름차순)"""
+    market_dir = os.path.join(root, market)
+    dates = []
+    if not os.path.isdir(market_dir):
+        return dates
+    for year in os.listdir(market_dir):
+        year_dir = os.path.join(market_dir, year)
+        if not os.path.isdir(year_dir):
+            continue
+        for file_name in os.listdir(year_dir):
+            stem, ext = os.path.splitext(file_name)
+            if ext == ".csv" and len(stem) == 8 and stem.isdigit():
+                dates.append(int(stem))
+    return sorted(dates)
+
+
+def latest_partition_date(market, codes, root=PARTITION_DIR):
+    """codes 중 하나라도 들어 있는 가장 최근 파티션 날짜 (없으면 None)"""
+    for date in reversed(partition_dates(market, root)):
+        if not codes.isdisjoint(read_partition(market, date, root)):
+            return date
+    return None
+
+
+def read_partition(market, date, root=PARTITION_DIR):
+    """파티션 1개 → {code: {field: float(NaN=빈 칸)}} (없으면 빈 dict)"""
+    rows = {}
+    try:
+        with open(partition_path(market, date, root), "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                code = row.get("code")
+                if code:
+                    rows[code] = {field: to_float(row.get(field)) for field in BAR_FIELDS}
+    except FileNotFoundError:
+        pass
+    return rows
+
+
+def write_partition(market, date, rows, root=PARTITION_DIR):
+    """
+    거래일 1개 파티션에 종목별 일봉 병합 후 저장.
+    - rows: {code: {field: value}} (같은 종목이 이미 있으면 새 값으로 교체)
+    - 종목코드 순으로 정렬해 같은 데이터면 항상 같은 파일 내용
+    """
+    merged = read_partition(market, date, root)
+    for code, bar in rows.items():
+        merged[str(code)] = {field: to_float(bar.get(field)) for field in BAR_FIELDS}
+
+    _write_csv(
+        partition_path(market, date, root),
+        PARTITION_COLUMNS,
+        [[code] + [_format_value(merged[code][f]) for f in BAR_FIELDS] for code in sorted(merged)],
+    )
+
+
+def write_bars(market, data_list, root=PARTITION_DIR):
+    """fetch 단계 결과(data_list)를 거래일별 파티션에 기록. 반환: 기록한 파티션 수"""
+    by_date = {}
+    for stock in data_list:
+        code = _code_key(stock['code'], market)
+        for daily in stock['history'] or []:
+            date = str(daily.get('date') or "")
+            if len(date) != 8 or not date.isdigit():
+                continue
+            by_date.setdefault(date, {})[code] = {field: daily.get(field) for field in BAR_FIELDS}
+
+    for date, rows in by_date.items():
+        write_partition(market, date, rows, root)
+    return len(by_date)
+
+
+def write_index(index_data, root=PARTITION_DIR):
+    """
+    업종지수를 INDEX_MARKET 파티션에 기록 (종가 열만 사용)
+    - index_data: {code: {'name', 'code', 'values': {date: value}}}
+    """
+    by_date = {}
+    for code, info in index_data.items():
+        for date, value in info["values"].items():
+            by_date.setdefault(str(date), {})[str(code)] = {"close": value}
+    for date, rows in by_date.items():
+        write_partition(INDEX_MARKET, date, rows, root)
+
+    # 지수 이름은 종목 마스터에 (없을 때만 추가)
+    master = load_symbols()
+    known = {s["code"] for s in master if s["category"] == INDEX_MARKET}
+    missing = [info for code, info in index_data.items() if str(code) not in known]
+    if missing:
+        master += [
+            {"category": INDEX_MARKET, "market": INDEX_MARKET, "code": str(info["code"]),
+             "name": info["name"], "exchange": ""}
+            for info in missing
+        ]
+        save_symbols(master)
+    return len(by_date)
+
+
+def load_market(market, codes=None, root=PARTITION_DIR):
+    """
+    시장 전체 파티션 → 필드별 종목 × 날짜 행렬
+    - codes: 이 종목들만 (행 순서도 이 순서), None이면 파티션에 있는 전체 종목(코드순)
+    - 반환: {'codes', 'dates'(int), 'values': {field: 행렬}} (해당 종목 값이 하나도 없는 날짜는 제외)
+    """
+    dates = partition_dates(market, root)
+    by_date = [read_partition(market, d, root) for d in dates]
+    if codes is None:
+        codes = sorted({code for rows in by_date for code in rows})
+    row_of = {code: i for i, code in enumerate(codes)}
+
+    values = {field: np.full((len(codes), len(dates)), np.nan) for field in BAR_FIELDS}
+    for j, rows in enumerate(by_date):
+        for code, bar in rows.items():
+            i = row_of.get(code)
+            if i is None:
+                continue
+            for field in BAR_FIELDS:
+                values[field][i, j] = bar[field]
+
+    has_data = np.zeros(len(dates), dtype=bool)
+    for matrix in values.values():
+        has_data |= ~np.isnan(matrix).all(axis=0)
+    keep = np.flatnonzero(has_data)
+    return {
+        "codes": list(codes),
+        "dates": [dates[j] for j in keep],
+        "values": {field: matrix[:, keep] for field, matrix in values.items()},
+    }
+
+
+# =========================
+# 3. 종목 마스터
+# =========================
+
+def load_symbols(path=SYMBOLS_FILE):
+    """종목 마스터 → [{'category', 'market', 'code', 'name', 'exchange'}, ...] (파일 순서 유지)"""
+    try:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            return [
+                {col: (row.get(col) or "").strip() for col in SYMBOL_COLUMNS}
+                for row in csv.DictReader(f)
+                if row.get("category") and row.get("code")
+            ]
+    except FileNotFoundError:
+        return []
+
+
+def save_symbols(symbols, path=SYMBOLS_FILE):
+    # utf-8-sig: 엑셀에서 열어도 한글 종목명이 깨지지 않도록
+    _write_csv(path, SYMBOL_COLUMNS, [[s.get(col, "") for col in SYMBOL_COLUMNS] for s in symbols],
+               encoding="utf-8-sig")
+
+
+def category_symbols(category, symbols=None):
+    """카테고리의 종목 목록 [(종목명, 종목코드[, 거래소]), ...]"""
+    out = []
+    for s in symbols if symbols is not None else load_symbols():
+        if s["category"] != category:
+            continue
+        symbol = (s["name"], s["code"])
+        out.append(symbol + (s["exchange"],) if s["exchange"] else symbol)
+    return out
+
+
+# =========================
+# 4. 파티션 → 저장소
+# =========================
+
+def needs_build(category, excel_filename, symbols=None):
+    """
+    저장소를 파티션에서 새로 만들어야 하는지
+    - 저장소가 없거나, 종목 마스터와 종목 목록이 다르거나, 마지막 날짜가 파티션과 다르면 True
+      (캐시로 되살린 저장소가 커밋된 파티션보다 앞서 있어도 다시 생성)
+    """
+    store = ts_store.open_store(excel_filename)
+    if not store.exists():
+        return True
+    master = category_symbols(category, symbols)
+    if not master:
+        return False
+
+    if [tuple(s) for s in store.symbols()] != master:
+        return True
+    market = market_for(category)
+    newest = latest_partition_date(market, {_code_key(s[1], market) for s in master})
+    latest = store.latest_date("close")
+    return newest is not None and (latest is None or int(latest) != newest)
+
+
+def build_store(category, excel_filename, symbols=None):
+    """
+    종목 마스터 + 파티션으로 저장소를 새로 채움 (종목/원자료/지수 필드).
+    - 점수 필드는 비움 (run_all_scores.py가 원자료로 다시 계산)
+    - 엑셀은 만들지 않음 (run_all_scores.py 마지막 단계 또는 python ts_store.py export)
+    """
+    symbols = symbols if symbols is not None else load_symbols()
+    master = category_symbols(category, symbols)
+    if not master:
+        print(f"⚠ 종목 마스터에 {category} 종목이 없습니다: {SYMBOLS_FILE}")
+        return False
+
+    market = market_for(category)
+    names = {}
+    for name, code, *_ in master:
+        names.setdefault(_code_key(code, market), name)
+
+    store = ts_store.TimeSeriesStore(ts_store.store_dir_for(excel_filename))
+    store.clear()
+    store.set_symbols(master)
+
+    frame = load_market(market, sorted(names))
+    # 일봉이 하나도 없는 종목은 원자료 시트에 넣지 않음 (기존 파이프라인과 동일)
+    rows = np.flatnonzero(~np.all([np.isnan(m).all(axis=1) for m in frame["values"].values()], axis=0))
+    codes = [frame["codes"][i] for i in rows]
+    for field in BAR_FIELDS:
+        store.write_frame(field, codes, [names[c] for c in codes], frame["dates"],
+                          frame["values"][field][rows])
+
+    if category in INDEX_CATEGORIES:
+        index_names = {s["code"]: s["name"] for s in symbols if s["category"] == INDEX_MARKET}
+        index_frame = load_market(INDEX_MARKET, list(index_names) or None)
+        if index_frame["dates"]:
+            index_codes = index_frame["codes"]
+            store.write_frame("index", index_codes, [index_names.get(c, c) for c in index_codes],
+                              index_frame["dates"], index_frame["values"]["close"])
+
+    print(f"  • {category}: 종목 {len(codes)}개 × {len(frame['dates'])}일")
+    return True
+
+
+def build_all(file_config, force=False):
+    """stock_file_map.json의 엑셀 파일별 저장소 중 필요한 것만 파티션에서 생성"""
+    symbols = load_symbols()
+    if not symbols:
+        print(f"❌ 종목 마스터가 없습니다: {SYMBOLS_FILE} (기존 엑셀이 있으면 'migrate' 먼저 실행)")
+        return
+    for category, excel_filename in file_config.items():
+        if not force and not needs_build(category, excel_filename, symbols):
+            print(f"  • {excel_filename}: 최신 상태")
+            continue
+        print(f"\n📦 파티션 → 저장소 생성: {category} → {ts_store.store_dir_for(excel_filename)}")
+        build_store(category, excel_filename, symbols)
+
+
+# =========================
+# 5. 엑셀 → 파티션 (최초 이전)
+# =========================
+
+def migrate_workbook(category, excel_filename):
+    """기존 엑셀 1개의 원자료/지수를 파티션으로 옮기고 종목 목록을 반환"""
+    market = market_for(category)
+    store = ts_store.open_store(excel_filename)
+
+    by_date = {}
+    for field in BAR_FIELDS:
+        frame = store.frame(field)
+        if frame is None:
+            continue
+        values = np.asarray(frame["values"])
+        for i, code in enumerate(frame["codes"]):
+            code = _code_key(code, market)
+            for j in np.flatnonzero(~np.isnan(values[i])):
+                by_date.setdefault(frame["dates"][j], {}).setdefault(code, {})[field] = values[i, j]
+    for date, rows in by_date.items():
+        write_partition(market, date, rows)
+
+    index_symbols = []
+    index_frame = store.frame("index")
+    if index_frame is not None and category in INDEX_CATEGORIES:
+        values = np.asarray(index_frame["values"])
+        index_data = {}
+        for i, code in enumerate(index_frame["codes"]):
+            index_data[code] = {
+                "name": index_frame["names"][i], "code": code,
+                "values": {index_frame["dates"][j]: values[i, j]
+                           for j in np.flatnonzero(~np.isnan(values[i]))},
+            }
+            index_symbols.append({"category": INDEX_MARKET, "market": INDEX_MARKET, "code": code,
+                                  "name": index_frame["names"][i], "exchange": ""})
+        for date in {d for info in index_data.values() for d in info["values"]}:
+            write_partition(INDEX_MARKET, date, {
+                code: {"close": info["values"][date]}
+                for code, info in index_data.items() if date in info["values"]
+            })
+
+    symbols = [
+        {"category": category, "market": market, "code": _code_key(s[1], market), "name": s[0],
+         "exchange": s[2] if len(s) > 2 else ""}
+        for s in store.symbols()
+    ]
+    print(f"  • {excel_filename}: 종목 {len(symbols)}개, 거래일 {len(by_date)}일 → {PARTITION_DIR}/{market}")
+    return symbols + index_symbols
+
+
+def migrate_all(file_config):
+    """모든 엑셀 → 파티션 + 종목 마스터 (이미 있는 파티션은 병합, 마스터는 엑셀 기준으로 교체)"""
+    symbols = []
+    for category, excel_filename in file_config.items():
+        if not os.path.exists(excel_filename):
+            print(f"⚠ 엑셀 파일이 없어 건너뜀: {excel_filename}")
+            continue
+        symbols += migrate_workbook(category, excel_filename)
+
+    seen = set()
+    master = []
+    for s in symbols:
+        key = (s["category"], s["code"])
+        if key not in seen:
+            seen.add(key)
+            master.append(s)
+    save_symbols(master)
+    print(f"✅ 종목 마스터 저장: {SYMBOLS_FILE} ({len(master)}행)")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="일별 파티션 ↔ 시계열 저장소 변환")
+    parser.add_argument("command", choices=["build", "migrate"])
+    parser.add_argument("--force", action="store_true", help="build: 최신 상태여도 다시 생성")
+    parser.add_argument("--config", default="stock_file_map.json")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        file_config = json.load(f)
+
+    if args.command == "build":
+        build_all(file_config, force=args.force)
+    else:
+        migrate_all(file_config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# API 호출 속도 제한 모듈 (토큰 버킷)
+
+import threading
+import time
+
+
+# =========================
+# 1. 한국투자증권 API 초당 호출 한도
+# =========================
+
+# 실전투자: 초당 20건 / 모의투자(openapivts): 초당 2건
+KIS_RATE_LIMIT_REAL = 20
+KIS_RATE_LIMIT_VTS = 2
+
+
+def get_rate_limit(domain):
+    """도메인(실전/모의)에 맞는 초당 호출 한도 반환"""
+    if domain and "openapivts" in domain:
+        return KIS_RATE_LIMIT_VTS
+    return KIS_RATE_LIMIT_REAL
+
+
+# =========================
+# 2. 토큰 버킷
+# =========================
+
+class TokenBucket:
+    """
+    초당 rate개의 토큰이 채워지는 버킷.
+    - acquire(): 토큰이 생길 때까지 대기 후 1개 소비
+    - 여러 스레드에서 동시에 호출해도 전체 호출 속도가 rate를 넘지 않음
+    - capacity 기본값 1 → 순간 몰림(burst) 없이 1/rate 초 간격으로 균등 분배
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else 1)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# =========================
+# 3. 적응형 속도 제어 (AIMD)
+# =========================
+
+# 한도 초과 응답을 받으면 속도를 이 비율로 줄임 (곱셈 감소)
+RATE_DECREASE_FACTOR = 0.5
+
+# 정상 응답 1초 분량마다 올리는 초당 건수 (덧셈 증가)
+RATE_INCREASE_STEP = 1.0
+
+# 아무리 줄여도 유지할 최소 초당 건수
+RATE_MIN = 0.5
+
+# 한도 초과가 연달아 와도 이 시간(초) 안에서는 1번만 감소
+# (동시에 나간 요청들의 초과 응답이 한꺼번에 돌아오는 경우)
+RATE_DECREASE_COOLDOWN = 1.0
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    응답 결과로 호출 속도를 조정하는 토큰 버킷 (AIMD).
+    - on_success(): 정상 응답마다 rate를 조금씩 올림 (max_rate까지)
+    - on_throttle(): 한도 초과 응답이면 rate를 절반으로 (min_rate까지)
+    - max_rate는 문서상 한도. 그 이상으로는 올리지 않음
+    """
+
+    def __init__(self, rate, max_rate=None, min_rate=RATE_MIN):
+        super().__init__(rate)
+        self.max_rate = float(max_rate if max_rate is not None else rate)
+        self.min_rate = float(min(min_rate, self.max_rate))
+        self._last_decrease = 0.0
+        self.success_count = 0
+        self.throttle_count = 0
+        self.lowest_rate = self.rate
+
+    def on_success(self):
+        with self._lock:
+            self.success_count += 1
+            if self.rate < self.max_rate:
+                # 초당 rate건의 성공이 모이면 약 RATE_INCREASE_STEP만큼 증가
+                self.rate = min(self.max_rate, self.rate + RATE_INCREASE_STEP / self.rate)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttle_count += 1
+            now = time.monotonic()
+            if now - self._last_decrease < RATE_DECREASE_COOLDOWN:
+                return
+            self._last_decrease = now
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * RATE_DECREASE_FACTOR)
+            self.lowest_rate = min(self.lowest_rate, self.rate)
+            # 남은 토큰도 비워 바로 다음 요청부터 줄어든 속도 적용
+            self._tokens = min(self._tokens, 0.0)
+
+    def summary(self):
+        """실행 종료 시 출력할 속도 요약"""
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "max_rate": self.max_rate,
+                "lowest_rate": self.lowest_rate,
+                "success": self.success_count,
+                "throttled": self.throttle_count,
+            }
+
+
+# 프로세스 전체에서 공유하는 API 호출 제한기
+_api_limiter = None
+_api_limiter_lock = threading.Lock()
+
+
+def get_api_limiter(domain=None):
+    """공유 적응형 버킷 반환 (최초 호출 시 domain 기준 한도로 생성)"""
+    global _api_limiter
+    with _api_limiter_lock:
+        if _api_limiter is None:
+            _api_limiter = AdaptiveRateLimiter(get_rate_limit(domain))
+        return _api_limiter
+
+
+def set_api_rate(rate):
+    """공유 버킷의 초당 한도 변경 (벤치마크/모의투자 전환용)"""
+    global _api_limiter
+    with _api_limiter_lock:
+        _api_limiter = AdaptiveRateLimiter(rate)
+
+
+def report_api_rate():
+    """이번 실행에서 최종적으로 수렴한 호출 속도 출력"""
+    if _api_limiter is None:
+        return
+    s = _api_limiter.summary()
+    print(
+        f"\n📈 API 호출 속도: 최종 초당 {s['rate']:.1f}건 (한도 {s['max_rate']:.0f}건, "
+        f"최저 {s['lowest_rate']:.1f}건) / 성공 {s['success']}건, 한도 초과 {s['throttled']}건"
+    )
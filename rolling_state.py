@@ -0,0 +1,299 @@
+# S/Z 점수 스트리밍 상태 (종목별 롤링 윈도우를 새 종가 1개당 O(1)로 갱신, 실행 간 JSON으로 유지)
+
+import json
+import math
+import os
+from collections import deque
+from fractions import Fraction
+
+import numpy as np
+
+import score_engine
+
+
+# =========================
+# 1. 설정
+# =========================
+
+# 시계열 저장소 폴더 안에 저장 (CI에서는 data_store/를 actions/cache로 실행 간 유지)
+STATE_NAME = "rolling_state.json"
+STATE_VERSION = 2
+
+WINDOWS = (20, 60, 120)
+MAX_WINDOW = max(WINDOWS)
+
+# Z 점수: 반올림 경계(x.5)와의 거리가 부동소수 오차 상한 × Z_GUARD 이내면 calc_z로 직접 계산
+FLOAT_EPS = 2.0 ** -52
+Z_GUARD = 1000.0
+
+# 합/제곱합은 2^-FIXED_BITS 단위 정수로 보관 (모든 float가 이 단위의 정수배라 더하고 빼도 오차 없음)
+FIXED_BITS = 1074
+
+
+def _fixed(value):
+    """float → 2^-FIXED_BITS 단위 정수 (정확)"""
+    num, den = float(value).as_integer_ratio()
+    return num << (FIXED_BITS - (den.bit_length() - 1))
+
+
+def _dump_fixed(x, bits):
+    """2^-bits 단위 정수 → 기약분수 문자열 (JSON 크기 절약)"""
+    f = Fraction(x, 1 << bits)
+    return f"{f.numerator}/{f.denominator}"
+
+
+def _load_fixed(text, bits):
+    f = Fraction(text)
+    return f.numerator * ((1 << bits) // f.denominator)
+
+
+# =========================
+# 2. 종목 1개 상태
+# =========================
+
+class SymbolState:
+    """
+    종목 1개의 롤링 상태 (빈 칸은 건너뛰고 유효 종가만 누적 — calc_s/calc_z와 같은 기준).
+    - buf: 최근 MAX_WINDOW개 유효 종가
+    - seq: 지금까지 누적한 유효 종가 수 (윈도우 충족 여부 판단)
+    - minq/maxq: 윈도우별 단조 덱 [(순번, 값), ...] → 최소/최대 O(1)
+    - sums/sqsums: 윈도우별 합/제곱합 (고정소수 정수라 빼고 더해도 오차 누적 없음)
+    - last_date: 마지막으로 반영한 유효 종가의 날짜
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.buf = deque(maxlen=MAX_WINDOW)
+        self.last_date = None
+        self.sums = {w: 0 for w in WINDOWS}
+        self.sqsums = {w: 0 for w in WINDOWS}
+        self.minq = {w: deque() for w in WINDOWS}
+        self.maxq = {w: deque() for w in WINDOWS}
+
+    def push(self, value, date):
+        value = float(value)
+        x = _fixed(value)
+        self.seq += 1
+        for w in WINDOWS:
+            self.sums[w] += x
+            self.sqsums[w] += x * x
+            if len(self.buf) >= w:
+                old = _fixed(self.buf[-w])
+                self.sums[w] -= old
+                self.sqsums[w] -= old * old
+
+            low = self.minq[w]
+            while low and low[-1][1] >= value:
+                low.pop()
+            low.append((self.seq, value))
+            while low[0][0] <= self.seq - w:
+                low.popleft()
+
+            high = self.maxq[w]
+            while high and high[-1][1] <= value:
+                high.pop()
+            high.append((self.seq, value))
+            while high[0][0] <= self.seq - w:
+                high.popleft()
+
+        self.buf.append(value)
+        self.last_date = date
+
+    # ---- 점수 ----
+    def s_score(self, w):
+        """calc_s와 같은 식/같은 부동소수 연산 (최소/최대만 덱에서)"""
+        if self.seq < w:
+            return None
+        min_val = self.minq[w][0][1]
+        max_val = self.maxq[w][0][1]
+        if max_val == min_val:
+            return 0
+        val = 100 * ((self.buf[-1] - min_val) / (max_val - min_val))
+        return score_engine.round_half_up_value(val)
+
+    def z_score(self, w):
+        """
+        정확한 합/제곱합으로 Z 계산.
+        calc_z(np.mean/np.std)의 부동소수 오차 때문에 반올림 결과가 달라질 수 있는 경우
+        (분산 0, x.5 경계 근처)만 calc_z로 직접 계산.
+        """
+        if self.seq < w:
+            return None
+        total = self.sums[w]
+        # 분산 = (w·Σx² - (Σx)²) / (w·(w-1)), 정수 연산이라 0 판정도 정확
+        spread = w * self.sqsums[w] - total * total
+        if spread == 0:
+            return self._z_direct(w)
+
+        std = math.sqrt(Fraction(spread, (w * (w - 1)) << (2 * FIXED_BITS)))
+        val = 50 * float(Fraction(w * _fixed(self.buf[-1]) - total, w << FIXED_BITS)) / std
+
+        # calc_z 오차 상한 ~ 50·w·eps·(규모/σ)·(1 + 규모/σ) (평균 오차 + σ 오차 전파)
+        ratio = max(abs(self.minq[w][0][1]), abs(self.maxq[w][0][1])) / std
+        bound = Z_GUARD * 50 * w * FLOAT_EPS * ratio * (1 + ratio) + 1e-9
+        if abs(abs(val) - math.floor(abs(val)) - 0.5) <= bound:
+            return self._z_direct(w)
+        return score_engine.round_half_up_value(val)
+
+    def _z_direct(self, w):
+        from totalSZ import calc_z  # totalSZ가 이 모듈을 import하므로 호출 시점에 가져옴
+        return calc_z(list(self.buf)[-w:], w)
+
+    def score(self, kind, w):
+        return self.s_score(w) if kind == "s" else self.z_score(w)
+
+    # ---- JSON ----
+    def to_dict(self):
+        return {
+            "seq": self.seq,
+            "buf": list(self.buf),
+            "last_date": self.last_date,
+            "sums": {str(w): _dump_fixed(self.sums[w], FIXED_BITS) for w in WINDOWS},
+            "sqsums": {str(w): _dump_fixed(self.sqsums[w], 2 * FIXED_BITS) for w in WINDOWS},
+            "minq": {str(w): [list(e) for e in self.minq[w]] for w in WINDOWS},
+            "maxq": {str(w): [list(e) for e in self.maxq[w]] for w in WINDOWS},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.seq = data["seq"]
+        state.buf.extend(data["buf"])
+        state.last_date = data["last_date"]
+        for w in WINDOWS:
+            key = str(w)
+            state.sums[w] = _load_fixed(data["sums"][key], FIXED_BITS)
+            state.sqsums[w] = _load_fixed(data["sqsums"][key], 2 * FIXED_BITS)
+            state.minq[w] = deque((seq, val) for seq, val in data["minq"][key])
+            state.maxq[w] = deque((seq, val) for seq, val in data["maxq"][key])
+        return state
+
+    @classmethod
+    def from_history(cls, prices, dates):
+        """전체 시계열에서 상태 생성 (최근 MAX_WINDOW개 유효 값만 재생, 순번은 전체 유효 개수 기준)"""
+        valid = [(float(p), d) for p, d in zip(prices, dates) if p is not None]
+        state = cls()
+        if not valid:
+            return state
+        tail = [p for p, _ in valid[-MAX_WINDOW:]]
+        state.seq = len(valid)
+        state.buf.extend(tail)
+        state.last_date = valid[-1][1]
+
+        # 윈도우별 합/덱을 최근 값에서 바로 구성 (1개씩 push하는 것과 같은 결과)
+        fixed = [_fixed(p) for p in tail]
+        for w in WINDOWS:
+            first = max(len(tail) - w, 0)
+            state.sums[w] = sum(fixed[first:])
+            state.sqsums[w] = sum(x * x for x in fixed[first:])
+            low, high = state.minq[w], state.maxq[w]
+            for k in range(first, len(tail)):
+                seq, value = state.seq - len(tail) + 1 + k, tail[k]
+                while low and low[-1][1] >= value:
+                    low.pop()
+                low.append((seq, value))
+                while high and high[-1][1] <= value:
+                    high.pop()
+                high.append((seq, value))
+        return state
+
+
+# =========================
+# 3. 파일 단위 상태
+# =========================
+
+class RollingState:
+    """
+    엑셀 파일 1개의 종목별 상태 + 마지막으로 반영한 날짜(last_date)
+    + 그때 읽은 저장소 revision (이후 종가 수정 기록과 비교)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last_date = None
+        self.revision = None
+        self.symbols = {}
+
+    @classmethod
+    def load(cls, store_path):
+        state = cls(os.path.join(store_path, STATE_NAME))
+        try:
+            with open(state.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return state
+        if data.get("version") != STATE_VERSION:
+            return state
+        state.last_date = data.get("last_date")
+        state.revision = data.get("revision")
+        state.symbols = {code: SymbolState.from_dict(s) for code, s in data.get("symbols", {}).items()}
+        return state
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": STATE_VERSION,
+                "last_date": self.last_date,
+                "revision": self.revision,
+                "symbols": {code: s.to_dict() for code, s in self.symbols.items()},
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def advance_store(self, store):
+        """
+        저장소에서 last_date 열부터의 종가만 읽어 새 날짜를 종목별 상태에 1개씩 반영하며 S/Z 점수 계산.
+        - 반환: (names, {(kind, window): {code: {날짜: 점수}}}) 또는 None (전체 종가로 rebuild 필요)
+        - None인 경우: 상태가 없음 / manifest 수정 기록상 last_date 이전 종가가 다시 쓰임 /
+          last_date 열 값이 종목별 마지막 종가와 다름 (기록 밖의 정정)
+        - 상태에 없는 종목은 last_date 이후에 추가된 행이므로 빈 상태에서 시작
+        """
+        if self.last_date is None:
+            return None
+        changed = store.changed_since("close", self.revision)
+        if changed is not None and changed <= self.last_date:
+            return None
+        frame = store.frame("close", start=self.last_date)
+        if frame is None or not frame["dates"] or frame["dates"][0] != self.last_date:
+            return None
+
+        values = np.asarray(frame["values"])
+        for code, row in zip(frame["codes"], values):
+            sym = self.symbols.get(code)
+            if sym is None:
+                if not np.isnan(row[0]):
+                    return None
+            elif sym.last_date == self.last_date:
+                if row[0] != sym.buf[-1]:
+                    return None
+            elif not np.isnan(row[0]):
+                return None
+
+        dates = frame["dates"]
+        scores = {(kind, w): {} for kind in ("s", "z") for w in WINDOWS}
+        symbols = {}
+        for code, row in zip(frame["codes"], values):
+            sym = self.symbols.get(code) or SymbolState()
+            for by_code in scores.values():
+                by_code[code] = {}
+            for t in range(1, len(dates)):
+                if not np.isnan(row[t]):
+                    sym.push(row[t], dates[t])
+                for (kind, w), by_code in scores.items():
+                    score = sym.score(kind, w)
+                    if score is not None:
+                        by_code[code][dates[t]] = score
+            symbols[code] = sym
+
+        self.symbols = symbols
+        self.last_date = dates[-1]
+        self.revision = store.revision
+        return dict(zip(frame["codes"], frame["names"])), scores
+
+    def rebuild(self, dates, stocks, revision):
+        """전체 종가 시계열 끝 기준으로 모든 종목 상태를 새로 만듦 (점수는 일괄 계산 엔진 몫)"""
+        self.symbols = {str(stock["code"]): SymbolState.from_history(stock["prices"], dates)
+                        for stock in stocks}
+        self.last_date = dates[-1] if dates else None
+        self.revision = revision
@@ -1,13 +1,24 @@
+import argparse
+import contextlib
+import io
 import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+import sqlite_repo
+import ts_store
 from totalSZ import run_total_sz
 from extra_scores import run_extra_scores
+from workbook_session import WorkbookSession
 
 
 # JSON 파일 경로 (필요하면 여기 이름만 바꿔줘)
 JSON_PATH = "stock_file_map.json"
 
+# 파일별 병렬 처리 프로세스 수 (--workers, 1이면 한 파일씩 순서대로)
+SCORE_WORKERS = 1
+
 
 def load_excel_map(json_path=JSON_PATH):
     """
@@ -30,44 +41,148 @@ def load_excel_map(json_path=JSON_PATH):
     return data
 
 
-def run_all_scores_for_file(category_name, filename):
+def run_all_scores_for_file(category_name, filename, export=True):
     """
-    하나의 엑셀 파일에 대해:
+    하나의 엑셀 파일(= 짝을 이루는 시계열 저장소)에 대해:
       - S/Z 점수 (s20/s60/s120, z20/z60/z120)
       - extra scores (gap, quant, std)
     를 모두 실행한다.
+    - 저장소는 한 번만 열고(WorkbookSession), 모든 점수 계산 후 한 번만 반영
+    - export=True면 마지막에 저장소 → 엑셀 파일 생성 (엑셀은 저장소의 사본)
+    - 단계별 오류는 출력 후 다음 단계 계속, 결과 요약용으로 모아서 반환
+    - 반환: {'category', 'filename', 'skipped', 'errors': [메시지, ...], 'seconds'}
     """
-    if not os.path.exists(filename):
-        print(f"⚠ [{category_name}] 파일 없음: {filename}  → 건너뜀")
-        return
+    result = {"category": category_name, "filename": filename,
+              "skipped": False, "errors": [], "seconds": 0.0}
+    started = time.time()
+
+    if not ts_store.open_store(filename).exists():
+        print(f"⚠ [{category_name}] 저장소 없음: {filename}  → 건너뜀")
+        result["skipped"] = True
+        return result
 
     print(f"\n=== [{category_name}] {filename} 처리 시작 ===")
 
+    def fail(step, e):
+        print(f"⚠ [{category_name}] {step} 중 오류: {e}")
+        result["errors"].append(f"{step} 중 오류: {e}")
+
+    try:
+        session = WorkbookSession(filename)
+    except Exception as e:
+        fail("저장소 열기", e)
+        result["seconds"] = time.time() - started
+        return result
+
     # 1) S/Z 점수 계산
     try:
-        run_total_sz(filename)
+        run_total_sz(filename, session)
     except Exception as e:
-        print(f"⚠ [{category_name}] S/Z 계산 중 오류: {e}")
+        fail("S/Z 계산", e)
 
     # 2) GAP / QUANT / STD 계산
     try:
-        run_extra_scores(filename)
+        run_extra_scores(filename, session)
     except Exception as e:
-        print(f"⚠ [{category_name}] EXTRA SCORES 계산 중 오류: {e}")
+        fail("EXTRA SCORES 계산", e)
+
+    # 3) 1회 저장
+    try:
+        session.save()
+    except Exception as e:
+        fail("저장", e)
+
+    # 4) 저장소 → 엑셀 내보내기
+    if export:
+        try:
+            session.export()
+        except Exception as e:
+            fail("엑셀 내보내기", e)
 
     print(f"=== [{category_name}] {filename} 처리 완료 ===")
+    result["seconds"] = time.time() - started
+    return result
+
+
+def _run_file_in_worker(category_name, filename, export=True):
+    """작업 프로세스: 파일 1개 처리, 출력은 모아서 결과와 함께 반환 (부모가 파일 순서대로 출력)"""
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        result = run_all_scores_for_file(category_name, filename, export)
+    return result, log.getvalue()
 
 
-def main():
+def run_files_parallel(excel_map, workers, sqlite_path=None, export=True):
+    """
+    파일마다 작업 프로세스에서 run_all_scores_for_file 실행 (파일끼리 공유하는 상태 없음).
+    - 각 파일의 출력은 끝나는 대로 JSON 순서에 맞춰 그대로 출력
+    - 반환: JSON 순서대로 파일별 결과 목록
+    """
+    items = list(excel_map.items())
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=sqlite_repo.set_repo_path,
+                             initargs=(sqlite_path,)) as executor:
+        futures = [executor.submit(_run_file_in_worker, category, filename, export)
+                   for category, filename in items]
+        for (category, filename), future in zip(items, futures):
+            try:
+                result, log = future.result()
+            except Exception as e:
+                print(f"⚠ [{category}] 작업 프로세스 오류: {e}")
+                result = {"category": category, "filename": filename, "skipped": False,
+                          "errors": [f"작업 프로세스 오류: {e}"], "seconds": 0.0}
+            else:
+                print(log, end="")
+            results.append(result)
+    return results
+
+
+def print_summary(results):
+    """파일별 결과 요약 (JSON 순서)"""
+    print("\n📋 파일별 결과")
+    for result in results:
+        label = f"[{result['category']}] {result['filename']}"
+        if result["skipped"]:
+            print(f"  • {label}: 저장소 없음 → 건너뜀")
+        elif result["errors"]:
+            print(f"  ⚠ {label}: 오류 {len(result['errors'])}건 ({result['seconds']:.1f}초)")
+            for message in result["errors"]:
+                print(f"     - {message}")
+        else:
+            print(f"  ✅ {label} ({result['seconds']:.1f}초)")
+
+
+def main(workers=SCORE_WORKERS, export=True):
     # 1) JSON에서 엑셀 파일 목록 로드
     excel_map = load_excel_map(JSON_PATH)
 
     print(f"\n📁 JSON에서 {len(excel_map)}개 항목을 읽었습니다.")
-    for category, filename in excel_map.items():
-        run_all_scores_for_file(category, filename)
-
-    print("\n✅ 모든 파일 처리 완료!")
+    workers = max(1, min(workers, len(excel_map)))
+    started = time.time()
+    if workers > 1:
+        print(f"⚙ {workers}개 프로세스로 병렬 처리")
+        results = run_files_parallel(excel_map, workers, sqlite_repo.REPO_PATH, export)
+    else:
+        results = [run_all_scores_for_file(category, filename, export)
+                   for category, filename in excel_map.items()]
+
+    print_summary(results)
+    failed = sum(1 for r in results if r["errors"])
+    if failed:
+        print(f"\n⚠ 처리 완료 (오류가 있는 파일 {failed}개, {time.time() - started:.1f}초)")
+    else:
+        print(f"\n✅ 모든 파일 처리 완료! ({time.time() - started:.1f}초)")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="4개 엑셀 S/Z + GAP/QUANT/STD 계산")
+    parser.add_argument("--sqlite", nargs="?", const=sqlite_repo.DEFAULT_DB_PATH, metavar="DB",
+                        help="계산한 점수를 SQLite 저장소에도 기록")
+    parser.add_argument("--workers", type=int, default=SCORE_WORKERS,
+                        help="파일별 병렬 처리 프로세스 수 (1이면 순서대로)")
+    parser.add_argument("--no-export", action="store_true",
+                        help="저장소만 갱신하고 엑셀 파일은 만들지 않음")
+    args = parser.parse_args()
+    if args.sqlite:
+        sqlite_repo.set_repo_path(args.sqlite)
+    main(args.workers, export=not args.no_export)
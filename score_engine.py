@@ -0,0 +1,250 @@
+# 점수 일괄 계산 엔진 (종목 × 날짜 행렬 전체를 슬라이딩 윈도우로 한 번에 계산)
+
+import argparse
+import math
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# 윈도우 배열(종목 × 윈도우 수 × window) 1회 처리 최대 원소 수 (메모리 상한)
+CHUNK_ELEMENTS = 4_000_000
+
+# 자체 검증 기본 표본 수 (python score_engine.py)
+SELF_CHECK_SAMPLES = 2_000_000
+
+
+# =========================
+# 1. 반올림
+# =========================
+# 점수는 모두 Decimal(str(v)) → ROUND_HALF_UP 으로 반올림해 왔고, 아래 커널은 같은 결과를 float 연산만으로 계산.
+# - 정수: k + 0.5는 float로 정확히 표현되고 repr도 "k.5"라서 |v| - floor(|v|) >= 0.5 비교와 같음
+# - 소수 자리: 경계 (2j ± 1) / (2·10^d)의 최근접 float와 비교. repr(v)는 v로 돌아오는 가장 짧은 문자열이라
+#   |v| < _decimal_limit(d) 범위(float 간격 < 10^-(d+1))에서는 repr(v) >= 경계 ⇔ v >= float(경계).
+#   범위 밖의 값만 Decimal로 직접 계산
+
+def _decimal_limit(decimals):
+    return 2.0 ** 52 / 10 ** (decimals + 1)
+
+
+def _decimal_round(val, decimals=0):
+    """기준 구현: Decimal(str(v)) → ROUND_HALF_UP (decimals=0이면 int, 아니면 float)"""
+    d = Decimal(str(val))
+    if decimals == 0:
+        return int(d.to_integral_value(rounding=ROUND_HALF_UP))
+    return float(d.quantize(Decimal(1).scaleb(-decimals), rounding=ROUND_HALF_UP))
+
+
+def round_half_up(values, decimals=0):
+    """
+    배열 전체를 Decimal(str(v)) → ROUND_HALF_UP 과 같은 결과(의 float)로 반올림 (NaN은 그대로).
+    - decimals=0: calc_s/calc_z/calc_gap/calc_quant 방식 (정수 값의 float 배열)
+    - decimals=2: calc_std_value 방식 (소수 둘째 자리, -0.0 부호까지 동일)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    mag = np.abs(values)
+    if decimals == 0:
+        whole = np.floor(mag)
+        with np.errstate(invalid="ignore"):
+            out = whole + (mag - whole >= 0.5)
+        return np.copysign(out, values) + 0.0  # 정수 결과라 -0.0 없음
+
+    scale = 10.0 ** decimals
+    with np.errstate(invalid="ignore"):
+        j = np.floor(mag * scale + 0.5)  # 최대 1 차이 → 경계 비교로 보정
+        j -= mag < (2 * j - 1) / (2 * scale)
+        j += mag >= (2 * j + 1) / (2 * scale)
+    out = np.copysign(j / scale, values)
+
+    flat_in = values.reshape(-1)
+    flat_out = out.reshape(-1)
+    for i in np.flatnonzero((mag.reshape(-1) >= _decimal_limit(decimals)) & np.isfinite(flat_in)):
+        flat_out[i] = _decimal_round(float(flat_in[i]), decimals)
+    return out
+
+
+def round_half_up_value(val, decimals=0):
+    """round_half_up의 값 1개 버전 (셀 단위 계산용, decimals=0이면 int 반환)"""
+    val = float(val)  # np.float64가 와도 결과는 int/float
+    mag = abs(val)
+    if decimals == 0:
+        if not mag < 2.0 ** 53:  # 큰 값/NaN/inf는 repr 기준 Decimal 그대로
+            return _decimal_round(val)
+        whole = math.floor(mag)
+        out = whole + (mag - whole >= 0.5)
+        return -out if val < 0 else out
+
+    if not mag < _decimal_limit(decimals):
+        return _decimal_round(val, decimals)
+    scale = 10 ** decimals
+    j = math.floor(mag * scale + 0.5)
+    if mag < (2 * j - 1) / (2 * scale):
+        j -= 1
+    elif mag >= (2 * j + 1) / (2 * scale):
+        j += 1
+    return math.copysign(j / scale, val)
+
+
+# =========================
+# 2. 윈도우별 원점수 (반올림 전)
+# =========================
+
+def _raw_s(windows):
+    """S: 100 × (마지막 - 최소) / (최대 - 최소), 최대 == 최소면 0"""
+    min_val = windows.min(axis=-1)
+    max_val = windows.max(axis=-1)
+    last = windows[..., -1]
+    flat = max_val == min_val
+    with np.errstate(divide="ignore", invalid="ignore"):
+        val = 100 * ((last - min_val) / (max_val - min_val))
+    val[flat] = 0
+    return val
+
+
+def _raw_z(windows):
+    """Z: 50 × (마지막 - 평균) / 표본표준편차, 표준편차 0이면 0"""
+    mean = np.mean(windows, axis=-1)
+    std = np.std(windows, axis=-1, ddof=1)
+    last = windows[..., -1]
+    zero = std == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        val = 50 * ((last - mean) / std)
+    val[zero] = 0
+    return val
+
+
+RAW_FUNCS = {"s": _raw_s, "z": _raw_z}
+
+
+def _window_scores(rows, window, raw_func):
+    """
+    빈 칸 없는 행들(2차원)의 윈도우별 원점수 (행 × (열 수 - window + 1)).
+    - np.mean/np.std를 윈도우 축으로 한 번에 호출 (1차원 호출과 비트 단위로 같은 합산 순서)
+    - 메모리 상한 안에서 행 단위로 나눠 처리
+    """
+    n_rows, n_cols = rows.shape
+    n_windows = n_cols - window + 1
+    out = np.empty((n_rows, n_windows))
+    step = max(1, CHUNK_ELEMENTS // max(1, n_windows * window))
+    for r in range(0, n_rows, step):
+        windows = sliding_window_view(rows[r:r + step], window, axis=1)
+        out[r:r + step] = raw_func(windows)
+    return out
+
+
+# =========================
+# 3. 종목 × 날짜 점수 행렬
+# =========================
+
+def score_matrix(values, window, kind, start=0):
+    """
+    종가 행렬 전체의 S 또는 Z 점수 (calc_s/calc_z와 결과 동일).
+    - values: (종목 × 날짜) 행렬, 빈 칸 NaN
+    - kind: "s" 또는 "z"
+    - start: 이 날짜 열부터만 점수 확정 (종목별 배열도 가능, 증분 갱신 시 반올림 비용 절약)
+    - 반환: 같은 shape의 점수 행렬 (정수 값, 점수 없음 NaN)
+
+    날짜 t의 점수 = t까지의 빈 칸 아닌 값 중 최근 window개로 계산 (개수 부족이면 NaN).
+    빈 칸을 뺀 압축 시계열에서 윈도우 점수를 구한 뒤 (t까지의 유효 개수)로 원래 날짜에 매핑.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_rows, n_cols = values.shape
+    raw_func = RAW_FUNCS[kind]
+    starts = np.broadcast_to(np.asarray(start, dtype=int), (n_rows,))
+    raw = np.full((n_rows, n_cols), np.nan)
+    if n_cols < window:
+        return raw
+
+    valid = ~np.isnan(values)
+    counts = np.cumsum(valid, axis=1)
+    lengths = counts[:, -1]
+
+    # 유효 개수가 같은 행끼리 압축 시계열을 쌓아 한 번에 계산 (빈 칸 없는 행 = 길이 n_cols 묶음)
+    for length in np.unique(lengths[lengths >= window]):
+        rows = np.flatnonzero(lengths == length)
+        compressed = values[rows][valid[rows]].reshape(len(rows), length)
+        scores = _window_scores(compressed, window, raw_func)
+
+        # 날짜 t → 압축 윈도우 (t까지의 유효 개수 - window)
+        pos = counts[rows] - window
+        ready = pos >= 0
+        mapped = np.take_along_axis(scores, np.clip(pos, 0, None), axis=1)
+        raw[rows] = np.where(ready, mapped, np.nan)
+
+    cols = np.arange(n_cols)
+    raw[cols[np.newaxis, :] < starts[:, np.newaxis]] = np.nan
+    return round_half_up(raw)
+
+
+def price_matrix(stocks, key="prices"):
+    """stocks[{'prices': [값 또는 None, ...]}] → (종목 × 날짜) 행렬 (None은 NaN)"""
+    n_cols = max((len(s[key]) for s in stocks), default=0)
+    matrix = np.full((len(stocks), n_cols), np.nan)
+    for i, stock in enumerate(stocks):
+        row = stock[key]
+        matrix[i, :len(row)] = [np.nan if v is None else v for v in row]
+    return matrix
+
+
+# =========================
+# 4. 반올림 자체 검증
+# =========================
+
+def _edge_samples(rng, n, decimals):
+    """반올림 경계((2j ± 1) / (2·10^d))와 그 바로 옆 float, 0/음수/큰 값 위주 표본"""
+    scale = 10 ** decimals
+    j = rng.integers(-10 ** 7, 10 ** 7, n)
+    edges = (2 * j + 1) / (2 * scale)
+    return np.concatenate([
+        edges,
+        np.nextafter(edges, np.inf),
+        np.nextafter(edges, -np.inf),
+        j / scale,
+        rng.uniform(-200, 200, n),
+        rng.normal(0, 1, n) * 10.0 ** rng.integers(-6, 18, n),
+        np.array([0.0, -0.0, 0.5, -0.5, 0.005, -0.005, 1.005, 2.675, 1e15 + 0.5, 2.0 ** 53 + 2]),
+    ])
+
+
+def self_check(samples=SELF_CHECK_SAMPLES, seed=0):
+    """
+    round_half_up / round_half_up_value를 Decimal(str(v)) 기준 구현과 무작위 표본으로 비교.
+    반환: 불일치 개수 (0이면 통과)
+    """
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    for decimals in (0, 2):
+        values = _edge_samples(rng, max(1, samples // 6), decimals)
+        started = time.time()
+        fast = round_half_up(values, decimals)
+        fast_sec = time.time() - started
+
+        started = time.time()
+        expected = [_decimal_round(v, decimals) for v in values.tolist()]
+        decimal_sec = time.time() - started
+
+        bad = 0
+        for v, got, exp in zip(values.tolist(), fast.tolist(), expected):
+            one = round_half_up_value(v, decimals)
+            same = (got == float(exp) and type(one) is type(exp) and one == exp
+                    and math.copysign(1, got) == math.copysign(1, exp) == math.copysign(1, one))
+            if not same:
+                bad += 1
+                if bad <= 5:
+                    print(f"❌ decimals={decimals} v={v!r}: 배열 {got!r} / 값 {one!r} / Decimal {exp!r}")
+        mismatches += bad
+        print(f"• decimals={decimals}: {len(values):,}개, 불일치 {bad}개 "
+              f"(배열 {fast_sec:.2f}초 / Decimal {decimal_sec:.2f}초)")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="반올림 커널 자체 검증 (Decimal 기준 구현과 비교)")
+    parser.add_argument("--samples", type=int, default=SELF_CHECK_SAMPLES, help="표본 수")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    bad = self_check(args.samples, args.seed)
+    print("✅ 반올림 결과 일치" if bad == 0 else f"❌ 불일치 {bad}개")
+    raise SystemExit(1 if bad else 0)
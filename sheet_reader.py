@@ -0,0 +1,74 @@
+# 엑셀 시트 스트리밍 로더 (read-only 시트 → numpy 행렬, 기존 엑셀을 저장소로 가져올 때 사용)
+
+import numpy as np
+
+
+def to_float(v):
+    """셀 값 → float (빈 칸/숫자 아님은 NaN). '22000' 같은 문자열 숫자도 허용"""
+    if v is None or v == "":
+        return np.nan
+    try:
+        return float(v)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def to_date_int(v):
+    """헤더 값 → YYYYMMDD int (날짜가 아니면 None)"""
+    if v is None:
+        return None
+    s = str(v).strip()
+    if s.endswith(".0"):
+        s = s[:-2]
+    if len(s) == 8 and s.isdigit():
+        return int(s)
+    return None
+
+
+def read_matrix(ws):
+    """
+    시트 1개를 행 단위로 흘려 읽어 미리 잡아 둔 행렬에 바로 채움.
+    - 1행: 3열부터 날짜 헤더, 2행부터: 1열 이름 / 2열 코드 / 3열부터 값
+    - 코드가 빈 행은 건너뜀, 날짜가 아닌 헤더 열은 무시
+    - 반환: {'codes', 'names', 'dates'(int, 오름차순), 'values'(종목 × 날짜 float64, 빈 칸 NaN)}
+    """
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None) or ()
+
+    date_cols = []
+    dates = []
+    for col, raw in enumerate(header[2:], 2):
+        d_int = to_date_int(raw)
+        if d_int is not None:
+            date_cols.append(col)
+            dates.append(d_int)
+
+    # 시트 dimension 기준으로 미리 할당 (정보가 틀리면 부족할 때 2배씩 늘림)
+    capacity = max((ws.max_row or 1) - 1, 16)
+    values = np.full((capacity, len(dates)), np.nan)
+    codes, names = [], []
+
+    n = 0
+    for row in rows:
+        if len(row) < 2 or row[1] is None or str(row[1]).strip() == "":
+            continue
+        if n == values.shape[0]:
+            values = np.vstack([values, np.full(values.shape, np.nan)])
+        codes.append(str(row[1]).strip())
+        names.append(row[0])
+        out = values[n]
+        width = len(row)
+        for j, col in enumerate(date_cols):
+            if col < width:
+                out[j] = to_float(row[col])
+        n += 1
+
+    values = values[:n]
+
+    # 같은 날짜 열이 중복되면 마지막 열 기준, 날짜 오름차순 정렬
+    last_col_of = {d: j for j, d in enumerate(dates)}
+    sorted_dates = sorted(last_col_of)
+    if sorted_dates != dates:
+        values = values[:, [last_col_of[d] for d in sorted_dates]]
+
+    return {"codes": codes, "names": names, "dates": sorted_dates, "values": values}
@@ -0,0 +1,364 @@
+# 일봉/점수 SQLite 저장소 (선택 사항, 조건 검색용)
+
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+import ts_store
+
+
+# =========================
+# 1. 설정
+# =========================
+
+# 기본 DB 파일. set_repo_path()로 경로를 지정해야 파이프라인에서 기록함 (기본: 사용 안 함)
+DEFAULT_DB_PATH = "stock_data.sqlite"
+REPO_PATH = None
+
+# executemany 1회당 행 수
+UPSERT_BATCH = 5000
+
+# 다른 프로세스가 쓰는 중일 때 잠금 해제를 기다릴 최대 시간(초) (run_all_scores --workers)
+BUSY_TIMEOUT = 120
+
+BAR_FIELDS = ["open", "high", "low", "close", "volume"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (
+    source TEXT NOT NULL,
+    code   TEXT NOT NULL,
+    name   TEXT,
+    PRIMARY KEY (source, code)
+);
+CREATE TABLE IF NOT EXISTS bars (
+    source TEXT NOT NULL,
+    code   TEXT NOT NULL,
+    date   INTEGER NOT NULL,
+    open   REAL,
+    high   REAL,
+    low    REAL,
+    close  REAL,
+    volume REAL,
+    PRIMARY KEY (source, code, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scores (
+    source TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    code   TEXT NOT NULL,
+    date   INTEGER NOT NULL,
+    value  REAL,
+    PRIMARY KEY (source, metric, code, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_bars_code_date ON bars (code, date);
+CREATE INDEX IF NOT EXISTS idx_scores_metric_date ON scores (metric, date);
+CREATE INDEX IF NOT EXISTS idx_scores_code_date ON scores (code, metric, date);
+"""
+
+_lock = threading.Lock()
+
+
+def set_repo_path(path):
+    """파이프라인 기록 대상 DB 지정 (None이면 기록 안 함)"""
+    global REPO_PATH
+    REPO_PATH = path
+
+
+def is_enabled():
+    return REPO_PATH is not None
+
+
+def source_for(excel_filename):
+    """엑셀 파일명 → source 키 (확장자 제외 파일명)"""
+    return os.path.splitext(os.path.basename(str(excel_filename)))[0]
+
+
+def connect(path=None):
+    """DB 연결 (스키마 없으면 생성)"""
+    conn = sqlite3.connect(path or REPO_PATH or DEFAULT_DB_PATH, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _num(v):
+    if v is None or v == "":
+        return None
+    try:
+        f = float(v)
+    except (ValueError, TypeError):
+        return None
+    return None if np.isnan(f) else f
+
+
+def _executemany(conn, sql, rows):
+    for i in range(0, len(rows), UPSERT_BATCH):
+        conn.executemany(sql, rows[i:i + UPSERT_BATCH])
+
+
+# =========================
+# 2. 일괄 기록 (upsert)
+# =========================
+
+def upsert_symbols(conn, source, names):
+    rows = [(source, str(code), name) for code, name in names.items()]
+    _executemany(conn, """
+        INSERT INTO symbols (source, code, name) VALUES (?, ?, ?)
+        ON CONFLICT (source, code) DO UPDATE SET name = excluded.name
+    """, rows)
+
+
+def upsert_bars(source, data_list, path=None):
+    """fetch 단계 결과(data_list) 기록: 종목 × 일자 1행"""
+    rows = []
+    names = {}
+    for stock in data_list:
+        names[stock['code']] = stock['name']
+        for daily in stock['history'] or []:
+            try:
+                date = int(daily['date'])
+            except (ValueError, TypeError, KeyError):
+                continue
+            rows.append((source, str(stock['code']), date) +
+                        tuple(_num(daily.get(f)) for f in BAR_FIELDS))
+    if not rows:
+        return 0
+
+    with _lock:
+        conn = connect(path)
+        try:
+            with conn:
+                upsert_symbols(conn, source, names)
+                _executemany(conn, """
+                    INSERT INTO bars (source, code, date, open, high, low, close, volume)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (source, code, date) DO UPDATE SET
+                        open = excluded.open, high = excluded.high, low = excluded.low,
+                        close = excluded.close, volume = excluded.volume
+                """, rows)
+        finally:
+            conn.close()
+    return len(rows)
+
+
+def upsert_scores(source, metric, values, names=None, path=None):
+    """
+    점수 기록
+    - values: {code: {date: value}} (점수 시트에 쓴 값 그대로)
+    """
+    rows = []
+    for code, by_date in values.items():
+        for date, v in by_date.items():
+            try:
+                rows.append((source, metric, str(code), int(date), _num(v)))
+            except (ValueError, TypeError):
+                continue
+    if not rows:
+        return 0
+
+    with _lock:
+        conn = connect(path)
+        try:
+            with conn:
+                if names:
+                    upsert_symbols(conn, source, names)
+                _executemany(conn, """
+                    INSERT INTO scores (source, metric, code, date, value) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (source, metric, code, date) DO UPDATE SET value = excluded.value
+                """, rows)
+        finally:
+            conn.close()
+    return len(rows)
+
+
+def import_from_store(excel_filename, path=None):
+    """시계열 저장소(ts_store) 전체를 DB로 옮기기 (최초 적재용)"""
+    store = ts_store.open_store(excel_filename)
+    source = source_for(excel_filename)
+
+    # 일봉: 필드별 행렬을 (종목, 날짜) 행으로 합침
+    bars = {}
+    names = {}
+    for field in BAR_FIELDS:
+        frame = store.frame(field)
+        if frame is None:
+            continue
+        values = np.asarray(frame["values"])
+        for i, code in enumerate(frame["codes"]):
+            names[code] = frame["names"][i]
+            for j in np.flatnonzero(~np.isnan(values[i])):
+                bars.setdefault((code, frame["dates"][j]), {})[field] = float(values[i, j])
+
+    data_list = {}
+    for (code, date), bar in bars.items():
+        data_list.setdefault(code, []).append(dict(bar, date=str(date)))
+    count = upsert_bars(source, [
+        {'code': code, 'name': names.get(code, code), 'history': history}
+        for code, history in data_list.items()
+    ], path)
+
+    # 점수
+    score_count = 0
+    for field in store.fields():
+        if field in BAR_FIELDS or field == "index":
+            continue
+        frame = store.frame(field)
+        values = np.asarray(frame["values"])
+        by_code = {}
+        for i, code in enumerate(frame["codes"]):
+            cols = np.flatnonzero(~np.isnan(values[i]))
+            by_code[code] = {frame["dates"][j]: float(values[i, j]) for j in cols}
+        score_count += upsert_scores(source, field, by_code, path=path)
+
+    print(f"✅ SQLite 적재 완료: {source} (일봉 {count}행, 점수 {score_count}행)")
+
+
+# =========================
+# 3. 조회 API
+# =========================
+
+def _rows(conn, sql, params):
+    conn.row_factory = sqlite3.Row
+    return [dict(r) for r in conn.execute(sql, params)]
+
+
+def get_bars(code, start_date=None, end_date=None, source=None, path=None):
+    """종목 1개의 기간별 일봉 (code, date 인덱스 검색)"""
+    sql = "SELECT source, code, date, open, high, low, close, volume FROM bars WHERE code = ?"
+    params = [str(code)]
+    if start_date:
+        sql += " AND date >= ?"
+        params.append(int(start_date))
+    if end_date:
+        sql += " AND date <= ?"
+        params.append(int(end_date))
+    if source:
+        sql += " AND source = ?"
+        params.append(source)
+    sql += " ORDER BY source, date"
+
+    conn = connect(path)
+    try:
+        return _rows(conn, sql, params)
+    finally:
+        conn.close()
+
+
+def get_scores(metric, start_date=None, end_date=None, codes=None, source=None, path=None):
+    """지표 1개의 기간별 점수 (metric, date 인덱스 검색)"""
+    sql = ("SELECT s.source, s.metric, s.code, y.name, s.date, s.value FROM scores s "
+           "LEFT JOIN symbols y ON y.source = s.source AND y.code = s.code "
+           "WHERE s.metric = ?")
+    params = [metric]
+    if start_date:
+        sql += " AND s.date >= ?"
+        params.append(int(start_date))
+    if end_date:
+        sql += " AND s.date <= ?"
+        params.append(int(end_date))
+    if codes:
+        sql += f" AND s.code IN ({','.join('?' * len(codes))})"
+        params.extend(str(c) for c in codes)
+    if source:
+        sql += " AND s.source = ?"
+        params.append(source)
+    sql += " ORDER BY s.source, s.code, s.date"
+
+    conn = connect(path)
+    try:
+        return _rows(conn, sql, params)
+    finally:
+        conn.close()
+
+
+def latest_dates(metric, count, source=None, conn=None):
+    """지표에 기록된 최근 날짜 count개 (오름차순)"""
+    sql = "SELECT DISTINCT date FROM scores WHERE metric = ?"
+    params = [metric]
+    if source:
+        sql += " AND source = ?"
+        params.append(source)
+    sql += " ORDER BY date DESC LIMIT ?"
+    params.append(int(count))
+    return sorted(r[0] for r in conn.execute(sql, params))
+
+
+def find_crossings(metric, threshold, days=30, direction="up", source=None, path=None):
+    """
+    최근 days일(기록된 날짜 기준) 안에 metric이 threshold를 돌파한 종목.
+    - direction="up": 전일 <= threshold < 당일 / "down": 전일 >= threshold > 당일
+    - 반환: [{'source', 'code', 'name', 'date'(첫 돌파일), 'value', 'crossings'}, ...]
+    """
+    conn = connect(path)
+    try:
+        dates = latest_dates(metric, days + 1, source, conn)
+        if len(dates) < 2:
+            return []
+        # 첫날의 전일 값이 필요하므로 days+1일부터 읽고, 돌파일은 최근 days일로 제한
+        first, window_start = dates[0], dates[1]
+
+        if direction == "up":
+            cond = "prev <= :th AND value > :th"
+        else:
+            cond = "prev >= :th AND value < :th"
+
+        sql = f"""
+            WITH s AS (
+                SELECT source, code, date, value,
+                       LAG(value) OVER (PARTITION BY source, code ORDER BY date) AS prev
+                FROM scores
+                WHERE metric = :metric AND date >= :first
+                {"AND source = :source" if source else ""}
+            )
+            SELECT s.source, s.code, y.name, MIN(s.date) AS date,
+                   s.value AS value, COUNT(*) AS crossings
+            FROM s LEFT JOIN symbols y ON y.source = s.source AND y.code = s.code
+            WHERE s.date >= :window_start AND {cond}
+            GROUP BY s.source, s.code
+            ORDER BY date DESC, s.source, s.code
+        """
+        return _rows(conn, sql, {
+            "metric": metric, "first": first, "window_start": window_start,
+            "th": float(threshold), "source": source,
+        })
+    finally:
+        conn.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="일봉/점수 SQLite 저장소")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    # 하위 명령 뒤에 써도 되도록 각 하위 명령에도 --db (지정하지 않으면 위 기본값 유지)
+    db_option = argparse.ArgumentParser(add_help=False)
+    db_option.add_argument("--db", default=argparse.SUPPRESS)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", parents=[db_option], help="시계열 저장소 → SQLite 적재")
+    p_import.add_argument("files", nargs="+", help="엑셀 파일 경로")
+
+    p_cross = sub.add_parser("crossings", parents=[db_option], help="최근 N일 임계값 돌파 종목")
+    p_cross.add_argument("metric")
+    p_cross.add_argument("threshold", type=float)
+    p_cross.add_argument("--days", type=int, default=30)
+    p_cross.add_argument("--down", action="store_true", help="하향 돌파")
+    p_cross.add_argument("--source")
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        for filename in args.files:
+            import_from_store(filename, args.db)
+    else:
+        rows = find_crossings(args.metric, args.threshold, args.days,
+                              "down" if args.down else "up", args.source, args.db)
+        for r in rows:
+            print(f"{r['source']:<22} {r['code']:<8} {str(r['name'] or ''):<20} {r['date']}  {r['value']:g}")
+        print(f"총 {len(rows)}개 종목")
+
+
+if __name__ == "__main__":
+    main()
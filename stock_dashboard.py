@@ -8,12 +8,14 @@ import streamlit as st
 import subprocess
 import sys
 import pandas as pd
-import openpyxl
 from pathlib import Path
 import bcrypt
 from datetime import datetime, date, timedelta
 import json  # 🔥 4개 엑셀 매핑용
 
+import sqlite_repo
+import ts_store
+
 # ======================================
 # 페이지 설정 (최초 UI 출력 전에 호출)
 # ======================================
@@ -63,6 +65,9 @@ if "show_days_raw" not in st.session_state:
 
 # 🔥 파일 선택 상태
 JSON_PATH = "stock_file_map.json"
+
+# 🔥 조건 검색용 SQLite 저장소 (파일이 있을 때만 '조건 검색' 탭 표시)
+SQLITE_PATH = sqlite_repo.DEFAULT_DB_PATH
 if "selected_category" not in st.session_state:
     # JSON 로드해서 첫 번째 항목을 기본 선택값으로
     try:
@@ -482,6 +487,43 @@ def render_raw_view(close_df, close_range_msg, total_close_days):
         st.rerun()
 
 
+def render_search_view(source):
+    """
+    4️⃣ 조건 검색 탭 (SQLite 저장소)
+    - 최근 N일 안에 지표가 기준값을 돌파한 종목
+    """
+    st.markdown("### 🔎 지표 돌파 종목 검색")
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        metric = st.selectbox("지표", ["z20", "z60", "z120", "s20", "s60", "s120", "gap", "quant", "std"],
+                              key="search_db_metric")
+    with c2:
+        threshold = st.number_input("기준값", value=100.0, step=10.0, key="search_db_threshold")
+    with c3:
+        days = st.number_input("최근 N일", min_value=1, max_value=250, value=30, key="search_db_days")
+    with c4:
+        direction = st.radio("방향", ["상향", "하향"], horizontal=True, key="search_db_direction")
+
+    rows = sqlite_repo.find_crossings(
+        metric, threshold, days=int(days),
+        direction="up" if direction == "상향" else "down",
+        source=source, path=SQLITE_PATH,
+    )
+    if not rows:
+        st.info("조건에 맞는 종목이 없습니다.")
+        return
+
+    df = pd.DataFrame(rows)
+    df["date"] = df["date"].apply(format_excel_date)
+    df = df.rename(columns={"code": "종목코드", "name": "종목명", "date": "첫 돌파일",
+                            "value": metric.upper(), "crossings": "돌파 횟수"})
+    st.dataframe(
+        df[["종목코드", "종목명", "첫 돌파일", metric.upper(), "돌파 횟수"]],
+        width="stretch",
+        hide_index=True,
+    )
+
+
 # ======================================
 # 4. 엑셀 파일 매핑(JSON) 로드
 # ======================================
@@ -552,15 +594,20 @@ if st.session_state.run_update:
         pb = st.progress(0)
         msg = st.empty()
 
+    # SQLite 저장소를 쓰고 있으면 점수도 같이 기록
+    score_args = ["--sqlite", SQLITE_PATH] if Path(SQLITE_PATH).exists() else []
     scripts = [
-        ("run_all_scores.py", "4개 엑셀 S/Z + GAP/QUANT/STD 계산"),
+        # 저장소는 커밋되지 않으므로 data/ 파티션에서 없거나 오래된 저장소만 새로 생성
+        ("partition_store.py", ["build"], "일별 파티션 → 저장소 생성"),
+        # 점수 계산 후 저장소 → 엑셀 내보내기 (다운로드용 사본)
+        ("run_all_scores.py", score_args, "4개 엑셀 S/Z + GAP/QUANT/STD 계산"),
     ]
 
-    for idx, (sc, desc) in enumerate(scripts):
+    for idx, (sc, args, desc) in enumerate(scripts):
         msg.write(f"{desc} 실행 중...")
         try:
             result = subprocess.run(
-                [sys.executable, sc], capture_output=True, text=True, timeout=1800
+                [sys.executable, sc] + args, capture_output=True, text=True, timeout=1800
             )
             if result.returncode == 0:
                 st.sidebar.success(f"{desc} 완료")
@@ -577,37 +624,55 @@ if st.session_state.run_update:
     st.rerun()
 
 # ======================================
-# 8. 선택된 엑셀 파일 로드
+# 8. 선택된 파일의 시계열 저장소 로드
 # ======================================
-if not excel_path.exists():
-    st.error(f"`{selected_filename}` 파일을 찾지 못했습니다. "
+# 엑셀을 셀 단위로 읽지 않고 ts_store의 종목 × 날짜 행렬을 바로 사용
+# (저장소가 원본, 저장소가 없고 예전 엑셀만 있으면 open_store가 1회 가져옴)
+store = ts_store.open_store(str(excel_path))
+if not store.exists():
+    st.error(f"`{selected_filename}` 데이터를 찾지 못했습니다. "
              "왼쪽의 '네 개 파일 전체 데이터 갱신' 버튼으로 먼저 데이터를 생성해 주세요.")
     st.stop()
 
-excel_file = excel_path
-wb = openpyxl.load_workbook(excel_file, data_only=True)
+
+def _frame_value(values, row_idx, col_idx):
+    v = values[row_idx, col_idx]
+    return None if pd.isna(v) else float(v)
+
+
+def _frame_date_infos(frame):
+    """저장소 날짜 축 → [(열 위치, 원본 날짜, datetime, 'YYYY.MM.DD.'), ...]"""
+    return _date_infos(frame["dates"])
+
+
+def _date_infos(dates):
+    infos = []
+    for col_idx, raw in enumerate(dates):
+        dt = _to_datetime(raw)
+        if dt is None:
+            continue
+        infos.append((col_idx, raw, dt, dt.strftime("%Y.%m.%d.")))
+    return infos
+
 
 # ======================================
 # 9. 종목 정보 로딩 (종목 시트)
 # ======================================
 stock_info = {}
-if "종목" in wb.sheetnames:
-    ws = wb["종목"]
-    for r in ws.iter_rows(min_row=2, max_col=2):
-        name = r[0].value
-        code = r[1].value
-        if code and name:
-            stock_info[code] = name
+for name, code, *_ in store.symbols():
+    if code and name:
+        stock_info[code] = name
 
 # ======================================
 # 10. 종합(Z20/Z60/S/GAP/QUANT/STD) 데이터 로딩
 # ======================================
 sheet_names = ["z20", "z60", "z120", "s20", "s60", "s120", "gap", "quant", "std"]
 
-base_ws = None
+# 날짜 축은 manifest에서만 읽고, 행렬은 표시 구간이 걸친 날짜 구간 파일만 로드
+base_dates = []
 for s in sheet_names:
-    if s in wb.sheetnames:
-        base_ws = wb[s]
+    base_dates = store.dates(s)
+    if base_dates:
         break
 
 indicator_df = None
@@ -616,22 +681,9 @@ total_days = 0
 selected_labels = []
 indicator_range_msg = ""
 
-if base_ws:
-    max_col = base_ws.max_column
-
-    # 기준 시트에서 날짜 헤더 수집 (1행, 3열~)
-    for col in range(3, max_col + 1):
-        raw = base_ws.cell(row=1, column=col).value
-        if raw is None:
-            continue
-        dt = _to_datetime(raw)
-        label = format_excel_date(raw)
-        indicator_date_infos.append((col, raw, dt, label))
-
-    indicator_date_infos = sorted(
-        indicator_date_infos,
-        key=lambda x: (x[2] is None, x[2] or datetime.min)
-    )
+if base_dates:
+    # 기준 지표의 날짜 축 (저장소 날짜는 이미 오름차순)
+    indicator_date_infos = _date_infos(base_dates)
 
     total_days = len(indicator_date_infos)
 
@@ -639,6 +691,7 @@ if base_ws:
     start_idx = total_days - show_days
     selected_infos = indicator_date_infos[start_idx:]
     selected_labels = [lbl for _, _, _, lbl in selected_infos]
+    selected_start = selected_infos[0][1]
 
     oldest_label = selected_infos[0][3]
     latest_label = selected_infos[-1][3]
@@ -651,25 +704,16 @@ if base_ws:
     data_dict = {code: {"종목코드": code, "종목명": name}
                  for code, name in stock_info.items()}
 
-    # 시트별 데이터 채우기 (날짜 문자열 기준 매칭)
+    # 지표별 데이터 채우기 (날짜 문자열 기준 매칭)
     for s in sheet_names:
-        if s not in wb.sheetnames:
+        frame = store.frame(s, start=selected_start)
+        if frame is None:
             continue
 
-        ws = wb[s]
-        max_row_s = ws.max_row
-        max_col_s = ws.max_column
-
-        label_to_col = {}
-        for col in range(3, max_col_s + 1):
-            raw = ws.cell(row=1, column=col).value
-            if raw is None:
-                continue
-            lbl = format_excel_date(raw)
-            label_to_col[lbl] = col
+        label_to_col = {lbl: col for col, _, _, lbl in _frame_date_infos(frame)}
+        values = frame["values"]
 
-        for r in range(2, max_row_s + 1):
-            code = ws.cell(row=r, column=2).value
+        for r, code in enumerate(frame["codes"]):
             if code not in data_dict:
                 continue
 
@@ -678,7 +722,7 @@ if base_ws:
                 if col_idx is None:
                     val = None
                 else:
-                    val = ws.cell(row=r, column=col_idx).value
+                    val = _frame_value(values, r, col_idx)
 
                 data_dict[code][(lbl, s.upper())] = val
 
@@ -692,42 +736,15 @@ else:
 # ======================================
 close_df = None
 close_date_infos = []
-total_close_days = 0
 close_range_msg = ""
 
-if "종가" in wb.sheetnames:
-    ws = wb["종가"]
-    max_col_c = ws.max_column
-
-    # 날짜 헤더
-    for col in range(3, max_col_c + 1):
-        raw = ws.cell(row=1, column=col).value
-        if raw is None:
-            continue
-
-        dt = _to_datetime(raw)
-
-        if dt is None:
-            digits = "".join(ch for ch in str(raw) if ch.isdigit())
-            if len(digits) == 8:
-                dt = datetime.strptime(digits, "%Y%m%d")
-
-        if dt is None:
-            continue
-
-        label = dt.strftime("%Y.%m.%d.")
-        close_date_infos.append((col, raw, dt, label))
-
-    close_date_infos = sorted(
-        close_date_infos,
-        key=lambda x: (x[2] is None, x[2] or datetime.min)
-    )
-
-    total_close_days = len(close_date_infos)
-
-    show_raw = min(st.session_state.show_days_raw, total_close_days)
-    start_idx = total_close_days - show_raw
-    selected_close_infos = close_date_infos[start_idx:]
+total_close_days = len(store.dates("close"))
+close_frame = store.frame("close", last=st.session_state.show_days_raw)
+if close_frame is not None and close_frame["dates"]:
+    # 최근 show_days_raw일만 로드했으므로 로드한 날짜 전체가 표시 구간
+    close_date_infos = _frame_date_infos(close_frame)
+    show_raw = len(close_date_infos)
+    selected_close_infos = close_date_infos
 
     oldest_label = selected_close_infos[0][3]
     latest_label = selected_close_infos[-1][3]
@@ -740,62 +757,29 @@ if "종가" in wb.sheetnames:
     close_dict = {code: {"종목명": name, "종목코드": code}
                   for code, name in stock_info.items()}
 
-    max_row_c = ws.max_row
-
-    for r in range(2, max_row_c + 1):
-        code = ws.cell(row=r, column=2).value
+    close_values = close_frame["values"]
+    for r, code in enumerate(close_frame["codes"]):
         if code not in close_dict:
             continue
 
         for col_idx, raw, dt, label in selected_close_infos:
-            val = ws.cell(row=r, column=col_idx).value
-            close_dict[code][label] = val
+            close_dict[code][label] = _frame_value(close_values, r, col_idx)
 
     close_df = pd.DataFrame.from_dict(close_dict, orient="index").reset_index(drop=True)
 
-    # 컬럼 이름을 yyyy.mm.dd. 형식으로 통일
-    rename_map = {}
-    for col in close_df.columns:
-        if col in ["종목코드", "종목명"]:
-            continue
-        rename_map[col] = format_excel_date(col)
-
-    close_df = close_df.rename(columns=rename_map)
-
 # ======================================
 # 12. 지수(KOSPI/KOSDAQ/KOSPI200) 데이터 로딩
 # ======================================
 index_df = None
 
-if "지수" in wb.sheetnames and indicator_df is not None and selected_labels:
-    ws_idx = wb["지수"]
-    max_col_i = ws_idx.max_column
-
-    index_date_infos = []
-    for col in range(3, max_col_i + 1):
-        raw = ws_idx.cell(row=1, column=col).value
-        if raw is None:
-            continue
-
-        dt = _to_datetime(raw)
-        if dt is None:
-            digits = "".join(ch for ch in str(raw) if ch.isdigit())
-            if len(digits) == 8:
-                dt = datetime.strptime(digits, "%Y%m%d")
-        if dt is None:
-            continue
-
-        label = dt.strftime("%Y.%m.%d.")
-        index_date_infos.append((col, raw, dt, label))
-
-    label_to_col_idx = {label: col for col, raw, dt, label in index_date_infos}
+index_frame = store.frame("index", start=selected_start) if selected_labels else None
+if index_frame is not None and indicator_df is not None and selected_labels:
+    label_to_col_idx = {label: col for col, raw, dt, label in _frame_date_infos(index_frame)}
 
     index_rows = []
-    max_row_i = ws_idx.max_row
+    index_values = index_frame["values"]
 
-    for r in range(2, max_row_i + 1):
-        name = ws_idx.cell(row=r, column=1).value
-        code = ws_idx.cell(row=r, column=2).value
+    for r, (code, name) in enumerate(zip(index_frame["codes"], index_frame["names"])):
         if not name or not code:
             continue
 
@@ -809,7 +793,7 @@ if "지수" in wb.sheetnames and indicator_df is not None and selected_labels:
             if col_idx is None:
                 val = None
             else:
-                val = ws_idx.cell(row=r, column=col_idx).value
+                val = _frame_value(index_values, r, col_idx)
             row_dict[lbl] = val
 
         index_rows.append(row_dict)
@@ -817,15 +801,12 @@ if "지수" in wb.sheetnames and indicator_df is not None and selected_labels:
     if index_rows:
         index_df = pd.DataFrame(index_rows)
 
-# ======================================
-# 13. 엑셀 파일 닫기
-# ======================================
-wb.close()
-
 # ======================================
 # 14. 탭 구성 및 렌더링
 # ======================================
-tab_total, tab_metric, tab_raw = st.tabs(["1️⃣ 종합", "2️⃣ 지표별", "3️⃣ 원자료"])
+has_sqlite = Path(SQLITE_PATH).exists()
+tab_names = ["1️⃣ 종합", "2️⃣ 지표별", "3️⃣ 원자료"] + (["4️⃣ 조건 검색"] if has_sqlite else [])
+tab_total, tab_metric, tab_raw, *tab_extra = st.tabs(tab_names)
 
 with tab_total:
     if indicator_df is None:
@@ -851,5 +832,9 @@ with tab_raw:
     else:
         render_raw_view(close_df, close_range_msg, total_close_days)
 
+if has_sqlite:
+    with tab_extra[0]:
+        render_search_view(sqlite_repo.source_for(selected_filename))
+
 st.markdown("---")
 st.caption("Created by Alicia")
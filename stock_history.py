@@ -1,10 +1,34 @@
+import argparse
 import json
 import requests
 from datetime import datetime, timedelta
-import openpyxl
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import exchange_resolver
+import fetch_cache
+import partition_store
+import sqlite_repo
+import ts_store
+from fetch_journal import FetchJournal, prune_journals
+from kis_client import kis_get, kis_post
+from rate_limiter import report_api_rate
+from token_store import get_access_token
+from trading_calendar import last_closed_session, pending_sessions, today_in_market
+
+
+# 동시에 진행할 시세 요청 수 (스레드 수)
+# - 실제 초당 호출 수는 rate_limiter의 적응형 토큰 버킷이 제한
+FETCH_WORKERS = 8
+
+# 백필 시 종목당 최대 연속조회 페이지 수 (해외: 페이지당 100일)
+BACKFILL_MAX_PAGES = 30
+
+# 국내 백필 구간 크기(달력일). 국내 일별 시세는 요청당 최대 100건이므로
+# 140일(영업일 약 96일) 단위로 나눠 요청
+BACKFILL_WINDOW_DAYS = 140
+
+# 관심종목(멀티종목) 시세조회 1회당 최대 종목 수
+MULTI_QUOTE_BATCH = 30
 
 
 # =========================
@@ -33,8 +57,6 @@ def load_file_config(file_path='stock_file_map.json'):
 
 def get_token(api_key, api_secret, domain):
     """한국투자증권 API 토큰 발급 요청"""
-    url = f"{domain}/oauth2/tokenP"
-
     headers = {
         "content-type": "application/json",
         "appKey": api_key,
@@ -48,7 +70,7 @@ def get_token(api_key, api_secret, domain):
     }
 
     try:
-        resp = requests.post(url, headers=headers, json=data)
+        resp = kis_post(domain, "/oauth2/tokenP", headers=headers, json_body=data)
 
         if resp.status_code != 200:
             print(f"❌ 토큰 요청 실패: HTTP {resp.status_code}")
@@ -80,8 +102,6 @@ def fetch_stock_daily_history(access_token, domain, symbol, start_date, end_date
     국내 주식/ETF 기간별 시세 (일별)
     /uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice
     """
-    endpoint = f"{domain}/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice"
-
     params = {
         "FID_COND_MRKT_DIV_CODE": "J",    # 주식 시장 구분
         "FID_INPUT_ISCD": symbol,         # 종목코드
@@ -92,19 +112,13 @@ def fetch_stock_daily_history(access_token, domain, symbol, start_date, end_date
         "FID_COMP_ICD": symbol,
     }
 
-    headers = {
-        "content-type": "application/json; charset=utf-8",
-        "authorization": f"Bearer {access_token}",
-        "appkey": app_key,
-        "appsecret": app_secret,
-        "tr_id": "FHKST03010100",     # 주식 일별 시세
-        "custtype": "P",
-        "seq_no": "0",
-        "locale": "ko_KR",
-    }
-
     try:
-        resp = requests.get(endpoint, headers=headers, params=params, timeout=10)
+        resp = kis_get(
+            domain, "/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice",
+            "FHKST03010100",     # 주식 일별 시세
+            params, access_token, app_key, app_secret,
+            extra_headers={"seq_no": "0", "locale": "ko_KR"}
+        )
 
         if resp.status_code != 200:
             print(f"❌ 국내 시세 HTTP {resp.status_code} 에러: {resp.text}")
@@ -136,107 +150,177 @@ def fetch_stock_daily_history(access_token, domain, symbol, start_date, end_date
 
 
 def fetch_overseas_daily_history(access_token, domain, market_code, symbol,
-                                 start_date, end_date, app_key=None, app_secret=None):
+                                 start_date, end_date, app_key=None, app_secret=None,
+                                 max_pages=1):
     """
     해외 주식/ETF 기간별 시세 (일/주/월)
     /uapi/overseas-price/v1/quotations/dailyprice
-    - 여기서는 일봉(GUBN=0), BYMD=end_date 기준으로 최근 100개 받아서
-      date 필터링(start_date~end_date)만 적용
+    - 일봉(GUBN=0), BYMD=end_date 기준으로 과거 방향 100개씩 조회
+    - max_pages > 1이면 연속조회(tr_cont=N, KEYB)로 start_date에 닿을 때까지
+      이전 페이지를 이어서 받음 (페이지마다 BYMD를 직전 페이지 가장 오래된 날 전날로 이동)
+    - 결과는 date 필터링(start_date~end_date) 후 과거 → 최신 정렬
     """
-    endpoint = f"{domain}/uapi/overseas-price/v1/quotations/dailyprice"
+    by_date = {}
+    bymd = end_date
+    tr_cont = ""
 
-    headers = {
-        "content-type": "application/json; charset=utf-8",
-        "authorization": f"Bearer {access_token}",
-        "appkey": app_key,
-        "appsecret": app_secret,
-        "tr_id": "HHDFS76240000",   # 해외 주식 기간별 시세
-        "custtype": "P",
-    }
+    try:
+        for _ in range(max(1, max_pages)):
+            params = {
+                "AUTH": "",
+                "EXCD": market_code,   # 예: "NAS"
+                "SYMB": symbol,        # 예: "AAPL"
+                "GUBN": "0",           # 0: 일, 1: 주, 2: 월
+                "BYMD": bymd,          # 기준일 (이 날 포함 과거 방향 최대 100개)
+                "MODP": "0",           # 0: 원주가, 1: 수정주가
+                "KEYB": "",            # 연속조회 키 (공백, 연속 여부는 tr_cont 헤더로 전달)
+            }
 
-    params = {
-        "AUTH": "",
-        "EXCD": market_code,   # 예: "NAS"
-        "SYMB": symbol,        # 예: "AAPL"
-        "GUBN": "0",           # 0: 일, 1: 주, 2: 월
-        "BYMD": end_date,      # 기준일 (이 날 포함 과거 방향 최대 100개)
-        "MODP": "0",           # 0: 원주가, 1: 수정주가
-        # "KEYB": ""           # 연속조회시 사용, 여기서는 생략
-    }
+            resp = kis_get(
+                domain, "/uapi/overseas-price/v1/quotations/dailyprice",
+                "HHDFS76240000",   # 해외 주식 기간별 시세
+                params, access_token, app_key, app_secret,
+                extra_headers={"tr_cont": tr_cont} if tr_cont else None
+            )
+
+            if resp.status_code != 200:
+                print(f"❌ 해외 시세 HTTP {resp.status_code} 에러: {resp.text}")
+                break
+
+            data = resp.json()
+            rows = data.get("output2")
+            if not rows:
+                # print("❌ 해외 시세 데이터가 비어있습니다")
+                break
+
+            page_dates = []
+            for item in rows:
+                d = item.get("xymd")   # 날짜 (YYYYMMDD)
+                if not d:
+                    continue
+
+                # 필드명은 실제 응답에 따라 필요시 한번 확인
+                by_date[d] = {
+                    "date": d,
+                    "open": float(item.get("open", 0) or 0),
+                    "high": float(item.get("high", 0) or 0),
+                    "low": float(item.get("low", 0) or 0),
+                    "close": float(item.get("clos", 0) or 0),
+                    "volume": int(item.get("tvol", 0) or 0),
+                }
+                page_dates.append(d)
+
+            if not page_dates:
+                break
+
+            # 연속조회 여부: 응답 헤더 tr_cont가 M/F면 다음 페이지 존재
+            oldest = min(page_dates)
+            has_next = resp.headers.get("tr_cont", "") in ("M", "F")
+            if not has_next or (start_date and oldest <= start_date):
+                break
+
+            next_bymd = (datetime.strptime(oldest, "%Y%m%d") - timedelta(days=1)).strftime("%Y%m%d")
+            if next_bymd >= bymd:
+                break
+            bymd = next_bymd
+            tr_cont = "N"
+
+    except Exception as e:
+        print(f"❌ 해외 시세 조회 중 에러: {str(e)}")
+        if not by_date:
+            return None
+
+    if not by_date:
+        return None
+
+    # 과거 → 최신
+    daily_data = sorted(by_date.values(), key=lambda x: x["date"])
+
+    # start_date~end_date로 필터링
+    if start_date:
+        daily_data = [d for d in daily_data if start_date <= d["date"] <= end_date]
+
+    return daily_data
+
+
+def fetch_domestic_multi_quotes(access_token, domain, symbols, app_key=None, app_secret=None):
+    """
+    국내 관심종목(멀티종목) 시세조회 — 최대 30종목 현재가/시고저/거래량
+    /uapi/domestic-stock/v1/quotations/intstock-multprice
+    - 반환: {종목코드: {'open', 'high', 'low', 'close', 'volume'}} (응답 없는 종목은 제외)
+    """
+    params = {}
+    for i, symbol in enumerate(symbols[:MULTI_QUOTE_BATCH], start=1):
+        params[f"FID_COND_MRKT_DIV_CODE_{i}"] = "J"
+        params[f"FID_INPUT_ISCD_{i}"] = symbol
 
     try:
-        resp = requests.get(endpoint, headers=headers, params=params, timeout=10)
+        resp = kis_get(
+            domain, "/uapi/domestic-stock/v1/quotations/intstock-multprice",
+            "FHKST11300006",   # 관심종목(멀티종목) 시세조회
+            params, access_token, app_key, app_secret
+        )
 
         if resp.status_code != 200:
-            print(f"❌ 해외 시세 HTTP {resp.status_code} 에러: {resp.text}")
+            print(f"❌ 국내 멀티시세 HTTP {resp.status_code} 에러: {resp.text}")
             return None
 
         data = resp.json()
-        rows = data.get("output2")
-        if not rows:
-            # print("❌ 해외 시세 데이터가 비어있습니다")
-            return None
+        rows = data.get("output") or []
 
-        daily_data = []
+        quotes = {}
         for item in rows:
-            d = item.get("xymd")   # 날짜 (YYYYMMDD)
-            if not d:
+            code = (item.get("inter_shrn_iscd") or "").strip()
+            close = int(item.get("inter2_prpr", "0") or 0)
+            if not code or close == 0:
                 continue
-
-            # 필드명은 실제 응답에 따라 필요시 한번 확인
-            daily_data.append({
-                "date": d,
-                "open": float(item.get("open", 0) or 0),
-                "high": float(item.get("high", 0) or 0),
-                "low": float(item.get("low", 0) or 0),
-                "close": float(item.get("clos", 0) or 0),
-                "volume": int(item.get("tvol", 0) or 0),
-            })
-
-        # 과거 → 최신
-        daily_data.sort(key=lambda x: x["date"])
-
-        # start_date~end_date로 필터링
-        if start_date:
-            daily_data = [d for d in daily_data if start_date <= d["date"] <= end_date]
-
-        return daily_data
+            quotes[code] = {
+                "open": int(item.get("inter2_oprc", "0") or 0),
+                "high": int(item.get("inter2_hgpr", "0") or 0),
+                "low": int(item.get("inter2_lwpr", "0") or 0),
+                "close": close,
+                "volume": int(item.get("acml_vol", "0") or 0),
+            }
+        return quotes
 
     except Exception as e:
-        print(f"❌ 해외 시세 조회 중 에러: {str(e)}")
+        print(f"❌ 국내 멀티시세 조회 중 에러: {str(e)}")
         return None
 
 
 # =========================
-# 2. 엑셀 관련 함수들
+# 2. 종목 목록 / 저장소 기록
 # =========================
 
 def load_stock_list(filename, market="KR"):
     """
-    Excel 파일에서 종목 목록을 읽어옵니다.
+    엑셀 파일과 짝을 이루는 시계열 저장소에서 종목 목록을 읽어옵니다.
+    (종목 목록은 partition_store build가 data/symbols.csv 종목 마스터로 기록)
     - market="KR" → 코드 6자리 zfill
-    - market="US" → 코드 그대로 사용
+    - market="US" → 코드 그대로 사용, 거래소(NAS/NYS/AMS)가 지정돼 있으면 거래소 지정값으로 등록
     """
     try:
-        wb = openpyxl.load_workbook(filename)
-        if "종목" not in wb.sheetnames:
-            print(f"\n❌ Excel 파일({filename})에 '종목' 시트가 없습니다.")
+        symbols = ts_store.open_store(filename).symbols()
+        if not symbols:
+            print(f"\n❌ [{filename}] 종목 목록이 없습니다. (python partition_store.py build 먼저 실행)")
             return None
-        sheet = wb["종목"]
 
         stocks = []
-        for row in sheet.iter_rows(min_row=2):  # 헤더 제외
-            if row[0].value and row[1].value:
-                raw_code = str(row[1].value).strip()
-                if market == "KR":
-                    code = raw_code.zfill(6)
-                else:
-                    code = raw_code
-
-                stocks.append({
-                    'name': row[0].value,
-                    'code': code
-                })
+        for symbol in symbols:
+            if len(symbol) < 2 or not symbol[0] or not symbol[1]:
+                continue
+            raw_code = str(symbol[1]).strip()
+            if market == "KR":
+                code = raw_code.zfill(6)
+            else:
+                code = raw_code
+                if len(symbol) > 2 and symbol[2]:
+                    exchange_resolver.set_override(code, str(symbol[2]))
+
+            stocks.append({
+                'name': symbol[0],
+                'code': code
+            })
 
         print(f"\n[{filename}]에서 읽어온 종목 목록 ({market}):")
         for stock in stocks:
@@ -245,175 +329,53 @@ def load_stock_list(filename, market="KR"):
         return stocks
 
     except Exception as e:
-        print(f"\n❌ Excel 파일 읽기 실패({filename}): {str(e)}")
+        print(f"\n❌ 종목 목록 읽기 실패({filename}): {str(e)}")
         return None
 
 
-def save_history_to_excel(data_list, filename, market="KR"):
+def save_history_to_store(data_list, filename, market="KR"):
     """
-    각 종목의 일별 OHLC 데이터를
-    시가/고가/저가/종가/거래량 탭으로 나누어 저장.
-    - 행: 종목
-    - 열: 일자
+    각 종목의 일별 OHLCV 데이터를
+    시계열 저장소의 시가/고가/저가/종가/거래량(open/high/low/close/volume) 필드에 병합.
+    - 행: 종목 (새 종목은 코드순 위치에 추가)
+    - 열: 일자 (새 날짜는 열 추가, 이미 있는 날짜는 해당 종목 값만 교체, 과거 구간 백필도 같은 경로)
     market="KR"이면 코드 6자리, "US"면 그대로.
+    같은 값을 일별 파티션(partition_store)과 SQLite(사용 시)에도 기록.
+    엑셀은 여기서 쓰지 않음 (run_all_scores.py 마지막 단계 또는 python ts_store.py export로 생성)
     """
-    try:
-        wb = openpyxl.load_workbook(filename)
-    except FileNotFoundError:
-        wb = openpyxl.Workbook()
-        if 'Sheet' in wb.sheetnames:
-            wb.remove(wb['Sheet'])
-
-    # 모든 날짜 수집
-    all_dates = set()
-    for stock_data in data_list:
-        if stock_data['history']:
-            for daily in stock_data['history']:
-                all_dates.add(daily['date'])
-
-    sorted_dates = sorted(list(all_dates))
-    if not sorted_dates:
+    if not any(stock_data['history'] for stock_data in data_list):
         print("\n❌ 저장할 데이터가 없습니다.")
         return
 
-    sheet_configs = [
-        ('시가', 'open'),
-        ('고가', 'high'),
-        ('저가', 'low'),
-        ('종가', 'close'),
-        ('거래량', 'volume')
-    ]
-
-    for sheet_name, field_name in sheet_configs:
-        # 기존 시트 여부
-        if sheet_name in wb.sheetnames:
-            sheet = wb[sheet_name]
-            existing_dates = []
-            for col in range(3, sheet.max_column + 1):
-                val = sheet.cell(row=1, column=col).value
-                try:
-                    existing_dates.append(int(val))
-                except Exception:
-                    continue
+    store = ts_store.open_store(filename)
+    names = {s['code']: s['name'] for s in data_list}
+    for field in partition_store.BAR_FIELDS:
+        rows = {}
+        for stock_data in data_list:
+            if not stock_data['history']:
+                continue
+            rows[stock_data['code']] = {
+                daily['date']: daily[field] for daily in stock_data['history']
+            }
+        store.upsert(field, rows, names=names, sort_codes=True)
 
-            existing_data = {}
-            for row in range(2, sheet.max_row + 1):
-                name = sheet.cell(row=row, column=1).value
-                code = sheet.cell(row=row, column=2).value
-                if not name or not code:
-                    continue
-                code_str = str(code).strip()
-                if market == "KR":
-                    code_key = code_str.zfill(6)
-                else:
-                    code_key = code_str
-
-                values = {}
-                for col_idx, date_int in enumerate(existing_dates, 3):
-                    values[str(date_int)] = sheet.cell(row=row, column=col_idx).value
-                existing_data[code_key] = {'name': name, 'values': values}
-        else:
-            sheet = wb.create_sheet(sheet_name)
-            existing_dates = []
-            existing_data = {}
+    partition_store.write_bars(market, data_list)
+    if sqlite_repo.is_enabled():
+        sqlite_repo.upsert_bars(sqlite_repo.source_for(filename), data_list)
+    print(f"\n✅ 저장소 저장 완료: {filename} → {store.path}")
 
-        merged_dates = set(existing_dates)
-        for stock_data in data_list:
-            if stock_data['history']:
-                for daily in stock_data['history']:
-                    try:
-                        merged_dates.add(int(daily['date']))
-                    except Exception:
-                        continue
-
-        sorted_dates_all = sorted(list(merged_dates))
-
-        # 헤더
-        sheet.cell(row=1, column=1, value='종목명')
-        sheet.cell(row=1, column=2, value='종목코드')
-        for col_idx, date_int in enumerate(sorted_dates_all, 3):
-            cell = sheet.cell(row=1, column=col_idx)
-            cell.value = date_int
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
-
-        for col_idx in (1, 2):
-            cell = sheet.cell(row=1, column=col_idx)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
-
-        # 종목 코드 전체 집합
-        all_codes = set(existing_data.keys())
-        for stock_data in data_list:
-            all_codes.add(stock_data['code'])
 
-        for row_idx, code in enumerate(sorted(all_codes), start=2):
-            # 이름
-            if code in existing_data:
-                name = existing_data[code]['name']
-            else:
-                # data_list에서 찾기
-                name = next((s['name'] for s in data_list if s['code'] == code), code)
-
-            sheet.cell(row=row_idx, column=1, value=name)
-            sheet.cell(row=row_idx, column=2, value=code)
-
-            # 기존 값
-            values = existing_data.get(code, {}).get('values', {})
-
-            # 신규 값
-            new_values = {}
-            stock_hist = next((s for s in data_list if s['code'] == code), None)
-            if stock_hist and stock_hist['history']:
-                for daily in stock_hist['history']:
-                    try:
-                        new_values[str(int(daily['date']))] = daily[field_name]
-                    except Exception:
-                        continue
-
-            # 날짜별로 값 입력
-            for col_idx, date_int in enumerate(sorted_dates_all, 3):
-                key = str(date_int)
-                val = new_values.get(key, values.get(key, ''))
-                sheet.cell(row=row_idx, column=col_idx, value=val)
-
-        # 열 너비
-        sheet.column_dimensions['A'].width = 20
-        sheet.column_dimensions['B'].width = 14
-        for col_idx in range(3, len(sorted_dates_all) + 3):
-            col_letter = get_column_letter(col_idx)
-            sheet.column_dimensions[col_letter].width = 12
-
-    wb.save(filename)
-    print(f"\n✅ 엑셀 파일 저장 완료: {filename}")
-
-
-def get_latest_date_from_sheet(filename, sheet_name):
-    """지정 시트(종가/거래량 등)에서 가장 최신 날짜를 'YYYYMMDD' 문자열로 반환"""
+def get_latest_date(filename, sheet_name):
+    """저장소에서 지정 시트(종가/거래량/지수 등) 필드의 가장 최신 날짜를 'YYYYMMDD' 문자열로 반환"""
     try:
-        wb = openpyxl.load_workbook(filename)
-        if sheet_name not in wb.sheetnames:
-            return None
-        sheet = wb[sheet_name]
-
-        dates = [sheet.cell(row=1, column=col).value for col in range(3, sheet.max_column + 1)]
-        dates_dt = []
-        for d in dates:
-            try:
-                dates_dt.append(datetime.strptime(str(d), '%Y%m%d'))
-            except Exception:
-                pass
-        if not dates_dt:
-            return None
-        latest = max(dates_dt)
-        return latest.strftime('%Y%m%d')
+        return ts_store.open_store(filename).latest_date(ts_store.SHEET_FIELDS[sheet_name])
     except Exception as e:
-        print(f"❌ 날짜 추출 에러({filename}/{sheet_name}): {e}")
+        print(f"❌ 날짜 확인 에러({filename}/{sheet_name}): {e}")
         return None
 
 
 # =========================
-# 3. 지수(코스피/코스닥) 시트
+# 3. 지수(코스피/코스닥)
 # =========================
 
 def fetch_index_history(access_token, domain, index_code, app_key, app_secret,
@@ -422,8 +384,6 @@ def fetch_index_history(access_token, domain, index_code, app_key, app_secret,
     업종지수 기간별 시세 조회 (일별)
     - index_code: 0001(KOSPI), 1001(KOSDAQ), 2001(KOSPI200)
     """
-    endpoint = f"{domain}/uapi/domestic-stock/v1/quotations/inquire-daily-indexchartprice"
-
     params = {
         "fid_cond_mrkt_div_code": "U",
         "fid_input_iscd": index_code,
@@ -432,17 +392,12 @@ def fetch_index_history(access_token, domain, index_code, app_key, app_secret,
         "fid_period_div_code": "D",
     }
 
-    headers = {
-        "content-type": "application/json; charset=utf-8",
-        "authorization": f"Bearer {access_token}",
-        "appkey": app_key,
-        "appsecret": app_secret,
-        "tr_id": "FHKUP03500100",
-        "custtype": "P",
-    }
-
     try:
-        resp = requests.get(endpoint, headers=headers, params=params, timeout=10)
+        resp = kis_get(
+            domain, "/uapi/domestic-stock/v1/quotations/inquire-daily-indexchartprice",
+            "FHKUP03500100",
+            params, access_token, app_key, app_secret
+        )
 
         if resp.status_code != 200:
             print(f"❌ 업종지수 HTTP {resp.status_code} 오류 ({index_code})")
@@ -474,157 +429,47 @@ def fetch_index_history(access_token, domain, index_code, app_key, app_secret,
         return None
 
 
-def update_index_sheet(access_token, domain, app_key, app_secret,
+def update_index_store(access_token, domain, app_key, app_secret,
                        filename="KR_Stocks_Individual.xlsx"):
     """
-    파일의 '지수' 시트 업데이트
-    - 없으면: 최근 100일치 KOSPI/KOSDAQ/KOSPI200 생성
-    - 있으면: 마지막 날짜 이후 ~ 오늘까지 추가
+    저장소 index 필드('지수' 시트) 업데이트
+    - 없으면: 최근 100일치 KOSPI/KOSDAQ/KOSPI200 조회
+    - 있으면: 마지막 날짜 이후 ~ 마감된 마지막 영업일까지 추가
+      (거래소 달력 기준, 주말/휴장일이나 장중에는 새로 받을 날이 없으면 API 호출 없이 종료)
+    - 같은 값을 일별 파티션(KR_INDEX)에도 기록
     """
-    try:
-        wb = openpyxl.load_workbook(filename)
-    except FileNotFoundError:
-        wb = openpyxl.Workbook()
-        if 'Sheet' in wb.sheetnames:
-            wb.remove(wb['Sheet'])
-
     indices = [
         ("KOSPI", "0001"),
         ("KOSDAQ", "1001"),
         ("KOSPI200", "2001"),
     ]
 
-    today = datetime.now()
-    today_str = today.strftime('%Y%m%d')
-
-    # A. 시트 없는 경우
-    if '지수' not in wb.sheetnames:
-        sheet = wb.create_sheet('지수')
-
-        end_date = today_str
-        start_date = (today - timedelta(days=100)).strftime('%Y%m%d')
-        print(f"\n📈 [지수] 최초 생성: {start_date} ~ {end_date}")
-
-        index_data = {}
-        all_dates = set()
-
-        for name, code in indices:
-            print(f"  ▶ {name} ({code}) 조회 중...")
-            history = fetch_index_history(
-                access_token, domain, code, app_key, app_secret,
-                start_date, end_date
-            )
-            if not history:
-                print(f"    • {name} 데이터 없음")
-                continue
-
-            values = {}
-            for h in history:
-                d = h["date"]
-                v = h["index_value"]
-                if not d or v is None:
-                    continue
-                values[d] = float(v)
-                all_dates.add(d)
-
-            index_data[code] = {
-                "name": name,
-                "code": code,
-                "values": values
-            }
-            print(f"    • {len(values)}일치 데이터 확보")
-
-            time.sleep(0.5)
-
-        if not index_data or not all_dates:
-            print("\n❌ 지수 데이터가 없어 저장하지 않습니다.")
-            wb.save(filename)
-            return
-
-        sorted_dates = sorted(all_dates)
-
-        # 헤더
-        sheet.cell(row=1, column=1, value='업종명')
-        sheet.cell(row=1, column=2, value='업종코드')
-        sheet.cell(row=1, column=1).font = Font(bold=True)
-        sheet.cell(row=1, column=2).font = Font(bold=True)
-        sheet.cell(row=1, column=1).fill = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
-        sheet.cell(row=1, column=2).fill = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
-
-        for col_idx, date_str in enumerate(sorted_dates, 3):
-            cell = sheet.cell(row=1, column=col_idx)
-            cell.value = date_str
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
-
-        # 데이터
-        for row_idx, code in enumerate(sorted(index_data.keys()), start=2):
-            info = index_data[code]
-            sheet.cell(row=row_idx, column=1, value=info["name"])
-            sheet.cell(row=row_idx, column=2, value=info["code"])
-
-            values = info["values"]
-            for col_idx, date_str in enumerate(sorted_dates, 3):
-                val = values.get(date_str, "")
-                sheet.cell(row=row_idx, column=col_idx, value=val)
-
-        sheet.column_dimensions['A'].width = 15
-        sheet.column_dimensions['B'].width = 12
-        for col_idx in range(3, len(sorted_dates) + 3):
-            col_letter = get_column_letter(col_idx)
-            sheet.column_dimensions[col_letter].width = 12
-
-        wb.save(filename)
-        print(f"\n✅ '지수' 시트 최초 생성 완료: {filename}")
-        return
-
-    # B. 시트 있는 경우 → 추가
-    sheet = wb['지수']
-    print("\n📈 [지수] 기존 시트 업데이트 시작")
-
-    existing_dates = []
-    for col in range(3, sheet.max_column + 1):
-        val = sheet.cell(row=1, column=col).value
-        if val:
-            existing_dates.append(str(val))
-
-    existing_data = {}
-    for row in range(2, sheet.max_row + 1):
-        name = sheet.cell(row=row, column=1).value
-        code = sheet.cell(row=row, column=2).value
-        if not code:
-            continue
-        code_str = str(code).strip()
-        values = {}
-        for idx, date_str in enumerate(existing_dates, 3):
-            values[date_str] = sheet.cell(row=row, column=idx).value
-        existing_data[code_str] = {"name": name, "values": values}
+    # 장중 미완성 일봉을 받지 않도록 마감된 영업일까지만 조회
+    end_dt = last_closed_session("KR")
+    end_date = end_dt.strftime('%Y%m%d')
 
-    latest = get_latest_date_from_sheet(filename, "지수")
+    latest = get_latest_date(filename, "지수")
     if latest:
+        if latest >= end_date:
+            print(f"\n⏭ [지수] {latest} 이후 마감된 영업일이 없습니다. 조회 생략")
+            return
         start_dt = datetime.strptime(latest, "%Y%m%d") + timedelta(days=1)
         start_date = start_dt.strftime("%Y%m%d")
-        print(f"  • 마지막 날짜: {latest} → 추가 조회 시작일: {start_date}")
+        print("\n📈 [지수] 기존 데이터 업데이트 시작")
+        print(f"  • 마지막 날짜: {latest} → 추가 조회: {start_date} ~ {end_date}")
     else:
-        start_date = (today - timedelta(days=100)).strftime("%Y%m%d")
-        print(f"  • 기존 날짜 없음 → {start_date} ~ {today_str} 재조회")
-
-    end_date = today_str
-    if datetime.strptime(start_date, "%Y%m%d") > datetime.strptime(end_date, "%Y%m%d"):
-        print("  • 추가할 지수 데이터가 없습니다. (이미 최신)")
-        return
-
-    new_index_data = {}
-    all_dates = set(existing_dates)
+        start_date = (end_dt - timedelta(days=100)).strftime('%Y%m%d')
+        print(f"\n📈 [지수] 최초 생성: {start_date} ~ {end_date}")
 
+    index_data = {}
     for name, code in indices:
-        print(f"  ▶ {name} ({code}) 신규 조회: {start_date} ~ {end_date}")
+        print(f"  ▶ {name} ({code}) 조회 중: {start_date} ~ {end_date}")
         history = fetch_index_history(
             access_token, domain, code, app_key, app_secret,
             start_date, end_date
         )
         if not history:
-            print(f"    • {name} 추가 데이터 없음")
+            print(f"    • {name} 데이터 없음")
             continue
 
         values = {}
@@ -634,63 +479,28 @@ def update_index_sheet(access_token, domain, app_key, app_secret,
             if not d or v is None:
                 continue
             values[d] = float(v)
-            all_dates.add(d)
 
-        new_index_data[code] = {
+        index_data[code] = {
             "name": name,
             "code": code,
             "values": values
         }
-        print(f"    • {len(values)}일치 신규 데이터 확보")
-
-        time.sleep(0.5)
+        print(f"    • {len(values)}일치 데이터 확보")
 
-    if not new_index_data:
-        print("  • 신규 지수 데이터가 없어 업데이트하지 않습니다.")
+    if not any(info["values"] for info in index_data.values()):
+        print("  • 지수 데이터가 없어 저장하지 않습니다.")
         return
 
-    merged_dates = sorted(all_dates)
+    sync_index_store(ts_store.open_store(filename), index_data)
+    print(f"\n✅ 지수 저장 완료: {filename}")
 
-    # 헤더
-    sheet.cell(row=1, column=1, value='업종명')
-    sheet.cell(row=1, column=2, value='업종코드')
-    sheet.cell(row=1, column=1).font = Font(bold=True)
-    sheet.cell(row=1, column=2).font = Font(bold=True)
-    sheet.cell(row=1, column=1).fill = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
-    sheet.cell(row=1, column=2).fill = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
 
-    for col_idx, date_str in enumerate(merged_dates, 3):
-        cell = sheet.cell(row=1, column=col_idx)
-        cell.value = date_str
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color='CCCCCC', end_color='CCCCCC', fill_type='solid')
-
-    all_codes = set(existing_data.keys()) | set([code for _, code in indices])
-
-    for row_idx, code in enumerate(sorted(all_codes), start=2):
-        if code in existing_data:
-            name = existing_data[code]["name"]
-        else:
-            name = next((n for (n, c) in indices if c == code), code)
-
-        sheet.cell(row=row_idx, column=1, value=name)
-        sheet.cell(row=row_idx, column=2, value=code)
-
-        old_values = existing_data.get(code, {}).get("values", {})
-        new_values = new_index_data.get(code, {}).get("values", {})
-
-        for col_idx, date_str in enumerate(merged_dates, 3):
-            val = new_values.get(date_str, old_values.get(date_str, ""))
-            sheet.cell(row=row_idx, column=col_idx, value=val)
-
-    sheet.column_dimensions['A'].width = 15
-    sheet.column_dimensions['B'].width = 12
-    for col_idx in range(3, len(merged_dates) + 3):
-        col_letter = get_column_letter(col_idx)
-        sheet.column_dimensions[col_letter].width = 12
-
-    wb.save(filename)
-    print(f"\n✅ '지수' 시트 업데이트 완료: {filename}")
+def sync_index_store(store, index_data):
+    """지수 값을 저장소 index 필드와 일별 파티션에 병합"""
+    rows = {code: info["values"] for code, info in index_data.items()}
+    names = {code: info["name"] for code, info in index_data.items()}
+    store.upsert("index", rows, names=names, sort_codes=True)
+    partition_store.write_index(index_data)
 
 
 # =========================
@@ -699,101 +509,508 @@ def update_index_sheet(access_token, domain, app_key, app_secret,
 
 def fetch_kr_wrapper(access_token, domain, symbol, start_date, end_date,
                      app_key, app_secret):
-    """국내(개별+ETF) 모두 동일 API 사용"""
-    return fetch_stock_daily_history(
-        access_token, domain, symbol, start_date, end_date,
+    """국내(개별+ETF) 모두 동일 API 사용 (디스크 캐시 경유)"""
+    return fetch_cache.cached_fetch(
+        "domestic-daily", symbol, "KR", start_date, end_date,
+        lambda: fetch_stock_daily_history(
+            access_token, domain, symbol, start_date, end_date,
+            app_key=app_key, app_secret=app_secret
+        )
+    )
+
+
+def fetch_kr_quote_wrapper(access_token, domain, symbols, session_date,
+                           app_key, app_secret):
+    """
+    국내 당일 1개 영업일 증분용: 멀티종목 시세를 session_date 일봉으로 변환
+    - 반환: {종목코드: [일봉 1개]}
+    """
+    quotes = fetch_domestic_multi_quotes(
+        access_token, domain, symbols,
         app_key=app_key, app_secret=app_secret
     )
+    if not quotes:
+        return {}
+    return {code: [dict(q, date=session_date)] for code, q in quotes.items()}
 
 
 def fetch_us_wrapper(access_token, domain, symbol, start_date, end_date,
                      app_key, app_secret):
     """
     미국(개별+ETF) 모두 해외 기간별 시세 API 사용
-    - 여기서는 일단 NASDAQ("NAS") 기준으로 호출
-      (나중에 필요하면 엑셀에 EXCD 컬럼 추가해서 확장)
+    - 거래소(EXCD)는 exchange_resolver로 결정
+      (종목 마스터 거래소 지정값 → us_exchange_map.json 캐시 → NAS/NYS/AMS 순차 시도)
     """
-    return fetch_overseas_daily_history(
-        access_token, domain, market_code="NAS", symbol=symbol,
-        start_date=start_date, end_date=end_date,
-        app_key=app_key, app_secret=app_secret
-    )
+    def _fetch(excd):
+        return fetch_cache.cached_fetch(
+            f"overseas-daily/{excd}", symbol, "US", start_date, end_date,
+            lambda: fetch_overseas_daily_history(
+                access_token, domain, market_code=excd, symbol=symbol,
+                start_date=start_date, end_date=end_date,
+                app_key=app_key, app_secret=app_secret
+            )
+        )
 
+    return exchange_resolver.resolve_and_fetch(symbol, _fetch)
 
-def process_one_file(excel_filename, fetch_func, app_key, app_secret, domain,
-                     access_token, market="KR", update_index=False):
+
+def pool_size(max_workers=None):
+    """동시 요청 수: None이면 호출 시점의 FETCH_WORKERS, 최소 1"""
+    return max(1, FETCH_WORKERS if max_workers is None else max_workers)
+
+
+def fetch_histories(stocks, fetch_func, access_token, domain, start_date, end_date,
+                    app_key, app_secret, max_workers=None, on_result=None):
     """
-    엑셀 파일 1개 처리:
-    - 종목 목록 로드
-    - 종가/거래량 시트 기준으로 날짜 범위 결정
-    - fetch_func으로 각 종목 히스토리 가져오기
-    - 시가/고가/저가/종가/거래량 시트 저장
-    - 필요 시 지수 시트 업데이트
+    종목 목록을 스레드 풀로 동시에 조회.
+    - 동시 요청 수: max_workers (None이면 FETCH_WORKERS)
+    - 초당 호출 수: 각 시세 함수 내부의 공유 토큰 버킷(get_api_limiter)이 제한
+    - on_result(stock, history): 종목 1개 조회가 끝날 때마다 호출 (에러 종목 제외)
+    - 반환: 순차 조회와 동일한 data_list (종목 목록 순서 유지, 데이터 없는 종목 제외)
     """
-    stocks = load_stock_list(excel_filename, market=market)
-    if not stocks:
-        return
+    total = len(stocks)
+    results = [None] * total
 
-    latest_close = get_latest_date_from_sheet(excel_filename, "종가")
-    latest_amount = get_latest_date_from_sheet(excel_filename, "거래량")
+    def _fetch(stock):
+        return fetch_func(
+            access_token, domain,
+            stock['code'], start_date, end_date,
+            app_key, app_secret
+        )
 
-    today = datetime.now()
-    today_str = today.strftime('%Y%m%d')
+    with ThreadPoolExecutor(max_workers=pool_size(max_workers)) as executor:
+        futures = {executor.submit(_fetch, stock): idx for idx, stock in enumerate(stocks)}
+        done = 0
+        for future in as_completed(futures):
+            idx = futures[future]
+            stock = stocks[idx]
+            done += 1
+            try:
+                history = future.result()
+            except Exception as e:
+                print(f"  [{done}/{total}] {stock['name']}({stock['code']}) ... 에러: {e}")
+                continue
 
-    if latest_close and latest_amount:
-        latest_str = max(latest_close, latest_amount)
-        start_dt = datetime.strptime(latest_str, '%Y%m%d') + timedelta(days=1)
-        start_date = start_dt.strftime('%Y%m%d')
-        print(f"\n📅 [{excel_filename}] 추가 조회: {start_date} ~ {today_str}")
-    else:
-        end_dt = today
-        start_date = (end_dt - timedelta(days=100)).strftime('%Y%m%d')
-        print(f"\n📅 [{excel_filename}] 전체 조회(최근 100일): {start_date} ~ {today_str}")
+            if on_result is not None:
+                on_result(stock, history)
 
-    end_date = today_str
+            if history:
+                print(f"  [{done}/{total}] {stock['name']}({stock['code']}) ... 성공 ({len(history)}일)")
+                results[idx] = {
+                    "name": stock['name'],
+                    "code": stock['code'],
+                    "history": history,
+                }
+            else:
+                print(f"  [{done}/{total}] {stock['name']}({stock['code']}) ... 실패 또는 추가 데이터 없음")
 
-    data_list = []
-    print(f"\n총 {len(stocks)}개 종목에 대해 조회합니다... ({excel_filename})")
-    for i, stock in enumerate(stocks, start=1):
-        print(f"  [{i}/{len(stocks)}] {stock['name']}({stock['code']}) ...", end='')
+    return [r for r in results if r is not None]
 
-        history = fetch_func(
+
+def fetch_session_quotes(stocks, quote_func, access_token, domain, session_date,
+                         app_key, app_secret, max_workers=None,
+                         batch_size=MULTI_QUOTE_BATCH, on_result=None):
+    """
+    1개 영업일 증분을 멀티종목 시세로 조회 (batch_size 종목당 요청 1건).
+    - 배치들은 스레드 풀에서 동시에 실행 (초당 호출 수는 공유 토큰 버킷이 제한)
+    - 반환: (data_list, 시세를 못 받은 종목 목록) → 후자는 호출 측에서 일별 시세로 재조회
+    """
+    batches = [stocks[i:i + batch_size] for i in range(0, len(stocks), batch_size)]
+    quotes = {}
+
+    def _fetch(batch):
+        return quote_func(
             access_token, domain,
-            stock['code'], start_date, end_date,
+            [stock['code'] for stock in batch], session_date,
             app_key, app_secret
         )
 
+    with ThreadPoolExecutor(max_workers=pool_size(max_workers)) as executor:
+        futures = [executor.submit(_fetch, batch) for batch in batches]
+        for future in as_completed(futures):
+            try:
+                quotes.update(future.result() or {})
+            except Exception as e:
+                print(f"  멀티시세 배치 조회 에러: {e}")
+
+    data_list = []
+    missing = []
+    for stock in stocks:
+        history = quotes.get(stock['code'])
         if history:
-            print(f"성공 ({len(history)}일)")
             data_list.append({
                 "name": stock['name'],
                 "code": stock['code'],
                 "history": history,
             })
+            if on_result is not None:
+                on_result(stock, history)
         else:
-            print("실패 또는 추가 데이터 없음")
+            missing.append(stock)
 
-        time.sleep(1)
+    print(f"  • 멀티시세 {len(batches)}건 요청으로 {len(data_list)}/{len(stocks)}개 종목 확보")
+    return data_list, missing
 
-    if data_list:
-        save_history_to_excel(data_list, filename=excel_filename, market=market)
-        if update_index and market == "KR":
-            update_index_sheet(
-                access_token=access_token,
-                domain=domain,
-                app_key=app_key,
-                app_secret=app_secret,
-                filename=excel_filename
+
+def plan_backfill_windows(start_date, end_date, window_days=BACKFILL_WINDOW_DAYS):
+    """
+    start_date ~ end_date 구간을 API 1회 조회 크기(window_days) 단위로 분할.
+    - 반환: [(구간시작, 구간끝), ...] 'YYYYMMDD' 문자열, 과거 → 최신 순
+    """
+    start_dt = datetime.strptime(start_date, '%Y%m%d')
+    end_dt = datetime.strptime(end_date, '%Y%m%d')
+
+    windows = []
+    cur = start_dt
+    while cur <= end_dt:
+        win_end = min(cur + timedelta(days=window_days - 1), end_dt)
+        windows.append((cur.strftime('%Y%m%d'), win_end.strftime('%Y%m%d')))
+        cur = win_end + timedelta(days=1)
+    return windows
+
+
+def merge_histories(chunks):
+    """구간별 조회 결과를 날짜 기준으로 중복 제거 후 과거 → 최신 정렬"""
+    by_date = {}
+    for chunk in chunks:
+        for daily in chunk or []:
+            if daily.get('date'):
+                by_date[daily['date']] = daily
+    return [by_date[d] for d in sorted(by_date)]
+
+
+def fetch_histories_chunked(stocks, fetch_func, access_token, domain, windows,
+                            app_key, app_secret, max_workers=None):
+    """
+    (종목 × 구간) 단위로 쪼갠 요청을 하나의 스레드 풀에서 동시에 실행.
+    - 종목별로 구간 결과를 merge_histories로 합쳐 fetch_histories와 같은 data_list 반환
+    """
+    total = len(stocks)
+    chunks = [[] for _ in stocks]
+    remaining = [len(windows)] * total
+    done = 0
+
+    def _fetch(stock, win_start, win_end):
+        return fetch_func(
+            access_token, domain,
+            stock['code'], win_start, win_end,
+            app_key, app_secret
+        )
+
+    with ThreadPoolExecutor(max_workers=pool_size(max_workers)) as executor:
+        futures = {}
+        for idx, stock in enumerate(stocks):
+            for win_start, win_end in windows:
+                futures[executor.submit(_fetch, stock, win_start, win_end)] = idx
+
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                history = future.result()
+            except Exception as e:
+                print(f"  {stocks[idx]['name']}({stocks[idx]['code']}) 구간 조회 에러: {e}")
+                history = None
+            if history:
+                chunks[idx].append(history)
+
+            remaining[idx] -= 1
+            if remaining[idx] == 0:
+                done += 1
+                stock = stocks[idx]
+                merged = merge_histories(chunks[idx])
+                chunks[idx] = merged
+                print(f"  [{done}/{total}] {stock['name']}({stock['code']}) ... "
+                      f"{len(merged)}일 ({len(windows)}개 구간)")
+
+    data_list = []
+    for stock, history in zip(stocks, chunks):
+        if history:
+            data_list.append({
+                "name": stock['name'],
+                "code": stock['code'],
+                "history": history,
+            })
+    return data_list
+
+
+def fetch_us_backfill_wrapper(access_token, domain, symbol, start_date, end_date,
+                              app_key, app_secret):
+    """미국 장기 백필: 연속조회로 start_date까지 여러 페이지 수집 (거래소 결정/디스크 캐시 경유)"""
+    def _fetch(excd):
+        return fetch_cache.cached_fetch(
+            f"overseas-daily-paged/{excd}", symbol, "US", start_date, end_date,
+            lambda: fetch_overseas_daily_history(
+                access_token, domain, market_code=excd, symbol=symbol,
+                start_date=start_date, end_date=end_date,
+                app_key=app_key, app_secret=app_secret,
+                max_pages=BACKFILL_MAX_PAGES
             )
+        )
+
+    return exchange_resolver.resolve_and_fetch(symbol, _fetch)
+
+
+def plan_file_fetch(excel_filename, market="KR"):
+    """
+    엑셀 파일 1개의 조회 계획:
+    - 종목 목록 로드
+    - 저장소 종가/거래량 기준으로 거래소 달력상 새로 받을 영업일 구간 결정
+    - 반환: {'stocks', 'start_date', 'end_date', 'single_session'} 또는 None(조회 생략)
+      single_session: 빠진 영업일이 오늘 하루뿐인지 (멀티종목 시세 사용 가능 여부)
+    """
+    stocks = load_stock_list(excel_filename, market=market)
+    if not stocks:
+        return None
+
+    latest_close = get_latest_date(excel_filename, "종가")
+    latest_amount = get_latest_date(excel_filename, "거래량")
+
+    # 거래소 달력 기준: 마지막 저장일 이후 마감된 영업일만 조회
+    if latest_close and latest_amount:
+        latest_str = max(latest_close, latest_amount)
+        sessions = pending_sessions(market, latest_str)
+        if not sessions:
+            print(f"\n⏭ [{excel_filename}] {latest_str} 이후 마감된 영업일이 없습니다. 조회 생략")
+            return None
+        start_date, end_date = sessions[0], sessions[-1]
+        single_session = len(sessions) == 1 and sessions[0] == today_in_market(market)
+        print(f"\n📅 [{excel_filename}] 추가 조회: {start_date} ~ {end_date} (영업일 {len(sessions)}일)")
     else:
+        end_dt = last_closed_session(market)
+        end_date = end_dt.strftime('%Y%m%d')
+        start_date = (end_dt - timedelta(days=100)).strftime('%Y%m%d')
+        single_session = False
+        print(f"\n📅 [{excel_filename}] 전체 조회(최근 100일): {start_date} ~ {end_date}")
+
+    return {
+        "stocks": stocks,
+        "start_date": start_date,
+        "end_date": end_date,
+        "single_session": single_session,
+    }
+
+
+def fetch_stock_group(stocks, fetch_func, quote_func, journal_name, start_date, end_date,
+                      app_key, app_secret, domain, access_token, max_workers=None):
+    """
+    같은 조회 구간의 종목 묶음 조회:
+    - 종목별 완료 기록을 저널(journal_name)에 남겨, 중단 후 재실행 시 남은 종목만 조회
+    - quote_func이 있으면 멀티종목 시세로 먼저 묶어서 조회, 못 받은 종목만 일별 시세로 재조회
+    - max_workers: 동시 요청 수 (None이면 FETCH_WORKERS)
+    - 반환: (data_list, journal) → 저장이 끝나면 호출 측에서 journal.compact()
+    """
+    journal = FetchJournal(journal_name, start_date, end_date)
+    done_codes = journal.completed_codes()
+    pending = [s for s in stocks if s['code'] not in done_codes]
+    if done_codes:
+        print(f"\n↩ 저널에서 {len(stocks) - len(pending)}개 종목 완료 기록 복원 ({journal_name})")
+
+    if quote_func is not None and pending:
+        print(f"\n총 {len(pending)}개 종목을 멀티종목 시세로 조회합니다... ({journal_name})")
+        _, pending = fetch_session_quotes(
+            pending, quote_func, access_token, domain, start_date,
+            app_key, app_secret, max_workers=max_workers, on_result=journal.record
+        )
+
+    print(f"\n총 {len(pending)}개 종목에 대해 조회합니다... ({journal_name})")
+    fetch_histories(
+        pending, fetch_func, access_token, domain,
+        start_date, end_date, app_key, app_secret,
+        max_workers=max_workers, on_result=journal.record
+    )
+    return journal.data_list(stocks), journal
+
+
+def save_file_results(excel_filename, data_list, market, update_index,
+                      app_key, app_secret, domain, access_token):
+    """시가/고가/저가/종가/거래량 저장소 기록 + 필요 시 지수 업데이트"""
+    if not data_list:
         print(f"\n❌ [{excel_filename}] 저장할 데이터가 없습니다.")
+        return
+
+    save_history_to_store(data_list, filename=excel_filename, market=market)
+    if update_index and market == "KR":
+        update_index_store(
+            access_token=access_token,
+            domain=domain,
+            app_key=app_key,
+            app_secret=app_secret,
+            filename=excel_filename
+        )
+
+
+def process_one_file(excel_filename, fetch_func, app_key, app_secret, domain,
+                     access_token, market="KR", update_index=False, quote_func=None,
+                     max_workers=None):
+    """
+    엑셀 파일 1개 단독 처리 (계획 → 조회 → 저장 → 저널 정리).
+    - 여러 파일을 한 번에 처리할 때는 중복 종목을 합쳐 조회하는 run_fetch_plan 사용
+    - max_workers: 동시 요청 수 (None이면 FETCH_WORKERS)
+    """
+    plan = plan_file_fetch(excel_filename, market=market)
+    if not plan:
+        return
+
+    data_list, journal = fetch_stock_group(
+        plan["stocks"], fetch_func,
+        quote_func if plan["single_session"] else None,
+        excel_filename, plan["start_date"], plan["end_date"],
+        app_key, app_secret, domain, access_token, max_workers
+    )
+    save_file_results(excel_filename, data_list, market, update_index,
+                      app_key, app_secret, domain, access_token)
+    journal.compact()
+
+
+def run_fetch_plan(file_config, category_settings, app_key, app_secret, domain, access_token,
+                   max_workers=None):
+    """
+    전체 카테고리를 한 번에 계획해 여러 파일에 걸친 중복 종목을 1번만 조회:
+    1) 파일별 조회 구간 계획
+    2) (시장, 종목코드)별로 필요한 구간을 합쳐 고유 시계열 목록 작성
+    3) 같은 구간끼리 묶어 조회 (멀티종목 시세/저널/동시 조회 동일 적용, 동시 요청 수 max_workers)
+    4) 결과를 파일별 구간으로 잘라 각 파일의 저장소에 기록
+    """
+    file_plans = []
+    for category_name, excel_filename in file_config.items():
+        print("\n=======================================")
+        print(f"📂 카테고리: {category_name}")
+        print(f"📊 파일: {excel_filename}")
+        print("=======================================")
+
+        cfg = category_settings.get(category_name)
+        if not cfg:
+            print(f"⚠️ {category_name} 에 대한 설정이 없습니다. 건너뜀.")
+            continue
+
+        plan = plan_file_fetch(excel_filename, market=cfg["market"])
+        if plan:
+            file_plans.append((excel_filename, cfg, plan))
+
+    if not file_plans:
+        print("\n⏭ 조회할 카테고리가 없습니다.")
+        return
+
+    # (시장, 종목코드) → 필요한 구간의 합집합
+    series = {}
+    total_refs = 0
+    for _, cfg, plan in file_plans:
+        for stock in plan["stocks"]:
+            total_refs += 1
+            key = (cfg["market"], stock["code"])
+            entry = series.get(key)
+            if entry is None:
+                series[key] = {
+                    "stock": stock,
+                    "cfg": cfg,
+                    "start_date": plan["start_date"],
+                    "end_date": plan["end_date"],
+                    "single_session": plan["single_session"],
+                }
+            else:
+                entry["start_date"] = min(entry["start_date"], plan["start_date"])
+                entry["end_date"] = max(entry["end_date"], plan["end_date"])
+                entry["single_session"] = (entry["single_session"] and plan["single_session"]
+                                           and entry["start_date"] == entry["end_date"])
+
+    print(f"\n🧮 파일별 종목 {total_refs}개 → 고유 시계열 {len(series)}개 "
+          f"(중복 {total_refs - len(series)}개 제거)")
+
+    # 같은 (시장, 구간, 멀티시세 여부)끼리 묶어서 조회
+    groups = {}
+    for (market, _code), entry in series.items():
+        group_key = (market, entry["start_date"], entry["end_date"], entry["single_session"])
+        groups.setdefault(group_key, []).append(entry)
+
+    journal_names = {key: f"plan_{key[0]}_{key[1]}_{key[2]}" for key in groups}
+    prune_journals(keep=journal_names.values())
+
+    histories = {}
+    journals = []
+    for group_key in sorted(groups):
+        market, start_date, end_date, single_session = group_key
+        entries = groups[group_key]
+        cfg = entries[0]["cfg"]
+        print(f"\n🔎 [{market}] {start_date} ~ {end_date}: 고유 종목 {len(entries)}개 조회")
+
+        data_list, journal = fetch_stock_group(
+            [e["stock"] for e in entries], cfg["fetch_func"],
+            cfg.get("quote_func") if single_session else None,
+            journal_names[group_key], start_date, end_date,
+            app_key, app_secret, domain, access_token, max_workers
+        )
+        journals.append(journal)
+        for item in data_list:
+            histories[(market, item["code"])] = item["history"]
+
+    # 파일별로 필요한 구간만 잘라서 저장
+    for excel_filename, cfg, plan in file_plans:
+        data_list = []
+        for stock in plan["stocks"]:
+            history = histories.get((cfg["market"], stock["code"]))
+            if not history:
+                continue
+            history = [d for d in history if plan["start_date"] <= d["date"] <= plan["end_date"]]
+            if history:
+                data_list.append({
+                    "name": stock["name"],
+                    "code": stock["code"],
+                    "history": history,
+                })
+
+        print(f"\n💾 [{excel_filename}] {len(data_list)}/{len(plan['stocks'])}개 종목 저장")
+        save_file_results(excel_filename, data_list, cfg["market"], cfg["update_index"],
+                          app_key, app_secret, domain, access_token)
+
+    for journal in journals:
+        journal.compact()
+
+
+def backfill_one_file(excel_filename, fetch_func, app_key, app_secret, domain,
+                      access_token, start_date, market="KR", window_days=None, max_workers=None):
+    """
+    엑셀 파일 1개 장기 백필:
+    - start_date ~ 오늘 구간을 종목별로 끝까지 조회 (종목 간에는 동시 실행, 동시 요청 수 max_workers)
+    - window_days 지정 시(국내): 구간을 API 크기로 분할해 (종목 × 구간) 동시 조회 후 병합
+    - 결과는 기존 save_history_to_store 병합 경로로 저장 (기존 값/날짜 유지)
+    """
+    stocks = load_stock_list(excel_filename, market=market)
+    if not stocks:
+        return
+
+    end_date = datetime.now().strftime('%Y%m%d')
+    print(f"\n📅 [{excel_filename}] 백필 조회: {start_date} ~ {end_date}")
+    print(f"\n총 {len(stocks)}개 종목에 대해 백필합니다... ({excel_filename})")
+
+    if window_days:
+        windows = plan_backfill_windows(start_date, end_date, window_days)
+        print(f"  • 종목당 {len(windows)}개 구간으로 분할 (구간당 {window_days}일)")
+        data_list = fetch_histories_chunked(
+            stocks, fetch_func, access_token, domain, windows,
+            app_key, app_secret, max_workers
+        )
+    else:
+        data_list = fetch_histories(
+            stocks, fetch_func, access_token, domain,
+            start_date, end_date, app_key, app_secret, max_workers
+        )
+
+    if data_list:
+        save_history_to_store(data_list, filename=excel_filename, market=market)
+    else:
+        print(f"\n❌ [{excel_filename}] 백필할 데이터가 없습니다.")
 
 
 # =========================
 # 5. main
 # =========================
 
-def main():
+def main(backfill_from=None, workers=None):
+    """
+    - backfill_from=None: 평소 일일 증분 조회
+    - backfill_from='YYYYMMDD': 해당 날짜부터 장기 백필 (백필 함수가 있는 카테고리만)
+    - workers: 동시 요청 수 (None이면 FETCH_WORKERS)
+    """
     print(f"\n=== 한국투자증권 API 주식/ETF 시세 히스토리 조회 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) ===")
 
     secrets = load_api_secrets()
@@ -808,46 +1025,86 @@ def main():
     if not file_config:
         return
 
-    print("\n🔄 토큰 발급 요청 중...")
-    token_data = get_token(app_key, app_secret, domain)
-    if not token_data:
+    print("\n🔄 토큰 확인 중...")
+    access_token = get_access_token(app_key, app_secret, domain, issue_func=get_token)
+    if not access_token:
         print("\n❌ 토큰 발급 실패")
         return
-    access_token = token_data['access_token']
 
     # 카테고리별 설정
     # - market: 코드 처리(KR: zfill, US: 그대로)
     # - fetch_func: 어떤 API 호출할지
-    # - update_index: 지수 시트 생성/업데이트 여부
+    # - update_index: 지수(index 필드) 생성/업데이트 여부
+    # - backfill_func: 장기 백필용 조회 함수 (None이면 백필 미지원)
+    # - backfill_window_days: 백필 구간 분할 크기 (None이면 분할 없이 연속조회)
+    # - quote_func: 당일 1일 증분용 멀티종목 시세 함수 (None이면 항상 일별 시세)
     category_settings = {
-        "KR_Stocks_Individual": {"market": "KR", "fetch_func": fetch_kr_wrapper, "update_index": True},
-        "KR_Stocks_ETF":        {"market": "KR", "fetch_func": fetch_kr_wrapper, "update_index": False},
-        "US_Stocks_Individual": {"market": "US", "fetch_func": fetch_us_wrapper, "update_index": False},
-        "US_Stocks_ETF":        {"market": "US", "fetch_func": fetch_us_wrapper, "update_index": False},
+        "KR_Stocks_Individual": {"market": "KR", "fetch_func": fetch_kr_wrapper, "update_index": True,
+                                 "backfill_func": fetch_kr_wrapper,
+                                 "backfill_window_days": BACKFILL_WINDOW_DAYS,
+                                 "quote_func": fetch_kr_quote_wrapper},
+        "KR_Stocks_ETF":        {"market": "KR", "fetch_func": fetch_kr_wrapper, "update_index": False,
+                                 "backfill_func": fetch_kr_wrapper,
+                                 "backfill_window_days": BACKFILL_WINDOW_DAYS,
+                                 "quote_func": fetch_kr_quote_wrapper},
+        "US_Stocks_Individual": {"market": "US", "fetch_func": fetch_us_wrapper, "update_index": False,
+                                 "backfill_func": fetch_us_backfill_wrapper,
+                                 "backfill_window_days": None,
+                                 "quote_func": None},
+        "US_Stocks_ETF":        {"market": "US", "fetch_func": fetch_us_wrapper, "update_index": False,
+                                 "backfill_func": fetch_us_backfill_wrapper,
+                                 "backfill_window_days": None,
+                                 "quote_func": None},
     }
 
-    for category_name, excel_filename in file_config.items():
-        print("\n=======================================")
-        print(f"📂 카테고리: {category_name}")
-        print(f"📊 파일: {excel_filename}")
-        print("=======================================")
+    if backfill_from:
+        for category_name, excel_filename in file_config.items():
+            print("\n=======================================")
+            print(f"📂 카테고리: {category_name} (백필)")
+            print(f"📊 파일: {excel_filename}")
+            print("=======================================")
 
-        cfg = category_settings.get(category_name)
-        if not cfg:
-            print(f"⚠️ {category_name} 에 대한 설정이 없습니다. 건너뜀.")
-            continue
+            cfg = category_settings.get(category_name)
+            if not cfg:
+                print(f"⚠️ {category_name} 에 대한 설정이 없습니다. 건너뜀.")
+                continue
+            if not cfg["backfill_func"]:
+                print(f"⚠️ {category_name} 는 백필을 지원하지 않습니다. 건너뜀.")
+                continue
 
-        process_one_file(
-            excel_filename=excel_filename,
-            fetch_func=cfg["fetch_func"],
-            app_key=app_key,
-            app_secret=app_secret,
-            domain=domain,
-            access_token=access_token,
-            market=cfg["market"],
-            update_index=cfg["update_index"]
-        )
+            backfill_one_file(
+                excel_filename=excel_filename,
+                fetch_func=cfg["backfill_func"],
+                app_key=app_key,
+                app_secret=app_secret,
+                domain=domain,
+                access_token=access_token,
+                start_date=backfill_from,
+                market=cfg["market"],
+                window_days=cfg["backfill_window_days"],
+                max_workers=workers
+            )
+    else:
+        run_fetch_plan(file_config, category_settings, app_key, app_secret, domain, access_token,
+                       max_workers=workers)
+
+    report_api_rate()
+    fetch_cache.prune()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="한국투자증권 API 시세 히스토리 조회")
+    parser.add_argument("--backfill-from", metavar="YYYYMMDD",
+                        help="지정 날짜부터 과거 데이터를 끝까지 백필")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS, metavar="N",
+                        help=f"동시 요청 수 (기본 {FETCH_WORKERS}, 초당 호출 수는 API 한도로 별도 제한)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="시세 디스크 캐시(.fetch_cache)를 사용하지 않음")
+    parser.add_argument("--sqlite", nargs="?", const=sqlite_repo.DEFAULT_DB_PATH, metavar="DB",
+                        help="조회한 일봉을 SQLite 저장소에도 기록")
+    args = parser.parse_args()
+    if args.no_cache:
+        fetch_cache.set_cache_enabled(False)
+    if args.sqlite:
+        sqlite_repo.set_repo_path(args.sqlite)
+    main(backfill_from=args.backfill_from, workers=args.workers)
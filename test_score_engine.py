@@ -0,0 +1,75 @@
+# score_engine 반올림 커널 테스트 (기준: Decimal(str(v)) → ROUND_HALF_UP)
+#   python -m pytest -q test_score_engine.py
+
+import math
+
+import numpy as np
+import pytest
+
+import score_engine
+
+
+def _sign(v):
+    return math.copysign(1, v)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_self_check_matches_decimal(seed):
+    """경계값 위주 무작위 표본 (기본 SELF_CHECK_SAMPLES개)에서 배열/값 커널 모두 Decimal과 일치"""
+    assert score_engine.self_check(score_engine.SELF_CHECK_SAMPLES, seed) == 0
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0.0, 0),
+    (-0.0, 0),
+    (0.5, 1),
+    (-0.5, -1),
+    (1.5, 2),
+    (2.5, 3),
+    (-2.5, -3),
+    (0.49999999999999994, 0),
+    (4503599627370495.5, 4503599627370496),
+    (1e15 + 0.5, 1000000000000001),
+    (2.0 ** 53, 2 ** 53),
+    (2.0 ** 53 + 2, 2 ** 53 + 2),
+])
+def test_integer_edges(value, expected):
+    """정수 반올림: 값 커널은 int, 배열 커널은 같은 값의 float (-0.0도 Decimal처럼 +0)"""
+    assert score_engine._decimal_round(value) == expected
+
+    one = score_engine.round_half_up_value(value)
+    assert type(one) is int and one == expected
+
+    got = score_engine.round_half_up(np.array([value]))[0]
+    assert got == float(expected) and _sign(got) == _sign(expected)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0.0, 0.0),
+    (-0.0, -0.0),
+    (0.005, 0.01),
+    (-0.005, -0.01),
+    (0.125, 0.13),
+    (-0.125, -0.13),
+    (1.005, 1.01),
+    (2.675, 2.68),
+    (1e15 + 0.5, 1e15 + 0.5),
+    (2.0 ** 53, 2.0 ** 53),
+])
+def test_two_decimal_edges(value, expected):
+    """소수 둘째 자리 반올림 (STD): repr 기준이라 1.005 → 1.01, -0.0은 부호 유지"""
+    assert score_engine._decimal_round(value, 2) == expected
+
+    one = score_engine.round_half_up_value(value, 2)
+    assert type(one) is float and one == expected and _sign(one) == _sign(expected)
+
+    got = score_engine.round_half_up(np.array([value]), 2)[0]
+    assert got == expected and _sign(got) == _sign(expected)
+
+
+@pytest.mark.parametrize("decimals", [0, 2])
+def test_array_keeps_nan(decimals):
+    """배열 커널: 빈 칸(NaN)은 NaN 그대로, 나머지 원소는 영향 없음"""
+    got = score_engine.round_half_up(np.array([np.nan, 2.5, -0.5]), decimals)
+    assert np.isnan(got[0])
+    assert got[1:].tolist() == ([3.0, -1.0] if decimals == 0 else [2.5, -0.5])
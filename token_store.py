@@ -0,0 +1,115 @@
+# 접근토큰 디스크 캐시 (만료 시각 기반 재사용)
+
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows 등: 파일 잠금 없이 동작
+    fcntl = None
+
+
+TOKEN_CACHE_PATH = ".kis_token.json"
+TOKEN_REFRESH_MARGIN = timedelta(minutes=30)   # 만료 30분 전부터는 새로 발급
+
+KST = timezone(timedelta(hours=9))
+EXPIRED_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _now_kst():
+    """토큰 만료 시각(access_token_token_expired)은 KST 기준 문자열"""
+    return datetime.now(KST).replace(tzinfo=None)
+
+
+def _cache_key(api_key, domain):
+    """appkey 원문을 파일에 남기지 않도록 해시로 구분"""
+    digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    return f"{domain}|{digest}"
+
+
+@contextmanager
+def _locked(path):
+    """캐시 파일 옆 .lock 파일로 프로세스 간 배타 잠금"""
+    lock_file = open(f"{path}.lock", "a")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def _read_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_cache(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    try:
+        os.chmod(tmp_path, 0o600)
+    except OSError:
+        pass
+    os.replace(tmp_path, path)
+
+
+def _expiry_of(token_data):
+    """토큰 응답에서 만료 시각(KST) 추출. 없으면 expires_in으로 계산"""
+    expired = token_data.get("access_token_token_expired")
+    if expired:
+        try:
+            return datetime.strptime(expired, EXPIRED_FORMAT)
+        except ValueError:
+            pass
+    expires_in = token_data.get("expires_in")
+    try:
+        return _now_kst() + timedelta(seconds=int(expires_in))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_access_token(api_key, api_secret, domain, issue_func, cache_path=TOKEN_CACHE_PATH):
+    """
+    캐시된 토큰이 유효하면 재사용, 아니면 issue_func으로 발급 후 저장.
+    - issue_func(api_key, api_secret, domain) → 토큰 응답 dict 또는 None
+    - 잠금 상태에서 확인·발급·저장하므로 동시에 뜬 프로세스도 토큰을 한 번만 발급
+    - 반환: access_token 문자열 또는 None
+    """
+    key = _cache_key(api_key, domain)
+
+    with _locked(cache_path):
+        cache = _read_cache(cache_path)
+        entry = cache.get(key)
+        if entry:
+            try:
+                expires_at = datetime.strptime(entry["access_token_token_expired"], EXPIRED_FORMAT)
+                if _now_kst() < expires_at - TOKEN_REFRESH_MARGIN:
+                    print(f"✅ 캐시된 토큰 재사용 (만료: {entry['access_token_token_expired']})")
+                    return entry["access_token"]
+            except (KeyError, ValueError):
+                pass
+
+        token_data = issue_func(api_key, api_secret, domain)
+        if not token_data:
+            return None
+
+        expires_at = _expiry_of(token_data)
+        if expires_at is not None:
+            cache[key] = {
+                "access_token": token_data["access_token"],
+                "access_token_token_expired": expires_at.strftime(EXPIRED_FORMAT),
+            }
+            _write_cache(cache_path, cache)
+
+        return token_data["access_token"]
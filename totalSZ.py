@@ -1,10 +1,12 @@
 # totalS, totalZ 통합모듈
 
-import openpyxl
-from openpyxl.styles import Font, PatternFill
-from decimal import Decimal, ROUND_HALF_UP
 import numpy as np
 
+import rolling_state
+import score_engine
+import ts_store
+from workbook_session import WorkbookSession
+
 
 # =========================
 # 1. S 점수 (원본 totalS.py 동일)
@@ -23,7 +25,7 @@ def calc_s(prices, window: int):
 
     val = 100 * ((arr[-1] - min_val) / (max_val - min_val))
 
-    score = int(Decimal(str(val)).to_integral_value(rounding=ROUND_HALF_UP))
+    score = score_engine.round_half_up_value(val)
     return score
 
 
@@ -46,125 +48,46 @@ def calc_z(prices, window: int):
     z = (arr[-1] - mean) / std
     val = 50 * z  
 
-    score = int(Decimal(str(val)).to_integral_value(rounding=ROUND_HALF_UP))
+    score = score_engine.round_half_up_value(val)
     return score
 
 
+# 일괄 계산 엔진(score_engine)이 같은 결과를 내는 점수 함수
+BATCH_KINDS = {calc_s: "s", calc_z: "z"}
+
+
 # =========================
 # 3. 종가 시트를 읽어서 dates, stocks 반환
 # =========================
-def get_close_data(filename: str):
-    wb = openpyxl.load_workbook(filename, data_only=True)
-
-    if "종가" not in wb.sheetnames:
-        raise ValueError(f"'{filename}' 파일에 '종가' 시트가 없습니다.")
-
-    sheet = wb["종가"]
-
-    # 날짜 가져오기
-    dates = []
-    for col in range(3, sheet.max_column + 1):
-        v = sheet.cell(row=1, column=col).value
-        if v is None:
-            continue
-        try:
-            dates.append(int(v))
-        except:
-            continue
-
-    # 종목 데이터
-    stocks = []
-    for row in range(2, sheet.max_row + 1):
-        name = sheet.cell(row=row, column=1).value
-        code = sheet.cell(row=row, column=2).value
-        if not name or not code:
-            continue
-
-        prices = []
-        for col in range(3, sheet.max_column + 1):
-            v = sheet.cell(row=row, column=col).value
-            if v is None or v == "":
-                prices.append(None)
-            else:
-                try:
-                    prices.append(float(v))
-                except:
-                    prices.append(None)
-
-        stocks.append({
-            "name": name,
-            "code": str(code),
-            "prices": prices,
-        })
-
-    return dates, stocks
+def get_close_data(filename: str, session=None):
+    # 시계열 저장소의 종가 행렬 로드. 세션이 있으면 세션에서 1회만 읽은 값 공유
+    series = session.series("close") if session else None
+    if series is None:
+        frame = ts_store.load_frame(filename, "close")
+        if frame is not None:
+            series = {
+                "dates": frame["dates"], "codes": frame["codes"], "names": frame["names"],
+                "rows": [[None if np.isnan(v) else float(v) for v in row] for row in frame["values"]],
+            }
+
+    if series is not None:
+        stocks = []
+        for name, code, prices in zip(series["names"], series["codes"], series["rows"]):
+            if not name or not code:
+                continue
+            stocks.append({
+                "name": name,
+                "code": str(code),
+                "prices": prices,
+            })
+        return list(series["dates"]), stocks
+
+    raise ValueError(f"'{filename}' 저장소에 종가(close) 데이터가 없습니다.")
 
 
 # =========================
-# 4. 기존 시트 삭제 후 새로 생성
+# 4. 점수 계산 보조
 # =========================
-def get_existing_dates(sheet):
-    dates = []
-    for col in range(3, sheet.max_column + 1):
-        val = sheet.cell(row=1, column=col).value
-        if val is None:
-            continue
-        try:
-            dates.append(int(val))
-        except:
-            continue
-    return dates
-
-
-def ensure_score_sheet(wb, sheet_name, stocks):
-    if sheet_name not in wb.sheetnames:
-        sheet = wb.create_sheet(sheet_name)
-        sheet.cell(row=1, column=1, value="종목명")
-        sheet.cell(row=1, column=2, value="종목코드")
-        sheet.cell(row=1, column=1).font = Font(bold=True)
-        sheet.cell(row=1, column=2).font = Font(bold=True)
-        sheet.cell(row=1, column=1).fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-        sheet.cell(row=1, column=2).fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-
-        code_to_row = {}
-        for idx, stock in enumerate(stocks, start=2):
-            code = str(stock["code"])
-            sheet.cell(row=idx, column=1, value=stock["name"])
-            sheet.cell(row=idx, column=2, value=code)
-            code_to_row[code] = idx
-
-        return sheet, [], code_to_row, []
-
-    sheet = wb[sheet_name]
-    existing_dates = get_existing_dates(sheet)
-
-    # 보정: 1,2열 헤더 강조
-    sheet.cell(row=1, column=1, value="종목명").font = Font(bold=True)
-    sheet.cell(row=1, column=2, value="종목코드").font = Font(bold=True)
-    sheet.cell(row=1, column=1).fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-    sheet.cell(row=1, column=2).fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-
-    code_to_row = {}
-    new_codes = []
-    max_row = sheet.max_row
-    for row in range(2, max_row + 1):
-        code = sheet.cell(row=row, column=2).value
-        if code is None:
-            continue
-        code_to_row[str(code)] = row
-
-    for stock in stocks:
-        code = str(stock["code"])
-        if code not in code_to_row:
-            max_row += 1
-            sheet.cell(row=max_row, column=1, value=stock["name"])
-            sheet.cell(row=max_row, column=2, value=code)
-            code_to_row[code] = max_row
-            new_codes.append(code)
-
-    return sheet, existing_dates, code_to_row, new_codes
-
-
 def calc_score_for_index(prices, window, idx_in_valid, calc_func):
     target_idx = (window - 1) + idx_in_valid
     if target_idx >= len(prices):
@@ -173,11 +96,49 @@ def calc_score_for_index(prices, window, idx_in_valid, calc_func):
     return calc_func(sub_prices, window)
 
 
+def batch_scorer(stocks, window, calc_func, starts):
+    """
+    calc_s/calc_z 점수를 (code, idx_in_valid) → 점수로 돌려주는 함수 반환 (결과는 calc_score_for_index와 동일).
+    - calc_s/calc_z는 처음 필요할 때 score_engine으로 전체 종목 × 날짜를 한 번에 계산
+    - starts: {code: 이 idx_in_valid부터 필요} (그 이전 열은 반올림하지 않음)
+    - 다른 calc_func는 기존처럼 셀마다 계산
+    """
+    kind = BATCH_KINDS.get(calc_func)
+    stock_map = {str(stock["code"]): stock for stock in stocks}
+    if kind is None:
+        return lambda code, idx: calc_score_for_index(stock_map[code]["prices"], window, idx, calc_func)
+
+    codes = list(stock_map)
+    row_of = {code: i for i, code in enumerate(codes)}
+    batch = {}
+
+    def score(code, idx):
+        col = window - 1 + idx
+        if "scores" not in batch:
+            matrix = score_engine.price_matrix([stock_map[c] for c in codes])
+            start_cols = [window - 1 + starts.get(c, 0) for c in codes]
+            batch["scores"] = score_engine.score_matrix(matrix, window, kind, start=start_cols)
+        scores = batch["scores"]
+        if col >= scores.shape[1]:
+            return None
+        v = scores[row_of[code], col]
+        return None if np.isnan(v) else int(v)
+
+    return score
+
+
 # =========================
 # 5. S/Z 단일 시트 저장 엔진
 # =========================
-def save_score_sheet(filename, dates, stocks, window, sheet_name, calc_func):
-    wb = openpyxl.load_workbook(filename)
+def save_score_sheet(filename, dates, stocks, window, sheet_name, calc_func, session=None):
+    """
+    점수 필드 1개 갱신 (저장소에 기록된 마지막 날짜 이후 + 새 종목만 계산).
+    - session(WorkbookSession)이 있으면 계산 결과만 모으고 저장소 반영은 세션이 1회 수행
+    - 없으면 이 함수 안에서 열고 반영
+    """
+    own_session = session is None
+    if own_session:
+        session = WorkbookSession(filename)
 
     if len(dates) < window:
         print(f"⚠ {sheet_name}: 날짜가 {window}일보다 적어 계산 불가.")
@@ -186,71 +147,106 @@ def save_score_sheet(filename, dates, stocks, window, sheet_name, calc_func):
     # window일 이후 날짜만 계산됨
     valid_dates = dates[window - 1:]
 
-    sheet, existing_dates, code_to_row, new_codes = ensure_score_sheet(wb, sheet_name, stocks)
+    existing_dates, known_codes = session.scored(sheet_name, valid_dates)
     stock_map = {str(stock["code"]): stock for stock in stocks}
     existing_count = len(existing_dates)
+    new_codes = [code for code in stock_map if code not in known_codes] if existing_count > 0 else []
+
+    # 새 종목은 처음부터, 나머지는 새 날짜 열부터 계산
+    new_code_set = set(new_codes)
+    score_of = batch_scorer(
+        stocks, window, calc_func,
+        {code: 0 if code in new_code_set else existing_count for code in stock_map},
+    )
+
+    # 저장소에 반영할 값 {code: {date: score}} (행 순서는 종가 행 순서)
+    written = {code: {} for code in stock_map}
+
+    # 새로 추가된 종목은 기존 날짜도 채워준다.
+    for code in new_codes:
+        for idx_global, date_val in enumerate(existing_dates):
+            score = score_of(code, idx_global)
+            if score is not None:
+                written[code][date_val] = score
 
-    # 새로 추가된 종목은 기존 열도 채워준다.
-    if new_codes and existing_count > 0:
-        for code in new_codes:
-            stock = stock_map.get(code)
-            if not stock:
-                continue
-            row_idx = code_to_row[code]
-            prices = stock["prices"]
-            for idx_global in range(existing_count):
-                col_idx = 3 + idx_global
-                if sheet.cell(row=row_idx, column=col_idx).value not in (None, ""):
-                    continue
-                score = calc_score_for_index(prices, window, idx_global, calc_func)
-                if score is not None:
-                    sheet.cell(row=row_idx, column=col_idx, value=score)
-
+    names = {code: stock["name"] for code, stock in stock_map.items()}
     if existing_count >= len(valid_dates):
-        wb.save(filename)
+        session.record(sheet_name, written, names)
+        if own_session:
+            session.save()
         print(f"✅ {sheet_name}: 신규 날짜 없음 ({filename})")
         return
 
     for idx_global in range(existing_count, len(valid_dates)):
         date_val = valid_dates[idx_global]
-        col_idx = 3 + idx_global
-        header_cell = sheet.cell(row=1, column=col_idx)
-        header_cell.value = date_val
-        header_cell.font = Font(bold=True)
-        header_cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-        sheet.column_dimensions[openpyxl.utils.get_column_letter(col_idx)].width = 10
-
-        for code, row_idx in code_to_row.items():
-            stock = stock_map.get(code)
-            if not stock:
-                continue
-            score = calc_score_for_index(stock["prices"], window, idx_global, calc_func)
+        for code in stock_map:
+            score = score_of(code, idx_global)
             if score is not None:
-                sheet.cell(row=row_idx, column=col_idx, value=score)
-
-    sheet.column_dimensions["A"].width = 20
-    sheet.column_dimensions["B"].width = 12
+                written[code][date_val] = score
 
-    wb.save(filename)
+    session.record(sheet_name, written, names)
+    if own_session:
+        session.save()
     print(f"✅ {sheet_name} 업데이트 완료 ({filename}, 신규 날짜 {len(valid_dates) - existing_count}개)")
 
 
 # =========================
 # 6. S/Z 전체 수행
 # =========================
-def run_total_sz(filename):
+SZ_SHEETS = [("s", 20, "s20"), ("s", 60, "s60"), ("s", 120, "s120"),
+             ("z", 20, "z20"), ("z", 60, "z60"), ("z", 120, "z120")]
+
+
+def scores_in_sync(store, state):
+    """
+    S/Z 점수 필드가 롤링 상태와 같은 날짜까지 기록돼 있는지 (manifest만 봄)
+    - 종가 날짜가 window일 미만이던 필드는 비어 있어야 함
+    """
+    if state.last_date is None:
+        return False
+    known = sum(1 for d in store.dates("close") if d <= state.last_date)
+    for kind, window, sheet in SZ_SHEETS:
+        expected = str(state.last_date) if known >= window else None
+        if store.latest_date(ts_store.SHEET_FIELDS[sheet]) != expected:
+            return False
+    return True
+
+
+def run_total_sz(filename, session=None):
+    """
+    S/Z 6개 시트 계산.
+    - session을 넘기면 같은 세션에 결과만 모으고 저장소 반영은 호출 측에서 session.save()
+    """
     print(f"\n=== S/Z 통합 점수 계산 시작: {filename} ===")
 
-    dates, stocks = get_close_data(filename)
-
-    # ---- S 점수 ----
-    for window, sheet in [(20, "s20"), (60, "s60"), (120, "s120")]:
-        save_score_sheet(filename, dates, stocks, window, sheet, calc_s)
-
-    # ---- Z 점수 ----
-    for window, sheet in [(20, "z20"), (60, "z60"), (120, "z120")]:
-        save_score_sheet(filename, dates, stocks, window, sheet, calc_z)
-
+    own_session = session is None
+    if own_session:
+        session = WorkbookSession(filename)
+
+    # 지난 실행 이후 새 날짜만 종목별 롤링 상태로 계산 (종가는 상태의 마지막 날짜 열부터만 읽음)
+    state = rolling_state.RollingState.load(session.store.path)
+    streamed = state.advance_store(session.store) if scores_in_sync(session.store, state) else None
+
+    if streamed is not None:
+        names, scores = streamed
+        total_days = len(session.store.dates("close"))
+        for kind, window, sheet in SZ_SHEETS:
+            if total_days >= window:
+                session.record(sheet, scores[(kind, window)], names)
+        print(f"✅ S/Z: 롤링 상태로 신규 날짜만 계산 ({filename}, {state.last_date}까지)")
+    else:
+        # 상태가 없거나 과거 종가가 다시 쓰였으면 전체 종가로 일괄 계산 후 상태 재생성
+        revision = session.store.revision
+        dates, stocks = get_close_data(filename, session)
+        for kind, window, sheet in SZ_SHEETS:
+            save_score_sheet(filename, dates, stocks, window, sheet,
+                             calc_s if kind == "s" else calc_z, session)
+        state.rebuild(dates, stocks, revision)
+
+    # 상태는 점수가 저장소에 반영된 뒤에 기록 (점수 없이 상태만 앞서 나가지 않도록)
+    session.keep_state(state)
+    if own_session:
+        session.save()
     print(f"=== S/Z 통합 점수 계산 완료 ===\n")
 
 
@@ -0,0 +1,183 @@
+# 거래소 영업일 달력 (KRX / NYSE·NASDAQ, 네트워크 없이 규칙 기반)
+
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+
+# =========================
+# 1. 거래소 기본 정보
+# =========================
+
+# 시장 코드(KR/US) → 거래소 정보
+# - close: 정규장 마감 시각(현지). 마감 이후에만 그날 일봉이 확정된 것으로 봄
+EXCHANGES = {
+    "KR": {"name": "KRX", "tz": ZoneInfo("Asia/Seoul"), "close": time(15, 40)},
+    "US": {"name": "NYSE", "tz": ZoneInfo("America/New_York"), "close": time(16, 10)},
+}
+
+# KRX 고정 휴장일 (월, 일)
+# - 근로자의날(5/1), 연말 휴장일(12/31) 포함
+KRX_FIXED_HOLIDAYS = [
+    (1, 1), (3, 1), (5, 1), (5, 5), (6, 6), (8, 15),
+    (10, 3), (10, 9), (12, 25), (12, 31),
+]
+
+# KRX 연도별 휴장일: 음력 명절(설/추석/부처님오신날), 대체공휴일, 선거일, 임시공휴일
+# - 매년 KRX 휴장일 공지에 맞춰 다음 해 항목을 추가
+# - 표에 없는 연도는 고정 휴장일/주말만 적용 (휴장일에 1회 헛조회가 생길 뿐 데이터 누락은 없음)
+KRX_YEARLY_HOLIDAYS = {
+    2023: ["20230123", "20230124", "20230529", "20230928", "20230929", "20231002"],
+    2024: ["20240209", "20240212", "20240410", "20240506", "20240515",
+           "20240916", "20240917", "20240918", "20241001"],
+    2025: ["20250127", "20250128", "20250129", "20250130", "20250303", "20250506",
+           "20250603", "20251006", "20251007", "20251008"],
+    2026: ["20260216", "20260217", "20260218", "20260302", "20260525", "20260603",
+           "20260817", "20260924", "20260925", "20260928", "20261005"],
+    2027: ["20270208", "20270209", "20270513", "20270816", "20270914", "20270915",
+           "20270916", "20271004", "20271011", "20271227"],
+}
+
+# NYSE 특별 휴장일 (국가 애도일 등 규칙으로 계산할 수 없는 날)
+NYSE_SPECIAL_CLOSURES = {"20250109"}
+
+
+# =========================
+# 2. 휴장일 계산
+# =========================
+
+def _nth_weekday(year, month, weekday, n):
+    """month의 n번째 weekday(월=0) 날짜"""
+    d = date(year, month, 1)
+    offset = (weekday - d.weekday()) % 7
+    return d + timedelta(days=offset + 7 * (n - 1))
+
+
+def _last_weekday(year, month, weekday):
+    """month의 마지막 weekday 날짜"""
+    d = date(year + (month // 12), month % 12 + 1, 1) - timedelta(days=1)
+    return d - timedelta(days=(d.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """부활절 (그레고리력, Anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    wd = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * wd) // 451
+    month, day = divmod(h + wd - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(d):
+    """토요일 → 금요일, 일요일 → 월요일 대체 휴장"""
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+def nyse_holidays(year):
+    holidays = set()
+
+    # 신정: 일요일이면 월요일 대체, 토요일이면 대체 없음(전년 12/31 개장)
+    new_year = date(year, 1, 1)
+    if new_year.weekday() == 6:
+        holidays.add(new_year + timedelta(days=1))
+    elif new_year.weekday() < 5:
+        holidays.add(new_year)
+
+    holidays.add(_nth_weekday(year, 1, 0, 3))        # Martin Luther King Jr. Day
+    holidays.add(_nth_weekday(year, 2, 0, 3))        # Washington's Birthday
+    holidays.add(_easter(year) - timedelta(days=2))  # Good Friday
+    holidays.add(_last_weekday(year, 5, 0))          # Memorial Day
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))   # Juneteenth
+    holidays.add(_observed(date(year, 7, 4)))        # Independence Day
+    holidays.add(_nth_weekday(year, 9, 0, 1))        # Labor Day
+    holidays.add(_nth_weekday(year, 11, 3, 4))       # Thanksgiving
+    holidays.add(_observed(date(year, 12, 25)))      # Christmas
+
+    holidays.update(
+        datetime.strptime(s, "%Y%m%d").date()
+        for s in NYSE_SPECIAL_CLOSURES if s.startswith(str(year))
+    )
+    return holidays
+
+
+def krx_holidays(year):
+    holidays = {date(year, m, d) for m, d in KRX_FIXED_HOLIDAYS}
+    holidays.update(
+        datetime.strptime(s, "%Y%m%d").date()
+        for s in KRX_YEARLY_HOLIDAYS.get(year, [])
+    )
+    return holidays
+
+
+_holiday_cache = {}
+
+
+def _holidays(market, year):
+    key = (market, year)
+    if key not in _holiday_cache:
+        _holiday_cache[key] = krx_holidays(year) if market == "KR" else nyse_holidays(year)
+    return _holiday_cache[key]
+
+
+# =========================
+# 3. 영업일 조회
+# =========================
+
+def is_trading_day(market, d):
+    """d(date)가 해당 시장 영업일인지"""
+    if d.weekday() >= 5:
+        return False
+    return d not in _holidays(market, d.year)
+
+
+def sessions_between(market, start, end):
+    """start ~ end(포함) 사이의 영업일 목록 (date)"""
+    sessions = []
+    d = start
+    while d <= end:
+        if is_trading_day(market, d):
+            sessions.append(d)
+        d += timedelta(days=1)
+    return sessions
+
+
+def today_in_market(market, now=None):
+    """해당 시장 현지 기준 오늘 날짜 ('YYYYMMDD')"""
+    ex = EXCHANGES[market]
+    return (now or datetime.now(ex["tz"])).astimezone(ex["tz"]).strftime("%Y%m%d")
+
+
+def last_closed_session(market, now=None):
+    """
+    현재 시각 기준 마감까지 끝난 가장 최근 영업일 (date).
+    - now: tz-aware datetime (기본: 현재 시각)
+    """
+    ex = EXCHANGES[market]
+    local_now = (now or datetime.now(ex["tz"])).astimezone(ex["tz"])
+
+    d = local_now.date()
+    if not (is_trading_day(market, d) and local_now.time() >= ex["close"]):
+        d -= timedelta(days=1)
+        while not is_trading_day(market, d):
+            d -= timedelta(days=1)
+    return d
+
+
+def pending_sessions(market, latest_date, now=None):
+    """
+    마지막 저장일(latest_date, 'YYYYMMDD') 이후 마감된 영업일 목록 ('YYYYMMDD').
+    - 비어 있으면 새로 받을 일봉이 없음 → API 호출 생략 가능
+    """
+    last = last_closed_session(market, now)
+    start = datetime.strptime(latest_date, "%Y%m%d").date() + timedelta(days=1)
+    return [d.strftime("%Y%m%d") for d in sessions_between(market, start, last)]
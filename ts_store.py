@@ -0,0 +1,556 @@
+# 시계열 컬럼 저장소 (종목 × 날짜 numpy 행렬, 엑셀 파일별 1개)
+
+import json
+import os
+from bisect import bisect_right
+
+import numpy as np
+import openpyxl
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from sheet_reader import read_matrix, to_date_int, to_float
+
+
+# =========================
+# 1. 저장소 설정
+# =========================
+
+# 엑셀 파일별 저장소 위치: STORE_DIR/<엑셀 파일명(확장자 제외)>/
+STORE_DIR = "data_store"
+MANIFEST_NAME = "manifest.json"
+STORE_VERSION = 2
+
+# 날짜 구간 분할: 최근 HOT_DAYS 거래일은 hot 구간 1개, 그 이전은 기간별(year/quarter) cold 구간
+SEGMENT_PERIOD = "year"
+HOT_SEGMENT = "hot"
+HOT_DAYS = 250
+# 증분 기록으로 hot 구간이 HOT_DAYS + COMPACT_SLACK을 넘으면 자동으로 cold 구간으로 이동
+COMPACT_SLACK = 60
+# 필드별 수정 기록 [revision, 쓴 날짜 중 가장 이른 날짜] 보관 개수 (더 오래된 기록은 '알 수 없음')
+EDIT_LOG_SIZE = 100
+
+# 엑셀 시트 ↔ 저장소 필드
+SHEET_FIELDS = {
+    "시가": "open",
+    "고가": "high",
+    "저가": "low",
+    "종가": "close",
+    "거래량": "volume",
+    "지수": "index",
+    "s20": "s20", "s60": "s60", "s120": "s120",
+    "z20": "z20", "z60": "z60", "z120": "z120",
+    "gap": "gap", "quant": "quant", "std": "std",
+}
+FIELD_SHEETS = {field: sheet for sheet, field in SHEET_FIELDS.items()}
+
+# 날짜 헤더를 문자열('YYYYMMDD')로 쓰는 시트 (나머지는 정수)
+STR_DATE_FIELDS = {"index", "gap", "quant", "std"}
+
+HEADER_FILL = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+HEADER_FONT = Font(bold=True)
+
+
+def store_dir_for(excel_filename, store_dir=STORE_DIR):
+    stem = os.path.splitext(os.path.basename(str(excel_filename)))[0]
+    return os.path.join(store_dir, stem)
+
+
+def segment_key(date, period=SEGMENT_PERIOD):
+    """날짜(int YYYYMMDD) → cold 구간 이름 ('2025' 또는 '2025Q3')"""
+    year, month = date // 10000, (date // 100) % 100
+    if period == "quarter":
+        return f"{year}Q{(month - 1) // 3 + 1}"
+    return str(year)
+
+
+# =========================
+# 2. 저장소
+# =========================
+
+class TimeSeriesStore:
+    """
+    필드(시가/종가/점수 시트 등)마다 종목 × 날짜 float64 행렬을 날짜 구간별 .npy로 저장.
+    - 빈 칸은 NaN
+    - 구간: cold(<필드>.<연도/분기>.npy) 여러 개 + hot(<필드>.hot.npy, 최근 HOT_DAYS일) 1개
+    - 종목 축/구간별 날짜 축은 manifest.json에 기록, 읽을 때 요청한 날짜 범위의 구간만 np.load
+    - 쓰기는 임시 파일 → os.replace로 원자적 교체, manifest는 마지막에 교체
+    - 필드 쓰기마다 저장소 revision을 올리고 필드별로 쓴 가장 이른 날짜를 기록
+      (changed_since로 행렬을 읽지 않고 과거 값이 다시 쓰였는지 확인)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest = {"version": STORE_VERSION, "symbols": [], "fields": {}}
+        self._load_manifest()
+
+    # ---- manifest ----
+    def _manifest_path(self):
+        return os.path.join(self.path, MANIFEST_NAME)
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("version") == STORE_VERSION:
+            self.manifest = data
+
+    def _save_manifest(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f"{self._manifest_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self._manifest_path())
+
+    def exists(self):
+        return os.path.exists(self._manifest_path())
+
+    def clear(self):
+        """모든 필드 삭제 (구 버전 파일 포함 .npy 전부)"""
+        if os.path.isdir(self.path):
+            for file_name in os.listdir(self.path):
+                if file_name.endswith(".npy"):
+                    os.remove(os.path.join(self.path, file_name))
+        self.manifest["fields"] = {}
+
+    def fields(self):
+        return list(self.manifest["fields"].keys())
+
+    def symbols(self):
+        """'종목' 시트 목록 [(종목명, 종목코드[, 거래소]), ...]"""
+        return [tuple(s) for s in self.manifest.get("symbols", [])]
+
+    def set_symbols(self, symbols):
+        """symbols: (종목명, 종목코드) 또는 (종목명, 종목코드, 거래소) — manifest에 바로 저장"""
+        self.manifest["symbols"] = [list(s) for s in symbols]
+        self._save_manifest()
+
+    def codes(self, field):
+        """필드의 종목 축 (행렬은 읽지 않음, 필드가 없으면 빈 목록)"""
+        meta = self.manifest["fields"].get(field)
+        return list(meta["codes"]) if meta else []
+
+    # ---- 수정 기록 ----
+    @property
+    def revision(self):
+        """필드 쓰기 횟수 (clear()해도 유지)"""
+        return self.manifest.get("revision", 0)
+
+    def _log_edit(self, field, first_date):
+        """필드 쓰기 1회 기록 (manifest 파일 저장은 호출 측에서)"""
+        revision = self.revision + 1
+        self.manifest["revision"] = revision
+        meta = self.manifest["fields"][field]
+        edits = meta.setdefault("edits", [])
+        edits.append([revision, int(first_date)])
+        if len(edits) > EDIT_LOG_SIZE:
+            meta["edits_from"] = edits[-EDIT_LOG_SIZE - 1][0]
+            del edits[:-EDIT_LOG_SIZE]
+
+    def changed_since(self, field, revision):
+        """
+        revision 이후 필드에 쓴 가장 이른 날짜 (int, 쓴 적 없으면 None, manifest만 봄)
+        - 필드가 없거나, 기록이 잘렸거나, 이 저장소보다 앞선 revision이면 0 (전체가 바뀐 것으로 취급)
+        """
+        meta = self.manifest["fields"].get(field)
+        if not meta or revision is None or revision > self.revision or revision < meta.get("edits_from", 0):
+            return 0
+        changed = [date for rev, date in meta.get("edits", []) if rev > revision]
+        return min(changed) if changed else None
+
+    # ---- 구간 ----
+    def _segments(self, field):
+        """필드의 구간 목록 (날짜순: cold 구간들 → hot)"""
+        meta = self.manifest["fields"].get(field)
+        return meta["segments"] if meta else []
+
+    def _cold_end(self, field):
+        """cold 구간의 마지막 날짜 (cold 구간이 없으면 None)"""
+        cold = [seg for seg in self._segments(field) if seg["key"] != HOT_SEGMENT and seg["dates"]]
+        return cold[-1]["dates"][-1] if cold else None
+
+    def _load_segment(self, seg, mmap=False):
+        return np.load(os.path.join(self.path, seg["file"]), mmap_mode="r" if mmap else None)
+
+    def _write_segment(self, field, key, codes, dates, values):
+        """구간 1개 저장 후 manifest 구간 목록 갱신 (manifest 파일 저장은 호출 측에서)"""
+        os.makedirs(self.path, exist_ok=True)
+        file_name = f"{field}.{key}.npy"
+        path = os.path.join(self.path, file_name)
+        meta = self.manifest["fields"][field]
+        segments = [seg for seg in meta["segments"] if seg["key"] != key]
+
+        if not dates:
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, np.asarray(values, dtype=np.float64))
+            os.replace(tmp_path, path)
+            segments.append({"key": key, "file": file_name,
+                             "codes": [str(c) for c in codes], "dates": [int(d) for d in dates]})
+
+        segments.sort(key=lambda seg: (seg["key"] == HOT_SEGMENT, seg["dates"][0]))
+        meta["segments"] = segments
+
+    def _merge_segment(self, field, key, codes, new_dates, fill):
+        """
+        구간 1개를 (codes × 기존 날짜 ∪ new_dates) 행렬로 다시 만들고 fill(matrix, row_of, col_of)로 값 반영
+        """
+        old = next((seg for seg in self._segments(field) if seg["key"] == key), None)
+        old_dates = old["dates"] if old else []
+        all_dates = sorted(set(old_dates) | set(new_dates))
+
+        matrix = np.full((len(codes), len(all_dates)), np.nan)
+        row_of = {c: i for i, c in enumerate(codes)}
+        col_of = {d: j for j, d in enumerate(all_dates)}
+        if old and old["codes"] and old_dates:
+            r_idx = np.array([row_of[c] for c in old["codes"]])
+            c_idx = np.array([col_of[d] for d in old_dates])
+            matrix[np.ix_(r_idx, c_idx)] = self._load_segment(old)
+        fill(matrix, row_of, col_of)
+        self._write_segment(field, key, codes, all_dates, matrix)
+
+    # ---- 읽기 ----
+    def dates(self, field):
+        """필드 전체 날짜 축 (int, 오름차순, 행렬은 읽지 않음)"""
+        return [d for seg in self._segments(field) for d in seg["dates"]]
+
+    def frame(self, field, mmap=True, start=None, end=None, last=None):
+        """
+        필드 1개를 dict로 반환 (없으면 None)
+        - codes/names: 행 순서의 종목코드/종목명
+        - dates: 열 순서의 날짜 (int YYYYMMDD, 오름차순)
+        - values: (종목 수, 날짜 수) float64 행렬 (빈 칸 NaN)
+        - start/end(YYYYMMDD): 해당 기간만, last: 최근 last일만 → 겹치는 구간 파일만 읽음
+        """
+        meta = self.manifest["fields"].get(field)
+        if not meta:
+            return None
+        start = int(start) if start else None
+        end = int(end) if end else None
+
+        picked = []
+        for seg in meta["segments"]:
+            cols = [j for j, d in enumerate(seg["dates"])
+                    if (start is None or d >= start) and (end is None or d <= end)]
+            if cols:
+                picked.append((seg, cols))
+        if last is not None:
+            remain, tail = int(last), []
+            for seg, cols in reversed(picked):
+                if remain <= 0:
+                    break
+                tail.insert(0, (seg, cols[-remain:]))
+                remain -= len(tail[0][1])
+            picked = tail
+
+        codes = list(meta["codes"])
+        dates = [seg["dates"][j] for seg, cols in picked for j in cols]
+        try:
+            if len(picked) == 1 and picked[0][0]["codes"] == codes:
+                # 구간 1개 + 종목 축 동일: 복사 없이 (mmap) 열 범위만 잘라 반환
+                seg, cols = picked[0]
+                values = self._load_segment(seg, mmap)[:, cols[0]:cols[-1] + 1]
+            else:
+                values = np.full((len(codes), len(dates)), np.nan)
+                row_of = {c: i for i, c in enumerate(codes)}
+                offset = 0
+                for seg, cols in picked:
+                    rows = np.array([row_of[c] for c in seg["codes"]], dtype=int)
+                    block = self._load_segment(seg, mmap)[:, cols[0]:cols[-1] + 1]
+                    values[rows, offset:offset + len(cols)] = block
+                    offset += len(cols)
+        except FileNotFoundError:
+            return None
+
+        return {
+            "codes": codes,
+            "names": list(meta["names"]),
+            "dates": dates,
+            "values": values,
+        }
+
+    def latest_date(self, field):
+        dates = self.dates(field)
+        return str(dates[-1]) if dates else None
+
+    # ---- 쓰기 ----
+    def write_frame(self, field, codes, names, dates, values, hot_days=None):
+        """필드 전체 교체 (최근 hot_days일은 hot, 그 이전은 기간별 cold 구간으로 나눠 저장)"""
+        hot_days = HOT_DAYS if hot_days is None else hot_days
+        old_files = {seg["file"] for seg in self._segments(field)}
+        codes = [str(c) for c in codes]
+        dates = [int(d) for d in dates]
+        values = np.asarray(values, dtype=np.float64)
+
+        self.manifest["fields"][field] = {"codes": codes, "names": list(names), "segments": []}
+        split = max(len(dates) - hot_days, 0)
+        groups = {}
+        for j in range(split):
+            groups.setdefault(segment_key(dates[j]), []).append(j)
+        groups[HOT_SEGMENT] = list(range(split, len(dates)))
+        for key, cols in groups.items():
+            if cols:
+                self._write_segment(field, key, codes, [dates[j] for j in cols],
+                                    values[:, cols[0]:cols[-1] + 1])
+        if not dates:
+            self._write_segment(field, HOT_SEGMENT, codes, [], None)
+
+        self._remove_stale(old_files, field)
+        self._log_edit(field, dates[0] if dates else 0)
+        self._save_manifest()
+
+    def _remove_stale(self, old_files, field):
+        current = {seg["file"] for seg in self._segments(field)}
+        for file_name in old_files - current:
+            try:
+                os.remove(os.path.join(self.path, file_name))
+            except FileNotFoundError:
+                pass
+
+    def upsert(self, field, rows, names=None, sort_codes=False):
+        """
+        종목별 {날짜: 값}을 기존 행렬에 병합.
+        - rows: {code: {date(int/str): value}}
+        - names: {code: 종목명} (새 종목 행 이름)
+        - 새 종목은 행 추가(sort_codes=True면 코드순 정렬), 새 날짜는 열 추가(날짜순)
+        - 값이 바뀌는 날짜가 속한 구간 파일만 다시 씀 (평소 일일 증분은 hot 구간만)
+        """
+        if not rows:
+            return
+
+        meta = self.manifest["fields"].get(field)
+        codes = meta["codes"] if meta else []
+        row_names = meta["names"] if meta else []
+
+        name_map = dict(zip(codes, row_names))
+        for code in rows:
+            code = str(code)
+            if code not in name_map:
+                name_map[code] = (names or {}).get(code, code)
+            elif names and names.get(code):
+                name_map[code] = names[code]
+
+        known = set(codes)
+        all_codes = list(codes) + [str(c) for c in rows if str(c) not in known]
+        if sort_codes:
+            all_codes = sorted(all_codes)
+
+        if not meta:
+            meta = self.manifest["fields"][field] = {"codes": [], "names": [], "segments": []}
+        meta["codes"] = all_codes
+        meta["names"] = [name_map[c] for c in all_codes]
+
+        # 구간별로 바뀌는 (종목, 날짜) 값 모으기 (cold 구간 마지막 날짜 이후는 hot)
+        cold_end = self._cold_end(field)
+        updates = {}
+        for code, values in rows.items():
+            for d, v in values.items():
+                d_int = to_date_int(d)
+                if d_int is None:
+                    continue
+                key = HOT_SEGMENT if cold_end is None or d_int > cold_end else segment_key(d_int)
+                updates.setdefault(key, []).append((str(code), d_int, to_float(v)))
+
+        def _filler(items):
+            def fill(matrix, row_of, col_of):
+                for code, d_int, v in items:
+                    matrix[row_of[code], col_of[d_int]] = v
+            return fill
+
+        for key, items in updates.items():
+            self._merge_segment(field, key, all_codes, {d for _, d, _ in items}, _filler(items))
+
+        hot = next((seg for seg in meta["segments"] if seg["key"] == HOT_SEGMENT), None)
+        if hot and len(hot["dates"]) > HOT_DAYS + COMPACT_SLACK:
+            self._compact_field(field)
+        if updates:
+            self._log_edit(field, min(d for items in updates.values() for _, d, _ in items))
+        self._save_manifest()
+
+    def _compact_field(self, field, hot_days=None):
+        """hot 구간에서 최근 hot_days일 이전 열을 기간별 cold 구간으로 이동. 반환: 이동한 열 수"""
+        hot_days = HOT_DAYS if hot_days is None else hot_days
+        meta = self.manifest["fields"][field]
+        hot = next((seg for seg in meta["segments"] if seg["key"] == HOT_SEGMENT), None)
+        if not hot or len(hot["dates"]) <= hot_days:
+            return 0
+
+        codes = meta["codes"]
+        hot_values = self._load_segment(hot)
+        row_of = {c: i for i, c in enumerate(codes)}
+        hot_rows = np.array([row_of[c] for c in hot["codes"]], dtype=int)
+        split = len(hot["dates"]) - hot_days
+
+        groups = {}
+        for j in range(split):
+            groups.setdefault(segment_key(hot["dates"][j]), []).append(j)
+
+        def _mover(cols):
+            def fill(matrix, row_of, col_of):
+                c_idx = np.array([col_of[hot["dates"][j]] for j in cols])
+                matrix[np.ix_(hot_rows, c_idx)] = hot_values[:, cols]
+            return fill
+
+        for key, cols in groups.items():
+            self._merge_segment(field, key, codes, [hot["dates"][j] for j in cols], _mover(cols))
+
+        remaining = np.full((len(codes), len(hot["dates"]) - split), np.nan)
+        remaining[hot_rows] = hot_values[:, split:]
+        self._write_segment(field, HOT_SEGMENT, codes, hot["dates"][split:], remaining)
+        return split
+
+    def compact(self, hot_days=None):
+        """전체 필드 압축: 오래된 열을 cold 구간으로 이동. 반환: {필드: 이동한 열 수}"""
+        moved = {}
+        for field in self.fields():
+            moved[field] = self._compact_field(field, hot_days)
+        self._save_manifest()
+        return moved
+
+
+# =========================
+# 3. 엑셀 ↔ 저장소
+# =========================
+
+def import_workbook(excel_filename, store=None):
+    """엑셀 파일 전체(종목/원자료/점수 시트)를 저장소로 가져오기"""
+    store = store or TimeSeriesStore(store_dir_for(excel_filename))
+    store.clear()
+    wb = openpyxl.load_workbook(excel_filename, read_only=True, data_only=True)
+    try:
+        if "종목" in wb.sheetnames:
+            symbols = []
+            for row in wb["종목"].iter_rows(min_row=2, values_only=True):
+                if len(row) >= 2 and row[0] and row[1]:
+                    symbol = (row[0], str(row[1]).strip())
+                    if len(row) > 2 and row[2]:
+                        symbol += (str(row[2]).strip(),)
+                    symbols.append(symbol)
+            store.set_symbols(symbols)
+
+        for sheet_name, field in SHEET_FIELDS.items():
+            if sheet_name not in wb.sheetnames:
+                continue
+            frame = read_matrix(wb[sheet_name])
+            store.write_frame(field, frame["codes"], frame["names"], frame["dates"], frame["values"])
+    finally:
+        wb.close()
+    return store
+
+
+def open_store(excel_filename):
+    """
+    엑셀 파일과 짝을 이루는 저장소 열기.
+    - 저장소가 원본: 모든 단계는 저장소만 읽고 쓰며, 엑셀은 export_workbook으로 만드는 사본
+    - 저장소가 아직 없고 예전 엑셀만 있으면 그 엑셀을 1회 가져옴 (이전용)
+    - 엑셀 파일도 저장소도 없으면 빈 저장소
+    """
+    store = TimeSeriesStore(store_dir_for(excel_filename))
+    if not store.exists() and os.path.exists(excel_filename):
+        print(f"  • 기존 엑셀 가져오기: {excel_filename} → {store.path}")
+        import_workbook(excel_filename, store)
+    return store
+
+
+def load_frame(excel_filename, field):
+    """엑셀 파일에 해당하는 필드 1개 로드 (없으면 None)"""
+    return open_store(excel_filename).frame(field)
+
+
+def scored_range(store, sheet_name, valid_dates):
+    """
+    점수 필드에 이미 기록된 범위 (새 날짜와 새 종목만 계산하도록).
+    - 반환: (existing_dates, known_codes)
+      existing_dates: valid_dates 중 저장소 마지막 날짜까지 (그 다음 날짜부터 새로 계산)
+      known_codes: 이미 행이 있는 종목코드 (없는 종목은 existing_dates도 채움)
+    """
+    field = SHEET_FIELDS[sheet_name]
+    stored = store.dates(field)
+    if not stored:
+        return [], set()
+    count = bisect_right([to_date_int(d) for d in valid_dates], stored[-1])
+    return list(valid_dates[:count]), set(store.codes(field))
+
+
+def _cell_value(v):
+    if np.isnan(v):
+        return None
+    return int(v) if float(v).is_integer() else float(v)
+
+
+def export_workbook(store, excel_filename):
+    """저장소 내용으로 엑셀 파일을 새로 생성 (시트 구성/헤더 형식은 기존 파이프라인과 동일)"""
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+
+    symbols = store.symbols()
+    if symbols:
+        ws = wb.create_sheet("종목")
+        # C열(거래소)은 지정된 종목이 있을 때만
+        has_exchange = any(len(s) > 2 and s[2] for s in symbols)
+        ws.append(["종목명", "종목코드"] + (["거래소"] if has_exchange else []))
+        for symbol in symbols:
+            ws.append(list(symbol[:3] if has_exchange else symbol[:2]))
+
+    for field, sheet_name in FIELD_SHEETS.items():
+        frame = store.frame(field)
+        if frame is None:
+            continue
+        ws = wb.create_sheet(sheet_name)
+        label = ("업종명", "업종코드") if field == "index" else ("종목명", "종목코드")
+        header = list(label) + [
+            str(d) if field in STR_DATE_FIELDS else d for d in frame["dates"]
+        ]
+        ws.append(header)
+        for col_idx in range(1, len(header) + 1):
+            cell = ws.cell(row=1, column=col_idx)
+            cell.font = HEADER_FONT
+            cell.fill = HEADER_FILL
+
+        values = frame["values"]
+        for i, (code, name) in enumerate(zip(frame["codes"], frame["names"])):
+            ws.append([name, code] + [_cell_value(v) for v in values[i]])
+
+        ws.column_dimensions["A"].width = 20
+        ws.column_dimensions["B"].width = 14
+        for col_idx in range(3, len(header) + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = 12
+
+    wb.save(excel_filename)
+    print(f"✅ 저장소 → 엑셀 내보내기 완료: {excel_filename}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="시계열 저장소 ↔ 엑셀 변환 / 구간 압축")
+    parser.add_argument("command", choices=["import", "export", "compact"])
+    parser.add_argument("files", nargs="+", help="엑셀 파일 경로")
+    parser.add_argument("--hot-days", type=int,
+                        help=f"compact: hot 구간에 남길 최근 거래일 수 (기본 {HOT_DAYS})")
+    args = parser.parse_args()
+
+    for filename in args.files:
+        store = TimeSeriesStore(store_dir_for(filename))
+        if args.command == "import":
+            import_workbook(filename, store)
+            print(f"✅ 가져오기 완료: {filename} → {store.path} ({', '.join(store.fields())})")
+        elif args.command == "compact":
+            if not store.exists():
+                print(f"⚠ 저장소가 없습니다: {store.path}")
+                continue
+            moved = store.compact(args.hot_days)
+            print(f"✅ 압축 완료: {store.path} (cold 구간으로 이동한 열: {sum(moved.values())}개)")
+        else:
+            if not store.exists():
+                print(f"⚠ 저장소가 없습니다: {store.path}")
+                continue
+            export_workbook(store, filename)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# 점수 계산 단계 공용 세션 (저장소 1회 열기 → 모든 점수 필드 계산 → 1회 반영)
+
+import numpy as np
+
+import sqlite_repo
+import ts_store
+
+
+class WorkbookSession:
+    """
+    엑셀 파일 1개(= 짝을 이루는 시계열 저장소 1개)에 대한 점수 계산 세션.
+    - series(field): 저장소의 종가/거래량 행렬을 1회만 읽어 공유
+    - scored(): 점수 필드에 이미 기록된 날짜/종목 (새 날짜와 새 종목만 계산하도록)
+    - record(): 계산한 점수를 모아 두었다가 save()에서 저장소/SQLite에 한 번에 반영
+    - keep_state(): 점수와 짝을 이루는 상태(S/Z 롤링 상태)는 save()에서 점수 반영이 끝난 뒤 기록
+    - 엑셀 파일은 건드리지 않음 (필요하면 ts_store.export_workbook으로 생성)
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.store = ts_store.open_store(filename)
+        self._series = {}
+        self._pending = {}
+        self._states = []
+
+    def series(self, field):
+        """
+        저장소 필드를 파이썬 리스트로 변환해 캐시 (없으면 None)
+        - {'dates': [int, ...], 'codes': [...], 'names': [...], 'rows': [[값 또는 None, ...], ...]}
+        """
+        if field not in self._series:
+            frame = self.store.frame(field)
+            if frame is None:
+                self._series[field] = None
+            else:
+                values = np.asarray(frame['values'])
+                rows = [[None if np.isnan(v) else float(v) for v in row] for row in values]
+                self._series[field] = {
+                    'dates': list(frame['dates']),
+                    'codes': list(frame['codes']),
+                    'names': list(frame['names']),
+                    'rows': rows,
+                }
+        return self._series[field]
+
+    def scored(self, sheet_name, valid_dates):
+        """
+        점수 필드에 이미 기록된 범위.
+        - 반환: (existing_dates, known_codes)
+          existing_dates: valid_dates 중 저장소 마지막 날짜까지 (그 다음 날짜부터 새로 계산)
+          known_codes: 이미 행이 있는 종목코드 (없는 종목은 existing_dates도 채움)
+        """
+        return ts_store.scored_range(self.store, sheet_name, valid_dates)
+
+    def record(self, sheet_name, written, names):
+        """계산한 값 {code: {date: value}}을 저장 시 반영할 목록에 추가"""
+        rows, all_names = self._pending.setdefault(sheet_name, ({}, {}))
+        for code, values in written.items():
+            rows.setdefault(code, {}).update(values)
+        all_names.update(names)
+
+    def keep_state(self, state):
+        """save()에서 점수를 반영한 뒤 state.save() (반영 중 오류가 나면 이전 상태 파일 유지)"""
+        self._states.append(state)
+
+    def save(self):
+        """모아 둔 값을 저장소/SQLite에 반영한 뒤 keep_state()로 넘긴 상태 기록"""
+        for sheet_name, (rows, names) in self._pending.items():
+            self.store.upsert(ts_store.SHEET_FIELDS[sheet_name], rows, names=names)
+            if sqlite_repo.is_enabled():
+                sqlite_repo.upsert_scores(sqlite_repo.source_for(self.filename), sheet_name, rows, names)
+        self._pending = {}
+
+        for state in self._states:
+            state.save()
+        self._states = []
+
+    def export(self):
+        """저장소 → 엑셀 파일 생성 (시트 구성은 기존 파이프라인과 동일)"""
+        ts_store.export_workbook(self.store, self.filename)